@@ -0,0 +1,198 @@
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+from argparse import ArgumentParser
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Tuple
+
+src = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, src)
+
+import pytz  # noqa: E402
+from chronometer import chrono  # noqa: E402
+from chronometer.tools import business, cal, clock, timeutil, tzcache  # noqa: E402
+from chronometer.tools.timecore import Instant  # noqa: E402
+
+here = os.path.dirname(os.path.abspath(__file__))
+# Modules only the event loop needs, which importing the display should not
+# pull in
+LAZY_IMPORTS = {"asyncio"}
+now = datetime(
+    year=2024, month=2, day=28, hour=17, minute=59, second=59, tzinfo=timezone.utc
+)
+instant = Instant.from_datetime(now)
+time_zones = [
+    ("PACIFIC", "US/Pacific"),
+    ("EASTERN", "US/Eastern"),
+    ("LONDON", "Europe/London"),
+    ("GERMANY", "Europe/Berlin"),
+    ("INDIA", "Asia/Kolkata"),
+    ("HONG KONG", "Asia/Hong_Kong"),
+    ("JAPAN", "Asia/Tokyo"),
+    ("SYDNEY", "Australia/Sydney"),
+]
+
+
+def fake_config() -> chrono.ChronoConfig:
+    config = chrono.ChronoConfig()
+    config.latitude = 40.7
+    config.longitude = -74.0
+    config.refresh = 0.1
+    config.time_zones = [(name, pytz.timezone(zone)) for name, zone in time_zones]
+    return config
+
+
+def benchmarks() -> Dict[str, Callable[[], object]]:
+    chrono.Chronometer.setup(fake_config(), os.terminal_size((60, 24)))
+    sun = timeutil.Sun(lon=-74.0, lat=40.7, date=now)
+    sun.date = now
+    offices = business.Schedule.compile(
+        [
+            (f"OFFICE {i}", tzcache.ZoneTable.from_tzinfo(pytz.timezone(zone)))
+            for i, zone in enumerate(pytz.common_timezones[::7][:60])
+        ],
+        {},
+        {},
+    )
+    ticks = itertools.count()
+    # Successive frames at the configured refresh, so the panels are redrawn
+    # as often as they are on screen
+    step = timedelta(seconds=fake_config().refresh)
+    frames = (now + step * i for i in itertools.count())
+    grid_frames = (now + step * i for i in itertools.count())
+    return {
+        "render": lambda: chrono.Chronometer.render(next(frames)),
+        "render_grid": lambda: chrono.Chronometer.render_grid(next(grid_frames)),
+        "world": lambda: chrono.Chronometer.compute_world(instant),
+        "business.advance": lambda: offices.advance(now.timestamp() + next(ticks)),
+        "clock.sidereal_time": lambda: clock.sidereal_time(now, -74.0),
+        "clock.new_earth_time": lambda: clock.new_earth_time(now),
+        "clock.sit_time": lambda: clock.sit_time(now),
+        "clock.hex_time": lambda: clock.hex_time(now),
+        "clock.metric_time": lambda: clock.metric_time(now),
+        "clock.unix_time": lambda: clock.unix_time(now),
+        "clock.utc_time": lambda: clock.utc_time(now),
+        "cal.julian_date": lambda: cal.julian_date(now),
+        "cal.int_fix_date": lambda: cal.int_fix_date(now),
+        "cal.twc_date": lambda: cal.twc_date(now),
+        "cal.pax_date": lambda: cal.pax_date(now),
+        "timeutil.leap_drift": lambda: timeutil.leap_drift(now),
+        "timeutil.next_leap": lambda: timeutil.next_leap(now),
+        "timeutil.prev_per": lambda: timeutil.prev_per(now),
+        "timeutil.next_per": lambda: timeutil.next_per(now),
+        "timeutil.prev_cycle": lambda: timeutil.prev_cycle(now),
+        "timeutil.leap_stats": lambda: timeutil.leap_stats(now),
+        "timeutil.Sun.refresh": sun.refresh,
+    }
+
+
+def measure(function: Callable[[], object], repeat: int) -> float:
+    function()
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def import_time(module: str, repeat: int) -> Tuple[float, List[str]]:
+    # Best cumulative -X importtime of the module over `repeat` fresh
+    # interpreters, and the modules it should not have imported
+    code = (
+        f"import sys, {module}\n"
+        f"print(*(name for name in {sorted(LAZY_IMPORTS)} if name in sys.modules))"
+    )
+    env = dict(os.environ, PYTHONPATH=src)
+    best = float("inf")
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        for line in result.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].strip() == module:
+                best = min(best, int(fields[1]) / 1e6)
+    return best, result.stdout.split()
+
+
+def main(argv=None) -> int:
+    parser = ArgumentParser(description="Chronometer hot path benchmarks")
+    parser.add_argument(
+        "--baseline",
+        default=os.path.join(here, "baselines", f"{platform.node() or 'default'}.json"),
+        help="baseline file (default: benchmarks/baselines/<hostname>.json)",
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="store the results as the new baseline"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="allowed slowdown relative to the baseline (default: 0.25)",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "filter", nargs="*", help="only run benchmarks containing these"
+    )
+    args = parser.parse_args(argv)
+
+    baseline: Dict[str, float] = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    results: Dict[str, float] = {}
+    regressions = []
+
+    def report(name: str, seconds: float, note: str = "") -> None:
+        results[name] = seconds
+        line = f"{name:<24}{seconds * 1e6:12.3f} us"
+        if name in baseline:
+            ratio = seconds / baseline[name]
+            line += f"  {ratio:6.2f}x"
+            if ratio > 1 + args.threshold:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line + note)
+
+    for name, function in benchmarks().items():
+        if args.filter and not any(term in name for term in args.filter):
+            continue
+        report(name, measure(function, args.repeat))
+
+    name = "import.chrono"
+    if not args.filter or any(term in name for term in args.filter):
+        seconds, eager = import_time("chronometer.chrono", args.repeat)
+        if eager:
+            regressions.append(name)
+        report(name, seconds, "".join(f"  IMPORTS {module}" for module in eager))
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(
+                {
+                    "machine": platform.machine(),
+                    "python": platform.python_version(),
+                    "results": {**baseline, **results},
+                },
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+        print(f"Baseline saved to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} benchmark(s) regressed: {regressions}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
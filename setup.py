@@ -29,6 +29,7 @@ setuptools.setup(
     packages=setuptools.find_packages("src"),
     python_requires=">=3.6",
     install_requires=install_requires,
+    extras_require={"batch": ["numpy"]},
     package_data={"": ["files/*"]},
     include_package_data=True,
 )
@@ -1,3 +1,7 @@
+import time
+
+started = time.perf_counter()
+
 from chronometer import chrono
 
-chrono.run()
+chrono.run(started)
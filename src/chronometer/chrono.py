@@ -1,15 +1,23 @@
 #!/usr/bin/python3
 
-from datetime import datetime, timedelta
-from chronometer.tools import console, ntp, timeutil, clock, cal
+from datetime import datetime
+from chronometer.tools import console, ntp, timeutil, clock, cal, caltable, frame
+from chronometer.tools import backends, business, configcache, governor, timecore
+from chronometer.tools import tzcache
+from chronometer.tools.timecore import DateTimeLike, Instant
+from chronometer.tools.metrics import Metrics, MetricsServer
+from chronometer.tools.profiler import Profiler
+from chronometer.tools.recording import Recorder, Recording
+import heapq
+import math
 import time
 import os
+import sys
 import random
-from typing import Any, Iterable, List, Tuple
-import pytz
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 from enum import Enum, auto
 import shutil
-import configparser
+from argparse import ArgumentParser, ArgumentTypeError
 
 random.seed()
 
@@ -58,17 +66,166 @@ class ProgressBar:
         )
 
 
+class Widget:
+    def __init__(
+        self,
+        name: str,
+        compute: Callable[[Instant], Any],
+        format: Callable[[Any], List[str]],
+        expires: Optional[Callable[[Instant, Any], float]] = None,
+        state: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        self.name = name
+        self.compute = compute
+        self.format = format
+        # Epoch time until which the output stays the same, given the data it
+        # was formatted from.  Widgets without one are redrawn every frame.
+        self.expires = expires or (lambda now, data: 0.0)
+        # Anything besides the time that the output depends on
+        self.state = state or (lambda: None)
+        self.lines: List[str] = []
+        self.since = math.inf
+        self.until = -math.inf
+        self.key: Any = None
+
+    def fresh(self, epoch: float, key: Any) -> bool:
+        return self.since <= epoch < self.until and key == self.key
+
+    def update(self, now: Instant, epoch: float, key: Any, data: Any) -> None:
+        self.since = epoch
+        self.until = self.expires(now, data)
+        self.key = key
+
+
 class ChronoConfig:
     latitude: float = 0
     longitude: float = 0
     refresh: float = 0
+    tolerance: float = 0.005
     time_zones: List[Tuple[str, Any]] = []
+    ntp_mode: str = "control"
+    ntp_server: str = "127.0.0.1"
+    sync_output: bool = True
+    # Further observer locations, as (label, latitude, longitude)
+    sites: List[Tuple[str, float, float]] = []
+    # Opening hours by zone label, as (opens, closes, weekdays) with times in
+    # seconds after local midnight, and closed days as days since 1970-01-01.
+    # "DEFAULT" entries apply to every zone.
+    business_hours: Dict[str, Tuple[int, int, List[int]]] = {}
+    holidays: Dict[str, List[int]] = {}
+    blink: int = business.DEFAULT_WARNING
+    # Adaptive refresh: at most cpu_budget percent of one core (0 for no
+    # limit), and one frame per idle_refresh seconds when nobody is looking
+    adaptive: bool = False
+    cpu_budget: float = 0
+    idle_refresh: float = 1
 
 
-def load_config(filename: str = ".chrono_config") -> ChronoConfig:
+# ChronoConfig fields kept in the compiled config cache besides the zones
+CACHED_SETTINGS = (
+    "latitude",
+    "longitude",
+    "refresh",
+    "tolerance",
+    "sync_output",
+    "ntp_mode",
+    "ntp_server",
+    "sites",
+    "business_hours",
+    "holidays",
+    "blink",
+    "adaptive",
+    "cpu_budget",
+    "idle_refresh",
+)
+
+
+def config_path(filename: str = ".chrono_config") -> str:
+    return os.path.join(os.path.expanduser("~"), filename)
+
+
+def parse_config(path: str) -> ChronoConfig:
+    import configparser
+    import pytz
+
     config = ChronoConfig()
+    try:
+        parser = configparser.ConfigParser()
+        parser.read(path)
+        time_zone_data = [
+            (zone_label(tz), pytz.timezone(parser["timezones"][tz]))
+            for tz in parser["timezones"]
+        ]
+        config.latitude = float(parser["settings"]["latitude"])
+        config.longitude = float(parser["settings"]["longitude"])
+        config.refresh = float(parser["settings"]["refresh"])
+        config.tolerance = parser.getfloat(
+            "settings", "tolerance", fallback=config.tolerance
+        )
+        config.sync_output = parser.getboolean(
+            "settings", "sync_output", fallback=config.sync_output
+        )
+        config.adaptive = parser.getboolean(
+            "settings", "adaptive", fallback=config.adaptive
+        )
+        config.cpu_budget = parser.getfloat(
+            "settings", "cpu_budget", fallback=config.cpu_budget
+        )
+        config.idle_refresh = parser.getfloat(
+            "settings", "idle_refresh", fallback=config.idle_refresh
+        )
+        if config.idle_refresh <= 0:
+            raise ValueError("idle_refresh must be positive")
+        if parser.has_section("sites"):
+            config.sites = [
+                (zone_label(name), *parse_coordinates(value))
+                for name, value in parser["sites"].items()
+            ]
+        if parser.has_section("business_hours"):
+            hours = dict(parser["business_hours"])
+            config.blink = int(float(hours.pop("blink", config.blink / 60)) * 60)
+            config.business_hours = {
+                zone_label(name): business.parse_hours(value)
+                for name, value in hours.items()
+            }
+        if parser.has_section("holidays"):
+            config.holidays = {
+                zone_label(name): business.parse_holidays(value)
+                for name, value in parser["holidays"].items()
+            }
+    except (configparser.Error, KeyError, ValueError) as e:
+        raise ValueError(f"Error reading chrono_config ({e}).") from e
+    except pytz.UnknownTimeZoneError as e:
+        raise ValueError(f"Unknown time zone in chrono_config ({e}).") from e
+    config.time_zones = time_zone_data
+    config.ntp_mode = parser.get("ntp", "mode", fallback=config.ntp_mode)
+    config.ntp_server = parser.get("ntp", "server", fallback=config.ntp_server)
+    return config
+
+
+def zone_label(name: str) -> str:
+    return name.upper().replace("_", " ")[:10]
+
+
+def parse_coordinates(value: str) -> Tuple[float, float]:
+    lat, lon = value.split(",")
+    return float(lat), float(lon)
+
+
+def compile_config(path: str) -> Tuple[ChronoConfig, bool]:
+    # Parse the config file, and compile it with its zone tables into the
+    # cache next to it.  Returns the config and whether the cache was written.
+    config = parse_config(path)
+    config.time_zones = [
+        (label, tzcache.ZoneTable.from_tzinfo(tz)) for label, tz in config.time_zones
+    ]
+    settings = {name: getattr(config, name) for name in CACHED_SETTINGS}
+    return config, configcache.save(path, settings, config.time_zones)
+
+
+def load_config(filename: str = ".chrono_config") -> ChronoConfig:
     here = os.path.dirname(os.path.realpath(__file__))
-    config_file_path = os.path.join(os.path.expanduser("~"), filename)
+    config_file_path = config_path(filename)
 
     if not os.path.isfile(config_file_path):
         shutil.copyfile(
@@ -82,22 +239,46 @@ def load_config(filename: str = ".chrono_config") -> ChronoConfig:
         console.show_cursor()
         exit()
 
+    cached = configcache.load(config_file_path)
+    # A cache written before a setting was added is compiled again
+    if cached and all(name in cached[0] for name in CACHED_SETTINGS):
+        settings, zones = cached
+        config = ChronoConfig()
+        for name in CACHED_SETTINGS:
+            setattr(config, name, settings[name])
+        config.sites = [tuple(site) for site in config.sites]
+        config.business_hours = {
+            label: tuple(hours) for label, hours in config.business_hours.items()
+        }
+        config.time_zones = zones
+        return config
+
     try:
-        parser = configparser.ConfigParser()
-        parser.read(config_file_path)
-        time_zone_data = [
-            (tz.upper().replace("_", " ")[:10], pytz.timezone(parser["timezones"][tz]))
-            for tz in parser["timezones"]
-        ]
-    except configparser.ParsingError as e:
-        print(f"Error reading chrono_config ({e}).")
+        return compile_config(config_file_path)[0]
+    except ValueError as e:
+        print(e)
         exit()
 
-    config.latitude = float(parser["settings"]["latitude"])
-    config.longitude = float(parser["settings"]["longitude"])
-    config.refresh = float(parser["settings"]["refresh"])
-    config.time_zones = time_zone_data
-    return config
+
+def check_config(filename: str = ".chrono_config") -> int:
+    path = config_path(filename)
+    if not os.path.isfile(path):
+        print(f"{path} does not exist.  Run chronometer once to generate it.")
+        return 1
+    try:
+        config, cached = compile_config(path)
+    except (OSError, ValueError) as e:
+        print(e)
+        return 1
+    print(
+        f"{path}: OK, {len(config.time_zones)} time zones at "
+        f"{config.latitude}, {config.longitude}"
+    )
+    if cached:
+        print(f"Compiled to {configcache.cache_path(path)}")
+    else:
+        print(f"Could not write {configcache.cache_path(path)}")
+    return 0
 
 
 def float_width(value: float, width: int, signed: bool = False) -> str:
@@ -109,13 +290,34 @@ def flatten(l: Iterable):
     return (item for sublist in l for item in sublist)
 
 
+class Site:
+    # An observer location.  SOL, LST and the solar events depend on it, and
+    # everything else on the display is shared by all sites.
+    def __init__(self, name: str, lat: float, lon: float) -> None:
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+        self.sun = timeutil.Sun(lon=lon, lat=lat)
+
+    def times(self, now: Instant, sidereal_angle: float) -> Tuple[str, str]:
+        # SOL and LST, given the Greenwich sidereal angle shared by all sites
+        self.sun.date = now
+        self.sun.refresh()
+        return (
+            clock.hms(int(self.sun.solar_seconds)),
+            clock.local_sidereal_time(sidereal_angle, self.lon),
+        )
+
+    def events(self) -> Tuple[str, str]:
+        # Sunrise and sunset in UTC on the day of the last times() call
+        sunrise, sunset = self.sun.sunrise, self.sun.sunset
+        if sunrise is None or sunset is None:
+            return "--:--", "--:--"
+        return f"{sunrise:%H:%M}", f"{sunset:%H:%M}"
+
+
 class Chronometer:
-    config = load_config()
-    lon = config.longitude
-    lat = config.latitude
-    time_zone_data_temp = config.time_zones
-    time_zone_data_temp.sort(key=lambda tz: tz[1].utcoffset(datetime.now()))
-    loop_time = timedelta()
+    config = ChronoConfig()
     cal_str = ["", "", "", ""]
     v_bar = Theme.border + "\N{BOX DRAWINGS DOUBLE VERTICAL}"
     b_var_single = Theme.border + "\N{BOX DRAWINGS LIGHT VERTICAL}"
@@ -130,47 +332,117 @@ class Chronometer:
     center_r = Theme.border + "\N{BOX DRAWINGS DOUBLE VERTICAL AND LEFT}"
     binary = ("-", "\N{BLACK MEDIUM SQUARE}")
     highlight = (Theme.text, Theme.highlight)
-    rows = os.get_terminal_size().lines
-    columns = os.get_terminal_size().columns  # if width < 60 else width
-    sun = timeutil.Sun(lon=lon, lat=lat)
+    rows = 0
+    columns = 0
+    sites: List[Site] = []
+    site: Site  # whose SOL and LST the times panel shows
+    tick_ns: Optional[int] = None
+    tick_times: Dict[str, Any] = {}
+    zone_set: tzcache.ZoneSet
+    schedule: business.Schedule
+    zones_from = 0.0
+    zones_until = 0.0
+    time_zone_data: List[Tuple[str, tzcache.ZoneTable]] = []
+    time_table: Dict[Bar, ProgressBar] = {}
+    widgets: List[Widget] = []
+    template: frame.Template
+    overlay_template: frame.Template
+    profiler: Optional[Profiler] = None
+    # Rows taken by the board without the sites panel, and the sites rows
+    # below it without and with the profiler overlay.  Sites that do not fit
+    # take turns, site_page_seconds at a time.
+    board_rows = 0
+    site_rows = 0
+    overlay_site_rows = 0
+    site_page_seconds = 5
+
+    @classmethod
+    def setup(
+        cls, config: ChronoConfig, size: Optional[os.terminal_size] = None
+    ) -> None:
+        size = size or os.get_terminal_size()
+        cls.config = config
+        ntp.mode = config.ntp_mode
+        ntp.server = config.ntp_server
+        cls.rows = size.lines
+        cls.columns = size.columns
+        cls.sites = [
+            Site("HOME", config.latitude, config.longitude),
+            *(Site(name, lat, lon) for name, lat, lon in config.sites),
+        ]
+        cls.site = cls.sites[0]
+        cls.tick_ns = None
 
-    time_zone_data = []
-    for i in flatten((_, _ + 4) for _ in range(4)):
-        time_zone_data.append(time_zone_data_temp[i])
+        cls.zone_set = tzcache.ZoneSet.from_tzinfos(config.time_zones)
+        cls.schedule = business.Schedule.compile(
+            cls.zone_set.zones, config.business_hours, config.holidays, config.blink
+        )
+        cls.arrange_zones(time.time())
 
-    time_table = {}
-    for b in Bar:
-        time_table.update({b: ProgressBar(min=0, max=1, width=columns - 19, value=0)})
+        cls.time_table = {
+            b: ProgressBar(min=0, max=1, width=cls.columns - 19, value=0) for b in Bar
+        }
+        cls.widgets = [
+            Widget(
+                name,
+                getattr(cls, f"compute_{name}"),
+                getattr(cls, f"format_{name}"),
+                getattr(cls, f"expires_{name}", None),
+                getattr(cls, f"state_{name}", None),
+            )
+            for name in (
+                "header",
+                "bars",
+                "times",
+                "dates",
+                "leap",
+                "world",
+                "ntp",
+                "sites",
+            )
+        ]
+        board = cls.layout(0)
+        cls.board_rows = 1 + sum(
+            piece.count("\n") for piece in board if isinstance(piece, str)
+        )
+        spare = max(cls.rows - cls.board_rows, 0)
+        cls.site_rows = min(len(cls.sites) if len(cls.sites) > 1 else 0, spare)
+        # The overlay goes on the row after the last one used, in place of
+        # the last sites row when the sites fill the screen
+        cls.overlay_site_rows = min(cls.site_rows, max(spare - 1, 0))
+        cls.template = frame.Template(cls.layout(cls.site_rows), cls.rows, cls.columns)
+        cls.overlay_template = frame.Template(
+            [*cls.layout(cls.overlay_site_rows), "\n", ("overlay", 0)],
+            cls.rows,
+            cls.columns,
+        )
 
     @classmethod
-    def render(cls):
-        start_time = datetime.now().astimezone()
-        now = start_time + cls.loop_time
-        u_second = now.microsecond / 1000000
-        is_daylight_savings = time.localtime().tm_isdst
-        current_tz = time.tzname[is_daylight_savings]
-        screen = ""
-        hour_binary = divmod(now.hour, 10)
-        minute_binary = divmod(now.minute, 10)
-        second_binary = divmod(now.second, 10)
-        b_clock_mat = [
-            bin(hour_binary[0])[2:].zfill(4),
-            bin(hour_binary[1])[2:].zfill(4),
-            bin(minute_binary[0])[2:].zfill(4),
-            bin(minute_binary[1])[2:].zfill(4),
-            bin(second_binary[0])[2:].zfill(4),
-            bin(second_binary[1])[2:].zfill(4),
+    def arrange_zones(cls, epoch: float) -> None:
+        zones, cls.zones_from, cls.zones_until = cls.zone_set.by_offset(epoch)
+        cls.time_zone_data = [zones[i] for i in flatten((_, _ + 4) for _ in range(4))]
+
+    @classmethod
+    def compute_header(cls, now: Instant) -> Tuple[datetime, str]:
+        is_daylight_savings = time.localtime(now.ns // timecore.NS).tm_isdst
+        return now.to_datetime(), time.tzname[is_daylight_savings]
+
+    @classmethod
+    def expires_header(cls, now: Instant, data: Tuple[datetime, str]) -> float:
+        return math.floor(now.timestamp()) + 1
+
+    @classmethod
+    def format_header(cls, data: Tuple[datetime, str]) -> List[str]:
+        now, current_tz = data
+        return [
+            Theme.header
+            + f"{f'{now: %I:%M:%S %p {current_tz} - %A %B %d, %Y}': ^{cls.columns}}".upper()
         ]
-        b_clock_mat_t = [*zip(*b_clock_mat)]
-        b_clockdisp = ["", "", "", ""]
-        for i, row in enumerate(b_clock_mat_t):
-            b_clockdisp[i] = Theme.text + (
-                "".join(row).replace("0", cls.binary[0]).replace("1", cls.binary[1])
-            )
 
-        days_this_month = (
-            now.replace(month=now.month % 12 + 1, day=1) - timedelta(days=1)
-        ).day
+    @classmethod
+    def compute_bars(cls, now: Instant) -> List[float]:
+        u_second = now.microsecond / 1000000
+        days_this_month = timecore.days_in_month(now.year, now.month)
         days_this_year = 365 + timeutil.is_leap_year(now)
         cls.time_table[Bar.SECOND].value = (
             now.second + u_second + random.randint(0, 9999) / 10**10
@@ -203,114 +475,146 @@ class Chronometer:
         cls.time_table[Bar.CENTURY].value = (
             cls.time_table[Bar.YEAR].value - 1
         ) / 100 + 1
-        screen += Theme.header
-        screen += f"{f'{now: %I:%M:%S %p {current_tz} - %A %B %d, %Y}': ^{cls.columns}}\n".upper()
-        screen += (
-            f"{cls.corner_ul}"
-            f"{Theme.title}NOW{Theme.border}"
-            f"{cls.h_bar * (cls.columns - 5)}"
-            f"{cls.corner_ur}\n"
-        )
-        for i, bar in enumerate(Bar):
+        percents = []
+        for bar in Bar:
             percent = cls.time_table[bar].value - int(cls.time_table[bar].value)
             cls.time_table[bar].value = percent
-            screen += (
-                f"{cls.v_bar} {Theme.text}{bar.name[0].upper()} "
-                f"{cls.time_table[bar]}"
-                f"{Theme.text} {100 * (percent):011.8f}% {cls.v_bar}\n"
-            )
+            percents.append(percent)
+        return percents
 
-        cls.sun.date = now
-        cls.sun.refresh()
-        sol_str = f"{Theme.text}SOL {cls.sun.solar_noon:%H:%M:%S}"
-        lst_str = f"{Theme.text}LST {clock.sidereal_time(now, cls.lon)}"
-        met_str = f"{Theme.text}DEC {clock.metric_time(now)}"
-        hex_str = f"{Theme.text}HEX {clock.hex_time(now)}"
-        net_str = f"{Theme.text}NET {clock.new_earth_time(now)}"
-        sit_str = f"{Theme.text}SIT {clock.sit_time(now)}"
-        utc_str = f"{Theme.text}UTC {clock.utc_time(now)}"
-        unx_str = f"{Theme.text}UNX {clock.unix_time(now)}"
-        screen += (
-            f"{cls.center_l}"
-            f"{Theme.title}TIME{Theme.border}"
-            f"{cls.h_bar * (cls.columns - 24)}"
-            f"{cls.h_bar_down_connect}"
-            f"{Theme.title}DATE{Theme.border}"
-            f"{cls.h_bar * 13}"
-            f"{cls.center_r}\n"
-        )
+    @classmethod
+    def format_bars(cls, percents: List[float]) -> List[str]:
+        return [
+            f"{cls.v_bar} {Theme.text}{bar.name[0].upper()} "
+            f"{cls.time_table[bar]}"
+            f"{Theme.text} {100 * (percent):011.8f}% {cls.v_bar}"
+            for bar, percent in zip(Bar, percents)
+        ]
+
+    @classmethod
+    def select_site(cls, name: str) -> None:
+        sites = [site for site in cls.sites if site.name == name.upper()]
+        if not sites:
+            raise ValueError(f"Unknown site: {name}")
+        cls.site = sites[0]
+
+    @classmethod
+    def shared_times(cls, now: Instant) -> Dict[str, Any]:
+        # The location independent clocks, computed once per tick however
+        # many sites are drawn
+        if now.ns == cls.tick_ns:
+            return cls.tick_times
+        hour_binary = divmod(now.hour, 10)
+        minute_binary = divmod(now.minute, 10)
+        second_binary = divmod(now.second, 10)
+        b_clock_mat = [
+            bin(hour_binary[0])[2:].zfill(4),
+            bin(hour_binary[1])[2:].zfill(4),
+            bin(minute_binary[0])[2:].zfill(4),
+            bin(minute_binary[1])[2:].zfill(4),
+            bin(second_binary[0])[2:].zfill(4),
+            bin(second_binary[1])[2:].zfill(4),
+        ]
+        cls.tick_times = {
+            "binary": [*zip(*b_clock_mat)],
+            "sidereal": clock.sidereal_angle(now),
+            "DEC": clock.metric_time(now),
+            "HEX": clock.hex_time(now),
+            "NET": clock.new_earth_time(now),
+            "SIT": clock.sit_time(now),
+            "UTC": clock.utc_time(now),
+            "UNX": clock.unix_time(now),
+        }
+        cls.tick_ns = now.ns
+        return cls.tick_times
+
+    @classmethod
+    def compute_times(cls, now: Instant) -> Dict[str, Any]:
+        data = cls.shared_times(now)
+        sol, lst = cls.site.times(now, data["sidereal"])
+        return {**data, "SOL": sol, "LST": lst}
 
-        screen += (
+    @classmethod
+    def state_times(cls) -> Site:
+        return cls.site
+
+    @classmethod
+    def format_times(cls, data: Dict[str, Any]) -> List[str]:
+        b_clockdisp = [
+            Theme.text
+            + "".join(row).replace("0", cls.binary[0]).replace("1", cls.binary[1])
+            for row in data["binary"]
+        ]
+        sol_str, lst_str, met_str, hex_str, net_str, sit_str, utc_str, unx_str = (
+            f"{Theme.text}{name} {data[name]}"
+            for name in ("SOL", "LST", "DEC", "HEX", "NET", "SIT", "UTC", "UNX")
+        )
+        return [
             f"{cls.v_bar} "
             f"{utc_str} "
             f"{cls.b_var_single} "
             f"{unx_str} "
             f"{cls.b_var_single} "
             f"{b_clockdisp[0]}"
-            f'{" " * (cls.columns - len(met_str + unx_str + b_clockdisp[0]) + 3)}'
-            f"{cls.v_bar} "
-            f"{cls.cal_str[0]} "
-            f"{cls.v_bar}\n"
-        )
-
-        screen += (
+            f'{" " * (cls.columns - len(met_str + unx_str + b_clockdisp[0]) + 3)}',
             f"{cls.v_bar} "
             f"{met_str} "
             f"{cls.b_var_single} "
             f"{sit_str} "
             f"{cls.b_var_single} "
             f"{b_clockdisp[1]}"
-            f'{" " * (cls.columns - len(met_str + sit_str + b_clockdisp[1]) + 3)}'
-            f"{cls.v_bar} "
-            f"{cls.cal_str[1]} "
-            f"{cls.v_bar}\n"
-        )
-
-        screen += (
+            f'{" " * (cls.columns - len(met_str + sit_str + b_clockdisp[1]) + 3)}',
             f"{cls.v_bar} "
             f"{sol_str} "
             f"{cls.b_var_single} "
             f"{hex_str} "
             f"{cls.b_var_single} "
             f"{b_clockdisp[2]}"
-            f'{" " * (cls.columns - len(sol_str + net_str + b_clockdisp[2]) + 3)}'
-            f"{cls.v_bar} "
-            f"{cls.cal_str[2]} "
-            f"{cls.v_bar}\n"
-        )
-
-        screen += (
+            f'{" " * (cls.columns - len(sol_str + net_str + b_clockdisp[2]) + 3)}',
             f"{cls.v_bar} "
             f"{lst_str} "
             f"{cls.b_var_single} "
             f"{net_str} "
             f"{cls.b_var_single} "
             f"{b_clockdisp[3]}"
-            f'{" " * (cls.columns - len(lst_str + hex_str + b_clockdisp[3]) + 3)}'
-            f"{cls.v_bar} "
-            f"{cls.cal_str[3]} "
-            f"{cls.v_bar}\n"
-        )
+            f'{" " * (cls.columns - len(lst_str + hex_str + b_clockdisp[3]) + 3)}',
+        ]
 
-        screen += (
-            f"{cls.center_l}"
-            f"{Theme.title}WORLD{Theme.border}"
-            f"{cls.h_bar * (cls.columns - 28)}"
-            f"{cls.h_bar_down_connect}"
-            f"{Theme.title}LEAP{Theme.border}"
-            f"{cls.h_bar * 16}"
-            f"{cls.center_r}\n"
+    @classmethod
+    def compute_dates(cls, now: Instant) -> Tuple[str, str, str, float]:
+        return (
+            cal.int_fix_date(now),
+            cal.twc_date(now),
+            cal.pax_date(now),
+            cal.julian_date(date=now, reduced=False),
         )
 
-        cls.cal_str[0] = f"{Theme.text}IFC  {cal.int_fix_date(now)}"
-        cls.cal_str[1] = f"{Theme.text}TWC  {cal.twc_date(now)}"
-        cls.cal_str[2] = f"{Theme.text}PAX {cal.pax_date(now)}"
-        cls.cal_str[3] = (
-            f"{Theme.text}"
-            f"JUL {float_width(cal.julian_date(date=now, reduced=False), 11, False)}"
-        )
+    @classmethod
+    def expires_dates(cls, now: Instant, data: Tuple[str, str, str, float]) -> float:
+        # JUL is shown to a thousandth of a day, and wall clock midnight falls
+        # on one of those steps, so the calendar dates change with it.
+        jul = data[3]
+        step = float(float_width(jul, 11)) + 0.001 - jul
+        return now.timestamp() + step * 86400 - 0.001
 
-        leap_drift = timeutil.leap_drift(now)
+    @classmethod
+    def format_dates(cls, data: Tuple[str, str, str, float]) -> List[str]:
+        ifc, twc, pax, jul = data
+        cls.cal_str = [
+            f"{Theme.text}IFC  {ifc}",
+            f"{Theme.text}TWC  {twc}",
+            f"{Theme.text}PAX {pax}",
+            f"{Theme.text}JUL {float_width(jul, 11, False)}",
+        ]
+        return cls.cal_str
+
+    @classmethod
+    def compute_leap(cls, now: Instant) -> timeutil.LeapStats:
+        return timeutil.leap_stats(now)
+
+    @classmethod
+    def format_leap(cls, data: timeutil.LeapStats) -> List[str]:
+        leap_drift, next_leap, per_progress, cyc_progress = data
         hours, remainder = divmod(abs(leap_drift), 3600)
         minutes, seconds = divmod(remainder, 60)
         subs = seconds - int(seconds)
@@ -321,152 +625,724 @@ class Chronometer:
             f"{int(seconds):02}."
             f"{int(10000 * subs):04}"
         )
-        next_leap = timeutil.next_leap(now) - now
-        days, remainder = divmod(next_leap.total_seconds(), 86400)
+        days, remainder = divmod(next_leap, 86400)
         hours, remainder = divmod(remainder, 3600)
         minutes, seconds = divmod(remainder, 60)
-        per_progress = (now - timeutil.prev_per(now)).total_seconds() / (
-            (timeutil.next_per(now)) - timeutil.prev_per(now)
-        ).total_seconds()
-        cyc_progress = (now - timeutil.prev_cycle(now)).total_seconds() / (
-            (365 * 400 + 97) * 86400
-        )
-        leap_stats = [
+        return [
             f"DFT {leap_drift_str}",
             f"NXT -{int(days):04}:{int(hours):02}:{int(minutes):02}:{int(seconds):02}",
             f"PER {100*per_progress:013.10f}%",
             f"CYC {100*cyc_progress:013.10f}%",
         ]
 
-        for i in range(0, len(cls.time_zone_data), 2):
-            time0 = now.astimezone(cls.time_zone_data[i][1])
-            time1 = now.astimezone(cls.time_zone_data[i + 1][1])
-
-            flash0 = False
-            flash1 = False
-            flash_dur = 0.1
-
-            if time0.weekday() < 5:
-                if time0.hour > 8 and time0.hour < 17:
-                    flash0 = True
-                elif time0.hour == 8:
-                    flash0 = u_second < flash_dur
-                elif time0.hour == 17:
-                    flash0 = not (u_second < flash_dur)
-
-            if time1.weekday() < 5:
-                if time1.hour > 8 and time1.hour < 17:
-                    flash1 = True
-                elif time1.hour == 8:
-                    flash1 = u_second < flash_dur
-                elif time1.hour == 17:
-                    flash1 = not (u_second < flash_dur)
-
-            if time0.date() > now.date():
-                sign0 = "+"
-            elif time0.date() < now.date():
-                sign0 = "-"
+    @classmethod
+    def compute_world(cls, now: Instant) -> List[Tuple[str, int, int, bool, str]]:
+        epoch = now.timestamp()
+        if not cls.zones_from <= epoch < cls.zones_until:
+            cls.arrange_zones(epoch)
+        cls.schedule.advance(epoch)
+        today = now.days
+        u_second = now.microsecond / 1000000
+        zones = []
+        for name, table in cls.time_zone_data:
+            day, _, hour, minute = tzcache.local_fields(epoch + table.offset(epoch))
+            flash = business.lit(cls.schedule.state(name), u_second)
+            if day > today:
+                sign = "+"
+            elif day < today:
+                sign = "-"
             else:
-                sign0 = " "
+                sign = " "
+            zones.append((name, hour, minute, flash, sign))
+        return zones
 
-            if time1.date() > now.date():
-                sign1 = "+"
-            elif time1.date() < now.date():
-                sign1 = "-"
-            else:
-                sign1 = " "
+    @classmethod
+    def expires_world(
+        cls, now: Instant, zones: List[Tuple[str, int, int, bool, str]]
+    ) -> float:
+        epoch = now.timestamp()
+        until = min(
+            math.floor(epoch / 60) * 60 + 60, cls.zones_until, cls.schedule.next_change
+        )
+        if any(cls.schedule.state(zone[0]) in business.BLINKING for zone in zones):
+            # Zones around opening and closing time blink each second
+            second = math.floor(epoch)
+            blink = second + business.BLINK
+            until = min(until, blink if epoch < blink else second + 1)
+        return until
 
-            time_str0 = f"{sign0}{time0:%H:%M}"
-            time_str1 = f"{sign1}{time1:%H:%M}"
-            padding = (cls.columns - 60) * " "
-            screen += (
+    @classmethod
+    def format_world(cls, zones: List[Tuple[str, int, int, bool, str]]) -> List[str]:
+        padding = (cls.columns - 60) * " "
+        rows = []
+        for i in range(0, len(zones), 2):
+            name0, hour0, minute0, flash0, sign0 = zones[i]
+            name1, hour1, minute1, flash1, sign1 = zones[i + 1]
+            time_str0 = f"{sign0}{hour0:02}:{minute0:02}"
+            time_str1 = f"{sign1}{hour1:02}:{minute1:02}"
+            rows.append(
                 f"{cls.v_bar}"
                 f"{cls.highlight[flash0]} "
-                f"{cls.time_zone_data[i][0]:<10}"
+                f"{name0:<10}"
                 f"{time_str0:6} "
                 f"{cls.highlight[0]}"
                 f"{cls.b_var_single}"
-            )
-            screen += (
                 f"{cls.highlight[flash1]} "
-                f"{cls.time_zone_data[i + 1][0]:<10}"
+                f"{name1:<10}"
                 f"{time_str1:6} "
                 f"{cls.highlight[0]}"
                 f"{padding}"
-                f"{cls.v_bar} "
-                f"{Theme.text}{leap_stats[i//2]} "
-                f"{cls.v_bar}"
             )
-            screen += "\n"
+        return rows
+
+    @classmethod
+    def compute_ntp(cls, now: Instant) -> Optional[Tuple[str, str, bool]]:
+        if ntp.service_status != ntp.ServiceStatus.ACTIVE:
+            return None
+        ntp_id_str = ntp.peer.server_id
+        ntpid_temp = ntp_id_str
 
-        screen += (
+        ntp_str_right = (
+            f"ST {ntp.peer.stratum} "
+            f"DLY {float_width(float(ntp.peer.delay), 6, False)} "
+            f"OFF{float_width(float(ntp.peer.offset), 7, True)}"
+        )
+
+        if ntp.history and len(ntp.history) > 1:
+            # Recent offsets, telling a one-off spike from a steady drift
+            ntp_str_right = f"{ntp.history.sparkline('offset')} {ntp_str_right}"
+
+        if ntp.peer.source:
+            ntp_str_right = f"REF {ntp.peer.source} {ntp_str_right}"
+
+        ntpid_max_width = cls.columns - len(ntp_str_right) - 3
+
+        # Calculate NTP server ID scrolling if string is too large
+        if len(ntp_id_str) > ntpid_max_width:
+
+            stages = 16 + len(ntp_id_str) - ntpid_max_width
+            current_stage = int(now.timestamp() / 0.25) % stages
+
+            if current_stage < 8:
+                ntpid_temp = ntp_id_str[0:ntpid_max_width]
+            elif current_stage >= (stages - 8):
+                ntpid_temp = ntp_id_str[(len(ntp_id_str) - ntpid_max_width) :]
+            else:
+                ntpid_temp = ntp_id_str[
+                    (current_stage - 8) : (current_stage - 8 + ntpid_max_width)
+                ]
+        return ntpid_temp, ntp_str_right, ntp.peer.state == ntp.State.PEER
+
+    @classmethod
+    def expires_ntp(cls, now: Instant, data: Optional[Tuple[str, str, bool]]) -> float:
+        if data and data[0] != ntp.peer.server_id:
+            # Long server names scroll every quarter second
+            return (math.floor(now.timestamp() * 4) + 1) / 4
+        return math.inf
+
+    @classmethod
+    def state_ntp(cls) -> Tuple[Any, ...]:
+        samples = ntp.history.total if ntp.history else 0
+        return (ntp.service_status, samples, *vars(ntp.peer).values())
+
+    @classmethod
+    def format_ntp(cls, data: Optional[Tuple[str, str, bool]]) -> List[str]:
+        if data is None:
+            return []
+        ntp_str_left, ntp_str_right, synced = data
+        return [
+            (Theme.header if synced else Theme.header_alert)
+            + f" {ntp_str_left}"
+            + f'{" " * (cls.columns - len(ntp_str_left + ntp_str_right)-2)}'
+            + f"{ntp_str_right} "
+        ]
+
+    @classmethod
+    def compute_sites(cls, now: Instant) -> List[Tuple[str, str, str, str, str]]:
+        # The sites on screen with their SOL, LST, sunrise and sunset, when
+        # there are several.  The clocks they share come from shared_times().
+        rows = cls.overlay_site_rows if cls.overlay_shown() else cls.site_rows
+        if not rows:
+            return []
+        pages = math.ceil(len(cls.sites) / rows)
+        page = int(now.timestamp() // cls.site_page_seconds) % pages
+        sidereal = cls.shared_times(now)["sidereal"]
+        return [
+            (site.name, *site.times(now, sidereal), *site.events())
+            for site in cls.sites[page * rows : (page + 1) * rows]
+        ]
+
+    @classmethod
+    def expires_sites(
+        cls, now: Instant, sites: List[Tuple[str, str, str, str, str]]
+    ) -> float:
+        # Each site's seconds tick at their own phase, so redraw every frame
+        return 0.0 if sites else math.inf
+
+    @classmethod
+    def format_sites(cls, sites: List[Tuple[str, str, str, str, str]]) -> List[str]:
+        return [
+            Theme.text
+            + f" {name:<10} SOL {sol} LST {lst} RISE {rise} SET {sunset}".ljust(
+                cls.columns
+            )
+            for name, sol, lst, rise, sunset in sites
+        ]
+
+    @classmethod
+    def render_panels(cls, now: Instant) -> Dict[str, List[str]]:
+        profiler = cls.profiler
+        epoch = now.timestamp()
+        offset = now.offset
+        lines = {}
+        for widget in cls.widgets:
+            key = (offset, widget.state())
+            if widget.fresh(epoch, key):
+                lines[widget.name] = widget.lines
+                continue
+
+            if profiler is None:
+                data = widget.compute(now)
+                widget.lines = widget.format(data)
+            else:
+                start = time.perf_counter()
+                data = widget.compute(now)
+                computed = time.perf_counter()
+                widget.lines = widget.format(data)
+                profiler.record(f"{widget.name}.compute", computed - start)
+                profiler.record(f"{widget.name}.format", time.perf_counter() - computed)
+            widget.update(now, epoch, key, data)
+            lines[widget.name] = widget.lines
+        return lines
+
+    @classmethod
+    def layout(cls, site_rows: int) -> List[frame.Piece]:
+        # Static text and the (panel, line) slots it is filled with, in the
+        # order they are drawn.  Compiled into cls.template by setup().
+        pieces: List[frame.Piece] = [
+            ("header", 0),
+            "\n"
+            f"{cls.corner_ul}"
+            f"{Theme.title}NOW{Theme.border}"
+            f"{cls.h_bar * (cls.columns - 5)}"
+            f"{cls.corner_ur}\n",
+        ]
+        for i in range(len(Bar)):
+            pieces += [("bars", i), "\n"]
+
+        pieces.append(
+            f"{cls.center_l}"
+            f"{Theme.title}TIME{Theme.border}"
+            f"{cls.h_bar * (cls.columns - 24)}"
+            f"{cls.h_bar_down_connect}"
+            f"{Theme.title}DATE{Theme.border}"
+            f"{cls.h_bar * 13}"
+            f"{cls.center_r}\n"
+        )
+        for i in range(4):
+            pieces += [("times", i), f"{cls.v_bar} ", ("dates", i), f" {cls.v_bar}\n"]
+
+        pieces.append(
+            f"{cls.center_l}"
+            f"{Theme.title}WORLD{Theme.border}"
+            f"{cls.h_bar * (cls.columns - 28)}"
+            f"{cls.h_bar_down_connect}"
+            f"{Theme.title}LEAP{Theme.border}"
+            f"{cls.h_bar * 16}"
+            f"{cls.center_r}\n"
+        )
+        for i in range(len(cls.time_zone_data) // 2):
+            pieces += [
+                ("world", i),
+                f"{cls.v_bar} {Theme.text}",
+                ("leap", i),
+                f" {cls.v_bar}\n",
+            ]
+
+        pieces += [
             f"{cls.corner_ll}"
             f"{cls.h_bar * (cls.columns - 23)}"
             f"{cls.h_bar_up_connect}"
             f"{cls.h_bar * 20}"
-            f"{cls.corner_lr}\n"
-        )
+            f"{cls.corner_lr}\n",
+        ]
+        # Above the NTP line, which stays empty while NTP is not active
+        for i in range(site_rows):
+            pieces += [("sites", i), "\n"]
+        pieces += [("ntp", 0), Theme.text]
+        return pieces
+
+    @classmethod
+    def render_lines(cls, now: Optional[DateTimeLike] = None) -> Dict[frame.Piece, str]:
+        now = Instant.of(now) if now else Instant.now()
+        return {
+            (name, i): line
+            for name, panel in cls.render_panels(now).items()
+            for i, line in enumerate(panel)
+        }
 
-        if ntp.service_status == ntp.ServiceStatus.ACTIVE:
-            ntp_id_str = ntp.peer.server_id
-            ntpid_temp = ntp_id_str
+    @classmethod
+    def render(cls, now: Optional[DateTimeLike] = None) -> str:
+        lines = cls.render_lines(now)
+        start = time.perf_counter() if cls.profiler else 0
+        screen = cls.template.render_text(lines)
+        if cls.profiler:
+            cls.profiler.record("layout", time.perf_counter() - start)
+        return screen
 
-            ntp_str_right = (
-                f"ST {ntp.peer.stratum} "
-                f"DLY {float_width(float(ntp.peer.delay), 6, False)} "
-                f"OFF{float_width(float(ntp.peer.offset), 7, True)}"
-            )
+    @classmethod
+    def overlay_shown(cls) -> bool:
+        profiler = cls.profiler
+        return bool(profiler and profiler.overlay) and cls.rows > cls.board_rows
+
+    @classmethod
+    def render_grid(
+        cls, now: Optional[DateTimeLike] = None, overlay: Optional[str] = None
+    ) -> frame.Grid:
+        lines = cls.render_lines(now)
+        start = time.perf_counter() if cls.profiler else 0
+        if overlay is None:
+            grid = cls.template.fill(lines)
+        else:
+            lines[("overlay", 0)] = overlay
+            grid = cls.overlay_template.fill(lines)
+        if cls.profiler:
+            cls.profiler.record("layout", time.perf_counter() - start)
+        return grid
 
-            if ntp.peer.source:
-                ntp_str_right = f"REF {ntp.peer.source} {ntp_str_right}"
 
-            ntpid_max_width = cls.columns - len(ntp_str_right) - 3
+def parse_args(argv=None):
+    parser = ArgumentParser(prog="chronometer")
+    parser.add_argument(
+        "--check-config",
+        action="store_true",
+        help="validate ~/.chrono_config, rebuild its compiled cache and exit",
+    )
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="report the time taken by each startup phase on exit",
+    )
+    parser.add_argument(
+        "--profile-overlay",
+        action="store_true",
+        help="show per-panel render times below the display (toggle with SIGUSR1)",
+    )
+    parser.add_argument(
+        "--profile-dump",
+        metavar="FILE",
+        help="periodically write per-panel render time percentiles to FILE as JSON",
+    )
+    parser.add_argument(
+        "--profile-interval",
+        type=float,
+        default=10,
+        metavar="SECONDS",
+        help="interval between profile dumps (default: 10)",
+    )
+    parser.add_argument(
+        "--frame-stats",
+        action="store_true",
+        help="report bytes written to the terminal per frame on exit",
+    )
+    parser.add_argument(
+        "--governor-log",
+        metavar="FILE",
+        help="with adaptive = true, append the chosen frame rate and the measured "
+        "CPU use to FILE as JSON lines",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=backends.BACKENDS,
+        default="ansi",
+        help="draw with ANSI escapes, curses, or straight into a Linux framebuffer "
+        "(default: ansi)",
+    )
+    parser.add_argument(
+        "--fb-device",
+        default="/dev/fb0",
+        metavar="PATH",
+        help="framebuffer for --backend fb (default: /dev/fb0)",
+    )
+    parser.add_argument(
+        "--fb-font",
+        metavar="FILE",
+        help="PSF console font for --backend fb (default: the VGA 8x14 console "
+        "font, or the first one installed)",
+    )
+    parser.add_argument(
+        "--serve-unix",
+        metavar="PATH",
+        help="run headless and stream frames to clients of a Unix socket at PATH",
+    )
+    parser.add_argument(
+        "--serve-http",
+        metavar="[HOST:]PORT",
+        help="run headless and stream frames as Server-Sent Events over HTTP",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="[HOST:]PORT",
+        help="serve NTP and render loop metrics in Prometheus text format at "
+        "/metrics",
+    )
+    parser.add_argument(
+        "--site",
+        metavar="LABEL",
+        help="show the SOL and LST of this site from the [sites] config section "
+        "(default: the configured latitude and longitude)",
+    )
+    parser.add_argument(
+        "--warp",
+        type=parse_time,
+        metavar="TIME",
+        help="start the clock at TIME (epoch seconds or ISO 8601) instead of now",
+    )
+    parser.add_argument(
+        "--speed",
+        type=parse_speed,
+        default=1.0,
+        help="run the clock, or a replay, this many times faster (default: 1)",
+    )
+    parser.add_argument(
+        "--steps",
+        metavar="FILE",
+        help="render each time listed in FILE ('-' for stdin) as fast as possible, "
+        "report the slowest frames and exit",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="FILE",
+        help="append every rendered frame to the recording FILE",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="FILE",
+        help="play back the recording FILE on the terminal and exit",
+    )
+    parser.add_argument(
+        "--replay-from",
+        type=parse_time,
+        metavar="TIME",
+        help="start the replay at the first frame at or after TIME",
+    )
+    parser.add_argument(
+        "--size",
+        type=parse_size,
+        metavar="COLUMNSxROWS",
+        help="display size (default: the terminal size, or 60x24 when headless)",
+    )
+    return parser.parse_args(argv)
 
-            # Calculate NTP server ID scrolling if string is too large
-            if len(ntp_id_str) > ntpid_max_width:
 
-                stages = 16 + len(ntp_id_str) - ntpid_max_width
-                current_stage = int(now.timestamp() / 0.25) % stages
+def make_backend(args, sync: bool = True) -> backends.Backend:
+    if args.backend == "curses":
+        return backends.CursesBackend()
+    if args.backend == "fb":
+        return backends.FramebufferBackend(args.fb_device, args.fb_font)
+    return backends.AnsiBackend(sync=sync)
 
-                if current_stage < 8:
-                    ntpid_temp = ntp_id_str[0:ntpid_max_width]
-                elif current_stage >= (stages - 8):
-                    ntpid_temp = ntp_id_str[(len(ntp_id_str) - ntpid_max_width) :]
-                else:
-                    ntpid_temp = ntp_id_str[
-                        (current_stage - 8) : (current_stage - 8 + ntpid_max_width)
-                    ]
-            ntp_str_left = f"{ntpid_temp}"
 
-            screen += (
-                Theme.header if ntp.peer.state == ntp.State.PEER else Theme.header_alert
-            )
+def parse_size(value: str) -> os.terminal_size:
+    columns, _, rows = value.lower().partition("x")
+    return os.terminal_size((int(columns), int(rows)))
+
+
+def parse_address(value: str) -> Tuple[str, int]:
+    host, _, port = value.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def parse_speed(value: str) -> float:
+    speed = float(value)
+    if not 0 < speed < math.inf:
+        raise ArgumentTypeError(f"speed must be a positive number, not {value}")
+    return speed
+
+
+def parse_time(value: str) -> float:
+    # Epoch seconds, or ISO 8601 with naive times taken as local time
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
 
-            screen += (
-                f" {ntp_str_left}"
-                f'{" " * (cls.columns - len(ntp_str_left + ntp_str_right)-2)}'
-                f"{ntp_str_right} "
+def read_times(path: str) -> Iterable[float]:
+    lines = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    with lines:
+        for number, line in enumerate(lines, 1):
+            if line.strip():
+                try:
+                    yield parse_time(line.strip())
+                except ValueError:
+                    raise ValueError(
+                        f"{path}, line {number}: not a time: {line.strip()}"
+                    ) from None
+
+
+class StartupProfile:
+    def __init__(self, started: float) -> None:
+        self.started = started
+        self.last = started
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self) -> str:
+        lines = [f"  {phase:<12}{1000 * t:8.1f}" for phase, t in self.phases]
+        total = 1000 * (self.last - self.started)
+        return "\n".join(
+            ["Startup profile (ms):", *lines, f"  {'total':<12}{total:8.1f}"]
+        )
+
+
+class Display:
+    def __init__(
+        self,
+        profile: Optional[StartupProfile] = None,
+        sync: bool = True,
+        frame_stats: bool = False,
+        recorder: Optional[Recorder] = None,
+        backend: Optional[backends.Backend] = None,
+    ) -> None:
+        self.backend = backend or backends.AnsiBackend(sync=sync)
+        self.full_bytes = 0
+        self.frame_stats = frame_stats
+        self.profile = profile
+        self.recorder = recorder
+
+    def render(self, deadline: float) -> frame.Grid:
+        now = Instant.from_seconds(deadline)
+        overlay = None
+        profiler = Chronometer.profiler
+        if profiler and Chronometer.overlay_shown():
+            overlay = f"{Theme.text}{profiler.overlay_line(Chronometer.columns)}"
+        grid = Chronometer.render_grid(now, overlay)
+        if self.frame_stats or self.recorder:
+            template = Chronometer.overlay_template if overlay else Chronometer.template
+            screen = template.render_text(template.lines)
+            self.full_bytes += (
+                len(screen.encode("utf-8")) + Chronometer.rows - screen.count("\n") - 1
             )
-        screen += Theme.text
+            if self.recorder:
+                self.recorder.append(now.ns, screen)
+        return grid
+
+    def write(self, grid: frame.Grid) -> None:
+        start = time.perf_counter()
+        self.backend.draw(grid)
+        if Chronometer.profiler:
+            Chronometer.profiler.record("write", time.perf_counter() - start)
+        if self.profile and self.backend.frames == 1:
+            self.profile.mark("first frame")
+
+
+def simulate(display: Display, times: Iterable[float], slowest: int = 5) -> str:
+    # Renders the given times back to back, for profiling dates that are
+    # rare or far off, and reports the slowest of them
+    frames = 0
+    total = 0.0
+    worst: List[Tuple[float, float]] = []
+    for seconds in times:
+        start = time.perf_counter()
+        display.render(seconds)
+        cost = time.perf_counter() - start
+        frames += 1
+        total += cost
+        if len(worst) < slowest:
+            heapq.heappush(worst, (cost, seconds))
+        elif cost > worst[0][0]:
+            heapq.heapreplace(worst, (cost, seconds))
+    lines = [f"Frames: {frames}  Mean: {1e6 * total / max(frames, 1):.1f} us"]
+    for cost, seconds in sorted(worst, reverse=True):
+        when = Instant.from_seconds(seconds).to_datetime().isoformat()
+        lines.append(f"  {1e6 * cost:10.1f} us  {when}")
+    return "\n".join(lines)
 
-        cls.loop_time = datetime.now(pytz.utc) - start_time
-        return screen
 
+def replay(
+    path: str,
+    speed: float = 1.0,
+    start: Optional[float] = None,
+    size: Optional[os.terminal_size] = None,
+    sync: bool = True,
+) -> None:
+    # Frames go out at their recorded pace, divided by speed
+    with Recording(path) as recording:
+        rows = size.lines if size else recording.rows
+        columns = size.columns if size else recording.columns
+        backend = backends.AnsiBackend(sync=sync)
+        first = None if start is None else round(start * timecore.NS)
+        origin = None
+        for ns, screen in recording.frames(first):
+            if origin is None:
+                origin = (ns, time.perf_counter())
+            delay = (ns - origin[0]) / timecore.NS / speed
+            delay -= time.perf_counter() - origin[1]
+            if delay > 0:
+                time.sleep(delay)
+            backend.draw(frame.Grid.parse(screen, rows, columns))
 
-def run():
-    console.clear_screen()
-    console.show_cursor(False)
 
-    while True:
+def toggle_overlay(keep_profiler: bool) -> None:
+    profiler = Chronometer.profiler or Profiler()
+    profiler.overlay = not profiler.overlay
+    Chronometer.profiler = profiler if profiler.overlay or keep_profiler else None
+
+
+def run(started: Optional[float] = None):
+    profile = StartupProfile(started or time.perf_counter())
+    args = parse_args()
+    if args.check_config:
+        sys.exit(check_config())
+    if args.replay:
+        console.show_cursor(False)
         try:
-            print(Chronometer.render(), end="\n" * (Chronometer.rows - 22))
-            console.reset_cursor()
-            time.sleep(Chronometer.config.refresh)
+            replay(
+                args.replay,
+                args.speed,
+                args.replay_from,
+                args.size,
+                load_config().sync_output,
+            )
         except KeyboardInterrupt:
+            pass
+        finally:
             print(Theme.default, end="")
-            console.clear_screen()
             console.show_cursor()
-            break
+        return
+    profile.mark("import")
+    caltable.cache_dir = caltable.DEFAULT_CACHE_DIR
+    config = load_config()
+    profile.mark("config")
+    headless = bool(args.serve_unix or args.serve_http)
+    offscreen = headless or bool(args.steps)
+    try:
+        backend = None if offscreen else make_backend(args, config.sync_output)
+    except (OSError, ValueError) as e:
+        print(e)
+        exit()
+    size = args.size or (os.terminal_size((60, 24)) if offscreen else backend.size())
+    Chronometer.setup(config, size)
+    if args.site:
+        try:
+            Chronometer.select_site(args.site)
+        except ValueError as e:
+            print(e)
+            exit()
+    profile.mark("setup")
+    try:
+        recorder = (
+            Recorder(args.record, Chronometer.columns, Chronometer.rows)
+            if args.record
+            else None
+        )
+    except (OSError, ValueError) as e:
+        print(e)
+        exit()
+    display = Display(profile, config.sync_output, args.frame_stats, recorder, backend)
+    if args.profile_dump:
+        Chronometer.profiler = Profiler()
+    if args.profile_overlay:
+        toggle_overlay(bool(args.profile_dump))
+    if args.steps:
+        try:
+            print(simulate(display, read_times(args.steps)))
+        except (OSError, ValueError) as e:
+            print(e)
+        finally:
+            if recorder:
+                recorder.close()
+            if args.profile_dump:
+                Chronometer.profiler.dump(args.profile_dump)
+        return
+
+    # Only the live display runs an event loop, so asyncio and the modules
+    # built on it are imported here rather than with this module
+    from chronometer import live
+    from chronometer.tools.scheduler import FrameScheduler, WarpClock
+    from chronometer.tools.server import FrameServer
+
+    frame_server = FrameServer() if headless else None
+    warp = None
+    if args.warp is not None or args.speed != 1:
+        start = time.time() if args.warp is None else args.warp
+        warp = WarpClock(start, args.speed)
+    scheduler = FrameScheduler(
+        Chronometer.config.refresh, Chronometer.config.tolerance, warp
+    )
+    if config.adaptive:
+        console_fd = sys.stdout.fileno()
+        scheduler.governor = governor.Governor(
+            scheduler.ticks_per_second,
+            config.cpu_budget / 100,
+            1 / config.idle_refresh,
+            log=args.governor_log,
+            blank_probe=(
+                governor.display_blanked
+                if isinstance(backend, backends.FramebufferBackend)
+                or not headless
+                and governor.local_console(console_fd)
+                else None
+            ),
+            watching=(lambda: bool(frame_server.subscribers)) if frame_server else None,
+        )
+    metrics_server = None
+    if args.metrics:
+        scheduler.metrics = Metrics()
+        try:
+            metrics_server = MetricsServer(
+                scheduler.metrics, *parse_address(args.metrics)
+            )
+        except (OSError, ValueError) as e:
+            print(f"Cannot serve metrics on {args.metrics} ({e}).")
+            exit()
+        metrics_server.start()
+
+    try:
+        if backend:
+            backend.start()
+        live.run(display, scheduler, args, frame_server)
+    except KeyboardInterrupt:
+        if backend:
+            backend.stop()
+        if args.frame_stats and frame_server:
+            print(
+                f"Frames: {frame_server.frames}  "
+                f"Clients: {len(frame_server.subscribers)}  "
+                f"Late frames: {scheduler.misses} "
+                f"(max {1000 * scheduler.max_late:.1f} ms)"
+            )
+        elif args.frame_stats and isinstance(backend, backends.AnsiBackend):
+            renderer = backend.renderer
+            if renderer.frames:
+                print(
+                    f"Frames: {renderer.frames}  "
+                    f"Bytes/frame: {renderer.bytes_per_frame:.1f}  "
+                    f"(full redraw: {display.full_bytes / renderer.frames:.1f})  "
+                    f"Late frames: {scheduler.misses} "
+                    f"(max {1000 * scheduler.max_late:.1f} ms)"
+                )
+        elif args.frame_stats and backend.frames:
+            print(
+                f"Frames: {backend.frames}  "
+                f"Cells/frame: {backend.cells_per_frame:.1f}  "
+                f"Late frames: {scheduler.misses} "
+                f"(max {1000 * scheduler.max_late:.1f} ms)"
+            )
+        if args.startup_profile:
+            print(profile.report())
+    finally:
+        if metrics_server:
+            metrics_server.close()
+        if backend:
+            backend.stop()
+        if recorder:
+            recorder.close()
 
 
 if __name__ == "__main__":
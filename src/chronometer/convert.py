@@ -0,0 +1,238 @@
+import csv
+import io
+import json
+import sys
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, tzinfo
+from functools import lru_cache
+from itertools import islice
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, TextIO
+
+import pytz
+
+from chronometer.tools import cal, caltable, clock, timeutil
+
+
+@dataclass(frozen=True)
+class Options:
+    systems: tuple
+    time_zone: str = "UTC"
+    lon: float = 0.0
+    lat: float = 0.0
+    format: str = "csv"
+    field: Optional[int] = None
+    delimiter: str = ","
+
+
+@lru_cache(maxsize=None)
+def _time_zone(name: str) -> tzinfo:
+    return pytz.timezone(name)
+
+
+@lru_cache(maxsize=None)
+def _sun(lon: float, lat: float) -> timeutil.Sun:
+    return timeutil.Sun(lon=lon, lat=lat)
+
+
+def _solar_time(dt: datetime, options: Options) -> str:
+    sun = _sun(options.lon, options.lat)
+    sun.date = dt
+    sun.refresh()
+    return f"{sun.solar_noon:%H:%M:%S}"
+
+
+systems: Dict[str, Callable[[datetime, Options], str]] = {
+    "DEC": lambda dt, options: clock.metric_time(dt),
+    "SIT": lambda dt, options: clock.sit_time(dt),
+    "NET": lambda dt, options: clock.new_earth_time(dt),
+    "HEX": lambda dt, options: clock.hex_time(dt),
+    "LST": lambda dt, options: clock.sidereal_time(dt, options.lon),
+    "SOL": _solar_time,
+    "IFC": lambda dt, options: cal.int_fix_date(dt),
+    "TWC": lambda dt, options: cal.twc_date(dt),
+    "PAX": lambda dt, options: cal.pax_date(dt).strip(),
+    "JUL": lambda dt, options: repr(cal.julian_date(dt)),
+}
+
+
+def parse_timestamp(text: str, tz: tzinfo) -> datetime:
+    try:
+        return datetime.fromtimestamp(float(text), tz)
+    except ValueError:
+        pass
+    dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        return tz.localize(dt) if hasattr(tz, "localize") else dt.replace(tzinfo=tz)
+    return dt.astimezone(tz)
+
+
+def convert_lines(lines: Iterable[str], options: Options) -> Iterator[List[str]]:
+    tz = _time_zone(options.time_zone)
+    converters = [systems[name] for name in options.systems]
+    for line in lines:
+        text = line.strip()
+        if options.field is not None:
+            fields = text.split(options.delimiter)
+            text = fields[options.field].strip() if options.field < len(fields) else ""
+        try:
+            dt = parse_timestamp(text, tz)
+            yield [text, *(convert(dt, options) for convert in converters)]
+        except (ValueError, OverflowError, OSError):
+            yield [text, *("" for _ in converters)]
+
+
+def header(options: Options) -> str:
+    if options.format != "csv":
+        return ""
+    out = io.StringIO()
+    csv.writer(out, lineterminator="\n").writerow(["timestamp", *options.systems])
+    return out.getvalue()
+
+
+def convert_chunk(lines: List[str], options: Options) -> str:
+    out = io.StringIO()
+    rows = convert_lines(lines, options)
+    if options.format == "csv":
+        csv.writer(out, lineterminator="\n").writerows(rows)
+    else:
+        keys = ["timestamp", *options.systems]
+        for row in rows:
+            out.write(json.dumps(dict(zip(keys, row)), ensure_ascii=False))
+            out.write("\n")
+    return out.getvalue()
+
+
+def chunks(lines: Iterable[str], size: int) -> Iterator[List[str]]:
+    lines = iter(lines)
+    while True:
+        chunk = list(islice(lines, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _init_worker(cache_dir: Optional[str]) -> None:
+    caltable.cache_dir = cache_dir
+
+
+def convert(
+    lines: Iterable[str],
+    output: TextIO,
+    options: Options,
+    chunk_size: int = 10_000,
+    jobs: int = 1,
+) -> None:
+    output.write(header(options))
+    if jobs <= 1:
+        for chunk in chunks(lines, chunk_size):
+            output.write(convert_chunk(chunk, options))
+        return
+
+    # At most two chunks per worker are in flight, and results are written in
+    # input order, so memory use does not grow with the input size.
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=_init_worker, initargs=(caltable.cache_dir,)
+    ) as pool:
+        pending: Deque[Future] = deque()
+        for chunk in chunks(lines, chunk_size):
+            if len(pending) >= 2 * jobs:
+                output.write(pending.popleft().result())
+            pending.append(pool.submit(convert_chunk, chunk, options))
+        while pending:
+            output.write(pending.popleft().result())
+
+
+def read_lines(paths: List[str]) -> Iterator[str]:
+    if not paths:
+        yield from sys.stdin
+    for path in paths:
+        if path == "-":
+            yield from sys.stdin
+            continue
+        with open(path, encoding="utf-8", errors="replace") as f:
+            yield from f
+
+
+def parse_args(argv=None):
+    parser = ArgumentParser(
+        prog="python -m chronometer.convert",
+        description="Convert epoch or ISO 8601 timestamps to chronometer time and "
+        "date systems",
+    )
+    parser.add_argument("files", nargs="*", help="input files (default: stdin)")
+    parser.add_argument(
+        "-s",
+        "--systems",
+        default=",".join(systems),
+        help=f"comma separated systems to output (default: {','.join(systems)})",
+    )
+    parser.add_argument(
+        "-f", "--format", choices=("csv", "jsonl"), default="csv", help="output format"
+    )
+    parser.add_argument(
+        "--tz",
+        default="UTC",
+        help="time zone for naive timestamps and local time systems (default: UTC)",
+    )
+    parser.add_argument("--lon", type=float, default=0.0, help="longitude for LST/SOL")
+    parser.add_argument("--lat", type=float, default=0.0, help="latitude for SOL")
+    parser.add_argument(
+        "--field",
+        type=int,
+        help="read the timestamp from this zero based field of each line",
+    )
+    parser.add_argument(
+        "--delimiter", default=",", help="field delimiter for --field (default: ,)"
+    )
+    parser.add_argument(
+        "-o", "--output", help="output file (default: stdout)", default="-"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes (default: 1)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=10_000,
+        help="lines per chunk (default: 10000)",
+    )
+    args = parser.parse_args(argv)
+    names = tuple(name.strip().upper() for name in args.systems.split(","))
+    unknown = [name for name in names if name not in systems]
+    if unknown:
+        parser.error(f"unknown systems: {', '.join(unknown)}")
+    try:
+        _time_zone(args.tz)
+    except pytz.UnknownTimeZoneError:
+        parser.error(f"unknown time zone: {args.tz}")
+    return args, Options(
+        systems=names,
+        time_zone=args.tz,
+        lon=args.lon,
+        lat=args.lat,
+        format=args.format,
+        field=args.field,
+        delimiter=args.delimiter,
+    )
+
+
+def main(argv=None) -> int:
+    args, options = parse_args(argv)
+    caltable.cache_dir = caltable.DEFAULT_CACHE_DIR
+    if args.output == "-":
+        convert(read_lines(args.files), sys.stdout, options, args.chunk_size, args.jobs)
+    else:
+        with open(args.output, "w", encoding="utf-8", newline="") as output:
+            convert(read_lines(args.files), output, options, args.chunk_size, args.jobs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
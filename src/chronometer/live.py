@@ -0,0 +1,103 @@
+import asyncio
+import os
+import signal
+import sys
+from typing import Callable, Optional
+
+from chronometer.chrono import Chronometer, Display, parse_address, toggle_overlay
+from chronometer.tools import governor, ntpclient
+from chronometer.tools.scheduler import FrameScheduler
+from chronometer.tools.server import FrameServer
+
+# The live display's event loop, kept apart from chronometer.chrono so that
+# replays, config checks, --steps and the converters never import asyncio.
+
+
+async def dump_profile(path: str, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        if Chronometer.profiler:
+            Chronometer.profiler.dump(path)
+
+
+def watch_focus(rate_governor: governor.Governor) -> Callable[[], None]:
+    # Asks the terminal to report focus changes, and reads them from stdin
+    # without echo.  Returns the function that restores the terminal.
+    import termios
+    import tty
+
+    fd = sys.stdin.fileno()
+    attributes = termios.tcgetattr(fd)
+    tty.setcbreak(fd)
+    loop = asyncio.get_running_loop()
+
+    def read() -> None:
+        focused = governor.focus_events(os.read(fd, 1024))
+        if focused is not None:
+            rate_governor.set_focus(focused)
+
+    loop.add_reader(fd, read)
+    print(governor.FOCUS_REPORTING_ON, end="", flush=True)
+
+    def restore() -> None:
+        loop.remove_reader(fd)
+        print(governor.FOCUS_REPORTING_OFF, end="", flush=True)
+        termios.tcsetattr(fd, termios.TCSADRAIN, attributes)
+
+    return restore
+
+
+async def main(
+    display: Display,
+    scheduler: FrameScheduler,
+    args,
+    frame_server: Optional[FrameServer] = None,
+) -> None:
+    tasks = [asyncio.ensure_future(ntpclient.run())]
+    if args.profile_dump:
+        tasks.append(
+            asyncio.ensure_future(
+                dump_profile(args.profile_dump, args.profile_interval)
+            )
+        )
+    if hasattr(signal, "SIGUSR1"):
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGUSR1, toggle_overlay, bool(args.profile_dump)
+        )
+    if frame_server:
+        servers = []
+        if args.serve_unix:
+            servers.append(await frame_server.serve_unix(args.serve_unix))
+        if args.serve_http:
+            servers.append(
+                await frame_server.serve_http(*parse_address(args.serve_http))
+            )
+        write = frame_server.publish
+    else:
+        write = display.write
+    restore_terminal = None
+    if scheduler.governor and not frame_server and sys.stdin.isatty():
+        restore_terminal = watch_focus(scheduler.governor)
+    try:
+        await scheduler.run(display.render, write)
+    finally:
+        if restore_terminal:
+            restore_terminal()
+        for task in tasks:
+            task.cancel()
+        if frame_server:
+            for server in servers:
+                server.close()
+
+
+def run(
+    display: Display,
+    scheduler: FrameScheduler,
+    args,
+    frame_server: Optional[FrameServer] = None,
+) -> None:
+    asyncio.run(main(display, scheduler, args, frame_server))
+
+
+if __name__ == "__main__":
+    pass
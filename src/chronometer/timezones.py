@@ -1,27 +1,43 @@
-from typing import List
-import pytz
-from datetime import datetime
+import time
 from argparse import ArgumentParser
-
+from chronometer.tools import zoneindex
 
 if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("term", nargs="*", default="", type=str)
+    parser.add_argument(
+        "-s",
+        "--search",
+        metavar="TERM",
+        help="list zones whose zone, city or country names start with the words "
+        "of TERM, or are spelled like them",
+    )
+    parser.add_argument(
+        "-o",
+        "--offset",
+        type=zoneindex.parse_offset,
+        metavar="OFFSET",
+        help="list zones currently at this UTC offset, e.g. +0530",
+    )
+    parser.add_argument(
+        "--rebuild", action="store_true", help="rebuild the cached zone index"
+    )
     args = parser.parse_args()
+    index = zoneindex.load(rebuild=args.rebuild)
+    now = time.time()
 
-    cc_map = {
-        cc: country
-        for cc, country in pytz.country_names.items()
-        if " ".join(args.term).lower() in country.lower()
-    }
-
-    for country_code, country in cc_map.items():
-        print(f"Country: {country}")
-        timezones: List[str] = []
-        timezones += (tz for tz in pytz.all_timezones if tz.startswith(country_code))
-        for code, ctzs in pytz.country_timezones.items():
-            if code == country_code:
-                timezones += (tz for tz in ctzs)
-        for tz in timezones:
-            print(f"    {tz}: {datetime.now(pytz.timezone(zone=tz)):%z}")
-        print()
+    if args.search is not None or args.offset is not None:
+        if args.search is None:
+            zones = index.with_offset(args.offset, now)
+        else:
+            zones = index.search(args.search)
+        if args.search is not None and args.offset is not None:
+            zones = [zone for zone in zones if index.offset(zone, now) == args.offset]
+        for zone in zones:
+            print(f"{zone}: {zoneindex.format_offset(index.offset(zone, now))}")
+    else:
+        for country_code in index.find_countries(" ".join(args.term)):
+            print(f"Country: {index.countries[country_code]}")
+            for tz in index.zones_of(country_code):
+                print(f"    {tz}: {zoneindex.format_offset(index.offset(tz, now))}")
+            print()
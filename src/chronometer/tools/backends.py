@@ -0,0 +1,621 @@
+import glob
+import gzip
+import mmap
+import os
+import re
+import struct
+import sys
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from chronometer.tools import console, frame
+from chronometer.tools.frame import Cell, Grid
+
+# Output backends.  Each one takes the grid of every frame and puts the cells
+# that changed since the previous one on a display:
+#
+#   AnsiBackend         escape sequences written to the terminal
+#   CursesBackend       the terminal through curses and its terminfo entry
+#   FramebufferBackend  pixels in a memory-mapped Linux framebuffer, with no
+#                       terminal involved at all
+#
+# All of them have start(), draw(grid), stop() and size(), and count frames.
+
+RGB = Tuple[int, int, int]
+Color = Union[int, RGB]  # palette index or 24-bit colour
+
+# The Linux console (VGA) palette, which is what the panel shows in text mode
+PALETTE: Sequence[RGB] = (
+    (0, 0, 0),
+    (170, 0, 0),
+    (0, 170, 0),
+    (170, 85, 0),
+    (0, 0, 170),
+    (170, 0, 170),
+    (0, 170, 170),
+    (170, 170, 170),
+    (85, 85, 85),
+    (255, 85, 85),
+    (85, 255, 85),
+    (255, 255, 85),
+    (85, 85, 255),
+    (255, 85, 255),
+    (85, 255, 255),
+    (255, 255, 255),
+)
+DEFAULT_FG = 7
+DEFAULT_BG = 0
+
+# Console fonts tried when none is given, the VGA 8x14 one first since that
+# fills the 480x320 panel with 60x22 cells
+FONT_PATHS = (
+    "/usr/share/consolefonts/Uni2-VGA14.psf.gz",
+    "/usr/share/consolefonts/Lat15-VGA14.psf.gz",
+    "/usr/share/consolefonts/*VGA14.psf*",
+    "/usr/share/consolefonts/*.psf*",
+    "/usr/share/kbd/consolefonts/*.psf*",
+)
+
+# Geometry of a framebuffer device, and of a framebuffer file by default
+FB_SYSFS = "/sys/class/graphics/{}"
+FB_SIZE = (480, 320)
+FB_BPP = 16
+
+PSF1_MAGIC = b"\x36\x04"
+PSF2_MAGIC = b"\x72\xb5\x4a\x86"
+
+
+@lru_cache(maxsize=256)
+def sgr_colors(attr: str) -> Tuple[Optional[Color], Optional[Color]]:
+    # Foreground and background of a cell's SGR parameters, None being the
+    # terminal's default
+    fg: Optional[Color] = None
+    bg: Optional[Color] = None
+    codes = [int(code) for code in attr.split(";")] if attr else []
+    i = 0
+    while i < len(codes):
+        code = codes[i]
+        if code in (38, 48):
+            color: Color
+            if codes[i + 1] == 5:
+                color = codes[i + 2]
+                step = 3
+            else:
+                color = (codes[i + 2], codes[i + 3], codes[i + 4])
+                step = 5
+            if code == 38:
+                fg = color
+            else:
+                bg = color
+            i += step
+            continue
+        if 30 <= code <= 37:
+            fg = code - 30
+        elif 90 <= code <= 97:
+            fg = code - 82
+        elif 40 <= code <= 47:
+            bg = code - 40
+        elif 100 <= code <= 107:
+            bg = code - 92
+        i += 1
+    return fg, bg
+
+
+def rgb(color: Color) -> RGB:
+    if isinstance(color, tuple):
+        return color
+    if color < 16:
+        return PALETTE[color]
+    if color < 232:
+        # 6x6x6 colour cube
+        r, g, b = (color - 16) // 36, (color - 16) // 6 % 6, (color - 16) % 6
+        return tuple(0 if c == 0 else 55 + 40 * c for c in (r, g, b))
+    gray = 8 + 10 * (color - 232)
+    return gray, gray, gray
+
+
+@lru_cache(maxsize=1024)
+def nearest(color: Color, colors: int) -> int:
+    # Closest of the first `colors` palette entries, for terminals with fewer
+    if isinstance(color, int) and color < colors:
+        return color
+    r, g, b = rgb(color)
+    return min(
+        range(min(colors, 256)),
+        key=lambda i: sum((p - q) ** 2 for p, q in zip(rgb(i), (r, g, b))),
+    )
+
+
+def dirty_runs(
+    grid: Grid, previous: Optional[Grid]
+) -> Iterator[Tuple[int, int, List[Cell]]]:
+    # Runs of adjacent cells that differ from the previous frame, as (row,
+    # column, cells).  Every cell is dirty without a previous frame of the
+    # same size.
+    if previous is None or (previous.rows, previous.columns) != (
+        grid.rows,
+        grid.columns,
+    ):
+        for r, row in enumerate(grid.cells):
+            yield r, 0, row
+        return
+    for r, (row, old) in enumerate(zip(grid.cells, previous.cells)):
+        if row == old:
+            continue
+        start = None
+        for c in range(grid.columns):
+            if row[c] != old[c]:
+                if start is None:
+                    start = c
+            elif start is not None:
+                yield r, start, row[start:c]
+                start = None
+        if start is not None:
+            yield r, start, row[start:]
+
+
+class AnsiBackend:
+    # Escape sequences for the cells that changed, one write per frame
+    def __init__(self, fd: Optional[int] = None, sync: bool = True) -> None:
+        self.fd = fd
+        self.sync = sync
+        self.renderer = frame.DiffRenderer()
+        self.writer: Optional[frame.FrameWriter] = None
+        self.started = False
+
+    @property
+    def frames(self) -> int:
+        return self.renderer.frames
+
+    def size(self) -> os.terminal_size:
+        return os.get_terminal_size()
+
+    def _write(self, text: str) -> None:
+        if self.writer is None:
+            fd = sys.stdout.fileno() if self.fd is None else self.fd
+            self.writer = frame.FrameWriter(fd, self.sync)
+        # Anything printed before goes out ahead of it
+        sys.stdout.flush()
+        self.writer.write(text)
+
+    def start(self) -> None:
+        self.started = True
+        self._write(console.HIDE_CURSOR)
+
+    def draw(self, grid: Grid) -> None:
+        self._write(self.renderer.update(grid))
+
+    def stop(self) -> None:
+        if self.started:
+            self.started = False
+            self._write(
+                console.Color.reset + console.CLEAR + console.HOME + console.SHOW_CURSOR
+            )
+
+
+class CursesBackend:
+    # The terminal through curses, for terminals that do not take the escape
+    # sequences AnsiBackend writes.  Only the cells that changed are passed
+    # on, and curses sends what the terminal needs for them.
+    def __init__(self) -> None:
+        self.screen = None
+        self.previous: Optional[Grid] = None
+        self.attributes: Dict[str, int] = {}
+        self.frames = 0
+        self.cells_total = 0
+
+    @property
+    def cells_per_frame(self) -> float:
+        return self.cells_total / self.frames if self.frames else 0
+
+    def size(self) -> os.terminal_size:
+        return os.get_terminal_size()
+
+    def start(self) -> None:
+        import curses
+
+        self.curses = curses
+        self.screen = curses.initscr()
+        curses.noecho()
+        curses.cbreak()
+        try:
+            curses.curs_set(0)
+        except curses.error:
+            pass
+        if curses.has_colors():
+            curses.start_color()
+            curses.use_default_colors()
+
+    def _attribute(self, attr: str) -> int:
+        # Colour pairs are allocated as attributes turn up
+        attribute = self.attributes.get(attr)
+        if attribute is None:
+            curses = self.curses
+            attribute = curses.A_NORMAL
+            pair = len(self.attributes) + 1
+            if curses.has_colors() and pair < curses.COLOR_PAIRS:
+                fg, bg = sgr_colors(attr)
+                curses.init_pair(
+                    pair,
+                    -1 if fg is None else nearest(fg, curses.COLORS),
+                    -1 if bg is None else nearest(bg, curses.COLORS),
+                )
+                attribute = curses.color_pair(pair)
+            self.attributes[attr] = attribute
+        return attribute
+
+    def draw(self, grid: Grid) -> None:
+        rows, columns = self.screen.getmaxyx()
+        for r, c, cells in dirty_runs(grid, self.previous):
+            if r >= rows or c >= columns:
+                continue
+            cells = cells[: columns - c]
+            self.cells_total += len(cells)
+            start = 0
+            for i in range(1, len(cells) + 1):
+                if i == len(cells) or cells[i][1] != cells[start][1]:
+                    text = "".join(ch for ch, _ in cells[start:i])
+                    try:
+                        self.screen.addstr(
+                            r, c + start, text, self._attribute(cells[start][1])
+                        )
+                    except self.curses.error:
+                        # Writing the bottom right cell moves the cursor
+                        # off the screen
+                        pass
+                    start = i
+        self.previous = grid
+        self.frames += 1
+        self.screen.noutrefresh()
+        self.curses.doupdate()
+
+    def stop(self) -> None:
+        if self.screen is not None:
+            self.screen = None
+            self.curses.endwin()
+
+
+class Font:
+    # Bitmap glyphs as one int per row, the leftmost pixel being the highest
+    # of `width` bits
+    def __init__(self, width: int, height: int, glyphs: Dict[str, Tuple[int, ...]]):
+        self.width = width
+        self.height = height
+        self.glyphs = glyphs
+
+    @classmethod
+    def load(cls, path: str) -> "Font":
+        # A Linux console font (PSF 1 or 2, optionally gzipped)
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:2] == b"\x1f\x8b":
+            data = gzip.decompress(data)
+        if data[:2] == PSF1_MAGIC:
+            mode, height = data[2], data[3]
+            count = 512 if mode & 1 else 256
+            width, size, start, has_table = 8, height, 4, mode & 6
+        elif data[:4] == PSF2_MAGIC:
+            _, start, flags, count, size, height, width = struct.unpack_from(
+                "<7I", data, 4
+            )
+            has_table = flags & 1
+        else:
+            raise ValueError(f"Not a PSF font: {path}")
+
+        if start + count * size > len(data):
+            raise ValueError(f"Truncated PSF font: {path}")
+        stride = (width + 7) // 8
+        shift = 8 * stride - width
+        bitmaps = []
+        for i in range(count):
+            offset = start + i * size
+            bitmaps.append(
+                tuple(
+                    int.from_bytes(data[row : row + stride], "big") >> shift
+                    for row in range(offset, offset + height * stride, stride)
+                )
+            )
+
+        glyphs: Dict[str, Tuple[int, ...]] = {}
+        if not has_table:
+            for i, bitmap in enumerate(bitmaps):
+                glyphs[chr(i)] = bitmap
+        elif data[:2] == PSF1_MAGIC:
+            table = struct.unpack_from(
+                f"<{(len(data) - start - count * size) // 2}H",
+                data,
+                start + count * size,
+            )
+            glyph = 0
+            sequence = False
+            for value in table:
+                if value == 0xFFFF:
+                    glyph += 1
+                    sequence = False
+                elif value == 0xFFFE:
+                    sequence = True
+                elif not sequence and glyph < count:
+                    glyphs.setdefault(chr(value), bitmaps[glyph])
+        else:
+            entries = data[start + count * size :].split(b"\xff")
+            for glyph, entry in enumerate(entries[:count]):
+                chars = entry.split(b"\xfe")[0].decode("utf-8", "replace")
+                for ch in chars:
+                    glyphs.setdefault(ch, bitmaps[glyph])
+        return cls(width, height, glyphs)
+
+    @classmethod
+    def find(cls, path: Optional[str] = None) -> "Font":
+        if path:
+            return cls.load(path)
+        for pattern in FONT_PATHS:
+            for found in sorted(glob.glob(pattern)):
+                try:
+                    return cls.load(found)
+                except (OSError, ValueError):
+                    continue
+        raise ValueError("No console font found (install console-setup or pass one)")
+
+    def glyph(self, ch: str) -> Tuple[int, ...]:
+        bitmap = self.glyphs.get(ch)
+        if bitmap is None:
+            bitmap = drawn_glyph(ch, self.width, self.height)
+        if bitmap is None:
+            bitmap = self.glyphs.get("\ufffd") or self.glyphs.get("?")
+        return bitmap or (0,) * self.height
+
+
+# Box drawing characters missing from a font are drawn from their names
+_ARMS = {
+    "UP": "u",
+    "DOWN": "d",
+    "LEFT": "l",
+    "RIGHT": "r",
+    "HORIZONTAL": "lr",
+    "VERTICAL": "ud",
+}
+# Eighths of the cell filled by the block elements, from the bottom up or
+# the top down
+_BLOCKS = {
+    "ONE EIGHTH": 1,
+    "ONE QUARTER": 2,
+    "THREE EIGHTHS": 3,
+    "HALF": 4,
+    "FIVE EIGHTHS": 5,
+    "THREE QUARTERS": 6,
+    "SEVEN EIGHTHS": 7,
+}
+_SQUARES = {
+    "BLACK LARGE SQUARE": 1.0,
+    "BLACK SQUARE": 0.875,
+    "BLACK MEDIUM SQUARE": 0.75,
+    "BLACK MEDIUM SMALL SQUARE": 0.625,
+    "BLACK SMALL SQUARE": 0.5,
+}
+
+
+def _bars(arms: str, across: Sequence[int], width: int, height: int) -> set:
+    cx, cy = width // 2, height // 2
+    pixels = set()
+    for arm in arms:
+        for offset in across:
+            if arm in "lr":
+                span = (
+                    range(0, cx + max(across) + 1)
+                    if arm == "l"
+                    else range(cx + min(across), width)
+                )
+                pixels.update((x, cy + offset) for x in span)
+            else:
+                span = (
+                    range(0, cy + max(across) + 1)
+                    if arm == "u"
+                    else range(cy + min(across), height)
+                )
+                pixels.update((cx + offset, y) for y in span)
+    return pixels
+
+
+def drawn_glyph(ch: str, width: int, height: int) -> Optional[Tuple[int, ...]]:
+    name = unicodedata.name(ch, "")
+    pixels = None
+    if name.startswith("BOX DRAWINGS "):
+        weight, *rest = name.split()[2:]
+        if weight not in ("LIGHT", "HEAVY", "DOUBLE") or any(
+            word not in _ARMS and word != "AND" for word in rest
+        ):
+            return None
+        arms = "".join(_ARMS.get(word, "") for word in rest)
+        if weight == "DOUBLE":
+            # The outline of a pipe three pixels wide
+            pixels = _bars(arms, (-1, 0, 1), width, height) - _bars(
+                arms, (0,), width, height
+            )
+        else:
+            pixels = _bars(arms, (0,) if weight == "LIGHT" else (-1, 0), width, height)
+    elif name == "FULL BLOCK":
+        pixels = {(x, y) for x in range(width) for y in range(height)}
+    elif re.fullmatch(r"(UPPER|LOWER) .+ BLOCK", name) and name[6:-6] in _BLOCKS:
+        filled = round(height * _BLOCKS[name[6:-6]] / 8)
+        rows = range(filled) if name[0] == "U" else range(height - filled, height)
+        pixels = {(x, y) for x in range(width) for y in rows}
+    elif name in _SQUARES:
+        side = max(1, round(width * _SQUARES[name]))
+        left = (width - side) // 2
+        top = (height - side) // 2
+        pixels = {
+            (x, y) for x in range(left, left + side) for y in range(top, top + side)
+        }
+    if pixels is None:
+        return None
+    return tuple(
+        sum(1 << (width - 1 - x) for x in range(width) if (x, y) in pixels)
+        for y in range(height)
+    )
+
+
+def pack_pixel(color: RGB, bpp: int) -> bytes:
+    r, g, b = color
+    if bpp == 16:
+        return ((r >> 3) << 11 | (g >> 2) << 5 | b >> 3).to_bytes(2, "little")
+    if bpp == 24:
+        return bytes((b, g, r))
+    if bpp == 32:
+        return bytes((b, g, r, 0))
+    raise ValueError(f"Unsupported framebuffer depth: {bpp} bits per pixel")
+
+
+class GlyphAtlas:
+    # Every cell drawn so far as rows of packed pixels, by character and SGR
+    # attributes.  A cell is rasterised once, the first time it is drawn, and
+    # copied into the framebuffer row by row from then on.
+    def __init__(self, font: Font, bpp: int) -> None:
+        self.font = font
+        self.bpp = bpp
+        self.cells: Dict[Cell, Tuple[bytes, ...]] = {}
+
+    def colors(self, attr: str) -> Tuple[bytes, bytes]:
+        fg, bg = sgr_colors(attr)
+        return (
+            pack_pixel(rgb(DEFAULT_FG if fg is None else fg), self.bpp),
+            pack_pixel(rgb(DEFAULT_BG if bg is None else bg), self.bpp),
+        )
+
+    def cell(self, cell: Cell) -> Tuple[bytes, ...]:
+        rows = self.cells.get(cell)
+        if rows is None:
+            ch, attr = cell
+            fg, bg = self.colors(attr)
+            width = self.font.width
+            rows = tuple(
+                b"".join(
+                    fg if bits >> (width - 1 - x) & 1 else bg for x in range(width)
+                )
+                for bits in self.font.glyph(ch)
+            )
+            self.cells[cell] = rows
+        return rows
+
+
+def fb_geometry(path: str) -> Optional[Tuple[int, int, int, int]]:
+    # Width, height, bits per pixel and bytes per line of a framebuffer
+    # device, from sysfs
+    match = re.fullmatch(r"/dev/(fb\d+)", os.path.realpath(path))
+    if not match:
+        return None
+    sysfs = FB_SYSFS.format(match.group(1))
+    try:
+        with open(os.path.join(sysfs, "virtual_size")) as f:
+            width, height = (int(n) for n in f.read().split(","))
+        with open(os.path.join(sysfs, "bits_per_pixel")) as f:
+            bpp = int(f.read())
+        with open(os.path.join(sysfs, "stride")) as f:
+            stride = int(f.read())
+    except (OSError, ValueError):
+        return None
+    return width, height, bpp, stride
+
+
+class FramebufferBackend:
+    # Rasterises cells straight into a memory-mapped framebuffer such as
+    # /dev/fb0, which takes no terminal, no escape sequences and no font
+    # rendering by the kernel.  Only the cells that changed since the last
+    # frame are copied, from the glyph atlas.  Any other file works as a
+    # framebuffer too, with the geometry given or that of the panel.
+    def __init__(
+        self,
+        path: str = "/dev/fb0",
+        font: Optional[str] = None,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        bpp: Optional[int] = None,
+    ) -> None:
+        self.path = path
+        self.font = Font.find(font)
+        geometry = fb_geometry(path)
+        if geometry and not (width or height or bpp):
+            width, height, bpp, stride = geometry
+        else:
+            width = width or FB_SIZE[0]
+            height = height or FB_SIZE[1]
+            bpp = bpp or FB_BPP
+            stride = width * bpp // 8
+        self.width = width
+        self.height = height
+        self.bpp = bpp
+        self.stride = stride
+        self.atlas = GlyphAtlas(self.font, bpp)
+        self.previous: Optional[Grid] = None
+        self.frames = 0
+        self.cells_total = 0
+
+        self.file = open(path, "r+b")
+        length = stride * height
+        if os.path.isfile(path) and os.fstat(self.file.fileno()).st_size < length:
+            self.file.truncate(length)
+        self.buffer = mmap.mmap(self.file.fileno(), length)
+
+    @property
+    def cells_per_frame(self) -> float:
+        return self.cells_total / self.frames if self.frames else 0
+
+    def size(self) -> os.terminal_size:
+        return os.terminal_size(
+            (self.width // self.font.width, self.height // self.font.height)
+        )
+
+    def clear(self) -> None:
+        background = self.atlas.colors("")[1]
+        line = background * (self.stride // len(background))
+        line += bytes(self.stride - len(line))
+        self.buffer[:] = line * self.height
+
+    def start(self) -> None:
+        # The console cursor would blink on top of the frames
+        if sys.stdout.isatty():
+            console.show_cursor(False)
+        self.clear()
+
+    def draw(self, grid: Grid) -> None:
+        if self.previous is None or (self.previous.rows, self.previous.columns) != (
+            grid.rows,
+            grid.columns,
+        ):
+            self.clear()
+        font = self.font
+        columns, rows = self.size()
+        buffer = self.buffer
+        stride = self.stride
+        cell_bytes = font.width * self.bpp // 8
+        for r, c, cells in dirty_runs(grid, self.previous):
+            if r >= rows or c >= columns:
+                continue
+            cells = cells[: columns - c]
+            self.cells_total += len(cells)
+            # One copy per scanline of the whole run
+            pixels = [self.atlas.cell(cell) for cell in cells]
+            offset = r * font.height * stride + c * cell_bytes
+            for y in range(font.height):
+                line = b"".join(rows[y] for rows in pixels)
+                buffer[offset : offset + len(line)] = line
+                offset += stride
+        self.previous = grid
+        self.frames += 1
+
+    def stop(self) -> None:
+        if not self.buffer.closed:
+            self.clear()
+            self.buffer.close()
+            self.file.close()
+            if sys.stdout.isatty():
+                console.show_cursor()
+
+
+Backend = Union[AnsiBackend, CursesBackend, FramebufferBackend]
+
+BACKENDS = ("ansi", "curses", "fb")
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,155 @@
+from typing import List, Sequence, Tuple
+import numpy as np
+from chronometer.tools import cal, abbr, timeutil
+
+# Array counterparts of the converters in cal.py.  Inputs are NumPy arrays of
+# UTC epoch seconds, or of proleptic Gregorian day ordinals (date.toordinal())
+# when ordinal=True.  Calendar dates are returned as (weekday, month, day)
+# index arrays into abbr.weekday and abbr.Month, with day counted from 1.
+# Intercalary days have weekday -1, day 0 and one of the month values below.
+
+YEAR_DAY = -1
+LEAP_DAY = -2
+
+EPOCH_ORDINAL = 719163  # date(1970, 1, 1).toordinal()
+PAX_EPOCH_ORDINAL = 703822  # date(1928, 1, 1).toordinal()
+
+Triple = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+_twc_month_ends = np.array([31, 61, 91, 122, 152, 182, 213, 243, 273, 304, 334, 364])
+_pax_days = np.array(cal.pax_days)
+
+
+def ordinals(seconds: np.ndarray) -> np.ndarray:
+    return np.floor_divide(np.asarray(seconds), 86400).astype(np.int64) + EPOCH_ORDINAL
+
+
+def _ordinals(values: np.ndarray, ordinal: bool) -> np.ndarray:
+    return np.asarray(values, dtype=np.int64) if ordinal else ordinals(values)
+
+
+def is_leap_year(year: np.ndarray) -> np.ndarray:
+    return (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+
+
+def year_and_day(days: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    z = days - EPOCH_ORDINAL + 719468
+    era = z // 146097
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    mp = (5 * (doe - (365 * yoe + yoe // 4 - yoe // 100)) + 2) // 153
+    year = yoe + era * 400 + (mp >= 10)
+    y = year - 1
+    jan_first = 365 * y + y // 4 - y // 100 + y // 400 + 1
+    return year, days - jan_first + 1
+
+
+def julian_dates(
+    values: np.ndarray, ordinal: bool = False, reduced: bool = False
+) -> np.ndarray:
+    if ordinal:
+        jd = np.asarray(values, dtype=np.float64) + 1721424.5
+    else:
+        jd = np.asarray(values, dtype=np.float64) / 86400 + 2440587.5
+    return jd - 2400000 if reduced else jd
+
+
+def _intercalary(weekday, month, day, mask, value) -> None:
+    weekday[mask] = -1
+    month[mask] = value
+    day[mask] = 0
+
+
+def int_fix_dates(values: np.ndarray, ordinal: bool = False) -> Triple:
+    year, doy = year_and_day(_ordinals(values, ordinal))
+    leap = is_leap_year(year)
+    day = doy - (leap & (doy > 169))
+    month, day0 = np.divmod(day - 1, 28)
+    weekday = (day - 1) % 7
+    result = (weekday, month, day0 + 1)
+    _intercalary(*result, day == 365, YEAR_DAY)
+    _intercalary(*result, leap & (doy == 169), LEAP_DAY)
+    return result
+
+
+def twc_dates(values: np.ndarray, ordinal: bool = False) -> Triple:
+    year, doy = year_and_day(_ordinals(values, ordinal))
+    leap = is_leap_year(year)
+    day = doy - (leap & (doy > 183))
+    weekday = (day - 1) % 7
+    month = np.searchsorted(_twc_month_ends, day)
+    month_start = np.concatenate(([0], _twc_month_ends))[np.minimum(month, 12)]
+    result = (weekday, month, day - month_start)
+    _intercalary(*result, day == 365, YEAR_DAY)
+    _intercalary(*result, leap & (doy == 183), LEAP_DAY)
+    return result
+
+
+def is_pax_leap_year(year: np.ndarray) -> np.ndarray:
+    return ((year % 100 % 6 == 0) | (year % 100 == 99)) & (year % 400 != 0)
+
+
+def pax_years(
+    values: np.ndarray, ordinal: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    cycle, position = np.divmod(_ordinals(values, ordinal) - PAX_EPOCH_ORDINAL, 146097)
+    index = np.searchsorted(_pax_days, position, side="right") - 1
+    return 1928 + index + 400 * cycle, position - _pax_days[index]
+
+
+def pax_dates(values: np.ndarray, ordinal: bool = False) -> Triple:
+    year, doy = pax_years(values, ordinal)
+    month, day = np.divmod(doy, 28)
+    leap = is_pax_leap_year(year)
+    week = leap & (335 < doy) & (doy < 343)
+    month[week] = 12
+    day[week] = doy[week] - 336
+    after = leap & (doy >= 343)
+    month[after] = 13
+    day[after] = doy[after] - 343
+    month[~leap & (month == 12)] = 13
+    return day % 7, month, day + 1
+
+
+def leap_stats(seconds: np.ndarray) -> Tuple[np.ndarray, ...]:
+    # Array counterpart of timeutil.leap_stats.  Like the display, this works
+    # on wall clock time, so add the UTC offset to epoch seconds first.
+    seconds = np.asarray(seconds, dtype=np.float64)
+    days = np.floor_divide(seconds, 86400)
+    elapsed_today = seconds - days * 86400
+    _, doe = np.divmod(
+        days.astype(np.int64) + EPOCH_ORDINAL - timeutil.MARCH_EPOCH_ORDINAL,
+        timeutil.CYCLE_DAYS,
+    )
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    leap_day = doe - timeutil.march_days(yoe) == 365
+    elapsed = doe * 86400 + elapsed_today
+
+    leaps = yoe // 4 - yoe // 100 + np.where(leap_day, elapsed_today / 86400, 0)
+    drift = leaps * 86400 - elapsed * timeutil.DRIFT_RATE
+
+    leap = timeutil.leap_year_on_or_after(yoe + 1)
+    passed = leap_day & (elapsed_today > 0)
+    leap[passed] = timeutil.leap_year_on_or_after(yoe[passed] + 2)
+    next_leap = (timeutil.march_days(leap) - 1) * 86400 - elapsed
+
+    start = timeutil.march_days(timeutil.leap_year_on_or_before(yoe)) * 86400
+    end = timeutil.march_days(timeutil.leap_year_on_or_after(yoe + 1)) * 86400
+    return (
+        drift,
+        next_leap,
+        (elapsed - start) / (end - start),
+        elapsed / timeutil.CYCLE_SECONDS,
+    )
+
+
+def labels(dates: Triple, months: Sequence[str]) -> List[str]:
+    names = {YEAR_DAY: "*YEAR DAY*", LEAP_DAY: "*LEAP DAY*"}
+    return [
+        names[m] if m < 0 else f"{abbr.weekday[w]} {months[m]} {d:02}"
+        for w, m, d in zip(*(a.tolist() for a in dates))
+    ]
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,181 @@
+import heapq
+import math
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from chronometer.tools.timecore import EPOCH_ORDINAL
+from chronometer.tools.tzcache import ZoneTable
+
+CLOSED, OPENING, OPEN, CLOSING = range(4)
+BLINKING = (OPENING, CLOSING)
+# Fraction of each second that opening zones are lit, and closing zones dark
+BLINK = 0.1
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+DEFAULT_HOURS = (9 * 3600, 17 * 3600, [0, 1, 2, 3, 4])
+DEFAULT_WARNING = 3600
+
+HoursSpec = Tuple[int, int, List[int]]
+
+
+def parse_clock(text: str) -> int:
+    hours, _, minutes = text.strip().partition(":")
+    seconds = int(hours) * 3600 + int(minutes or 0) * 60
+    if not 0 <= seconds <= 86400:
+        raise ValueError(f"Invalid time of day: {text}")
+    return seconds
+
+
+def parse_days(text: str) -> List[int]:
+    # "mon-fri", "sun-thu" or "mon,wed,fri" as weekdays, Monday being 0
+    days: List[int] = []
+    for part in text.lower().replace(" ", "").split(","):
+        first, _, last = part.partition("-")
+        start = WEEKDAYS.index(first[:3])
+        end = WEEKDAYS.index(last[:3]) if last else start
+        days += ((start + i) % 7 for i in range((end - start) % 7 + 1))
+    return sorted(set(days))
+
+
+def parse_hours(text: str) -> HoursSpec:
+    # "09:00-17:00 mon-fri", with the days defaulting to Monday to Friday
+    span, _, days = text.strip().partition(" ")
+    opens, _, closes = span.partition("-")
+    hours = (
+        parse_clock(opens),
+        parse_clock(closes),
+        parse_days(days) if days.strip() else DEFAULT_HOURS[2],
+    )
+    if hours[0] >= hours[1]:
+        raise ValueError(f"Closing time before opening time: {text}")
+    return hours
+
+
+def parse_holidays(text: str) -> List[int]:
+    # Comma separated ISO dates as days since 1970-01-01
+    return [
+        date.fromisoformat(day.strip()).toordinal() - EPOCH_ORDINAL
+        for day in text.split(",")
+        if day.strip()
+    ]
+
+
+def lit(state: int, fraction: float) -> bool:
+    # Whether a zone is highlighted this far into the current second
+    if state == OPENING:
+        return fraction < BLINK
+    if state == CLOSING:
+        return fraction >= BLINK
+    return state == OPEN
+
+
+class Hours:
+    # Opening hours in local time.  Zones blink for `warning` seconds before
+    # opening and after closing, within the same local day.
+    def __init__(
+        self,
+        opens: int,
+        closes: int,
+        days: Iterable[int],
+        holidays: Iterable[int] = (),
+        warning: int = DEFAULT_WARNING,
+    ) -> None:
+        self.days = frozenset(days)
+        self.holidays = frozenset(holidays)
+        self.boundaries = (
+            max(opens - warning, 0),
+            opens,
+            closes,
+            min(closes + warning, 86400),
+        )
+
+    def working(self, day: int) -> bool:
+        return (day + 3) % 7 in self.days and day not in self.holidays
+
+    def state(self, local: float) -> int:
+        day, seconds = divmod(local, 86400)
+        if not self.working(int(day)):
+            return CLOSED
+        warn, opens, closes, done = self.boundaries
+        if seconds < warn or seconds >= done:
+            return CLOSED
+        if seconds < opens:
+            return OPENING
+        return OPEN if seconds < closes else CLOSING
+
+    def next_change(self, local: float) -> float:
+        # The first local time after `local` at which state() can change
+        day = math.floor(local / 86400)
+        for d in range(day, day + 367):
+            if self.working(d):
+                for boundary in self.boundaries:
+                    if d * 86400 + boundary > local:
+                        return d * 86400 + boundary
+        return math.inf
+
+
+class Schedule:
+    # Open or closed state of every zone, kept current by a heap holding
+    # the next time each zone's state or UTC offset can change.  Frames in
+    # between only look at the head of the heap, however many zones there are.
+    def __init__(self, zones: Sequence[Tuple[str, ZoneTable, Hours]]) -> None:
+        self.zones = list(zones)
+        self.index = {label: i for i, (label, _, _) in enumerate(self.zones)}
+        self.states = [CLOSED] * len(self.zones)
+        self.queue: List[Tuple[float, int]] = []
+        self.epoch: Optional[float] = None
+
+    @classmethod
+    def compile(
+        cls,
+        zones: Sequence[Tuple[str, ZoneTable]],
+        hours: Dict[str, HoursSpec],
+        holidays: Dict[str, List[int]],
+        warning: int = DEFAULT_WARNING,
+    ) -> "Schedule":
+        # Zones without hours or holidays of their own use the "DEFAULT" ones
+        default = hours.get("DEFAULT", DEFAULT_HOURS)
+        common = holidays.get("DEFAULT", [])
+        return cls(
+            [
+                (
+                    label,
+                    table,
+                    Hours(
+                        *hours.get(label, default),
+                        holidays=[*common, *holidays.get(label, [])],
+                        warning=warning,
+                    ),
+                )
+                for label, table in zones
+            ]
+        )
+
+    def _update(self, i: int, epoch: float) -> None:
+        _, table, hours = self.zones[i]
+        offset = table.offset(epoch)
+        local = epoch + offset
+        self.states[i] = hours.state(local)
+        change = hours.next_change(local) - offset
+        heapq.heappush(self.queue, (min(change, table.valid_until), i))
+
+    def advance(self, epoch: float) -> None:
+        if self.epoch is None or epoch < self.epoch:
+            self.queue = []
+            for i in range(len(self.zones)):
+                self._update(i, epoch)
+        self.epoch = epoch
+        queue = self.queue
+        while queue and queue[0][0] <= epoch:
+            self._update(heapq.heappop(queue)[1], epoch)
+
+    @property
+    def next_change(self) -> float:
+        return self.queue[0][0] if self.queue else math.inf
+
+    def state(self, label: str) -> int:
+        return self.states[self.index[label]]
+
+
+if __name__ == "__main__":
+    pass
@@ -1,9 +1,15 @@
-from datetime import datetime
-from chronometer.tools import timeutil, abbr
+from datetime import date
+from functools import lru_cache
+from typing import Callable, List
+from chronometer.tools import timeutil, abbr, caltable
+from chronometer.tools.timecore import DateTimeLike, Instant
 from itertools import accumulate
 
 
-def julian_date(date: datetime, reduced: bool = False) -> float:
+def julian_date(date: DateTimeLike, reduced: bool = False) -> float:
+    if isinstance(date, Instant):
+        jd = date.julian_date()
+        return jd - 2400000 if reduced else jd
     a = (14 - date.month) // 12
     y = date.year + 4800 - a
     m = date.month + 12 * a - 3
@@ -18,44 +24,43 @@ def julian_date(date: datetime, reduced: bool = False) -> float:
     return jd - 2400000 if reduced else jd
 
 
-def int_fix_date(date: datetime) -> str:
-    ordinal = timeutil.day_of_year(date)
-    if timeutil.is_leap_year(date):
-        if ordinal > 169:
-            ordinal -= 1
-        elif ordinal == 169:
-            return "*LEAP DAY*"
-    if ordinal == 365:
-        return "*YEAR DAY*"
-    month, day = divmod(ordinal - 1, 28)
-    day += 1
-    week = (ordinal - 1) % 7
-    return f"{abbr.weekday[week]} {abbr.Month.ifc[month]} {day:02}"
-
-
-def twc_date(date: datetime) -> str:
-    day = timeutil.day_of_year(date)
-
-    if timeutil.is_leap_year(date):
-        if day == 366:
-            return "*YEAR DAY*"
-        elif day == 183:
-            return "*LEAP DAY*"
-        elif day > 183:
-            day -= 1
-
-    if day == 365:
-        return "*YEAR DAY*"
-    weekday = (day - 1) % 7
-    month = 0
-    for _ in range(0, 4):
-        for j in [31, 30, 30]:
-            if day - j > 0:
-                day -= j
-                month += 1
-            else:
-                break
-    return f"{abbr.weekday[weekday]} {abbr.Month.twc[month]} {day:02}"
+def _ifc_year(leap: bool) -> List[str]:
+    days = [
+        f"{abbr.weekday[day % 7]} {month} {day + 1:02}"
+        for month in abbr.Month.ifc
+        for day in range(28)
+    ]
+    if leap:
+        days.insert(168, "*LEAP DAY*")
+    days.append("*YEAR DAY*")
+    return days
+
+
+def _twc_year(leap: bool) -> List[str]:
+    days = []
+    for m, month in enumerate(abbr.Month.twc):
+        for day in range(1, [31, 30, 30][m % 3] + 1):
+            days.append(f"{abbr.weekday[len(days) % 7]} {month} {day:02}")
+    if leap:
+        days.insert(182, "*LEAP DAY*")
+    days.append("*YEAR DAY*")
+    return days
+
+
+def _build_gregorian(year_days: Callable[[bool], List[str]]) -> caltable.CycleTable:
+    years = {leap: year_days(leap) for leap in (False, True)}
+    days = [
+        day for year in range(1, 401) for day in years[timeutil.is_leap_year(year)]
+    ]
+    return caltable.CycleTable.from_days(anchor=1, days=days)
+
+
+def _build_ifc() -> caltable.CycleTable:
+    return _build_gregorian(_ifc_year)
+
+
+def _build_twc() -> caltable.CycleTable:
+    return _build_gregorian(_twc_year)
 
 
 def is_pax_leap_year(year: int):
@@ -73,34 +78,55 @@ pax_days = list(
 )
 
 
-def pax_date(date: datetime) -> str:
-    cycle, position = divmod(
-        (date.replace(tzinfo=None) - datetime(month=1, day=1, year=1928)).days, 146_097
-    )
-    day = 0
-    pax_year = 0
-    pax_day_of_year = 0
-    for i in range(len(pax_days)):
-        pax_year = i + 1928 + 400 * cycle
-        if pax_days[i] <= position < pax_days[i + 1]:
-            pax_day_of_year = position - pax_days[i]
-            break
-
-    month, day = divmod(pax_day_of_year, 28)
-
-    if is_pax_leap_year(pax_year):
-        if 335 < pax_day_of_year < 343:
-            month = 12
-            day = pax_day_of_year - 336
-        elif pax_day_of_year >= 343:
-            month = 13
-            day = pax_day_of_year - 343
-    else:
-        if month == 12:
+def _pax_year(leap: bool) -> List[str]:
+    days = []
+    for pax_day_of_year in range(364 + 7 * leap):
+        month, day = divmod(pax_day_of_year, 28)
+        if leap:
+            if 335 < pax_day_of_year < 343:
+                month = 12
+                day = pax_day_of_year - 336
+            elif pax_day_of_year >= 343:
+                month = 13
+                day = pax_day_of_year - 343
+        elif month == 12:
             month = 13
+        days.append(f"{abbr.weekday[day % 7]} {abbr.Month.pax[month]} {day + 1:02}")
+    return days
+
+
+def _build_pax() -> caltable.CycleTable:
+    anchor = date(year=1928, month=1, day=1).toordinal()
+    years = {leap: _pax_year(leap) for leap in (False, True)}
+    days = []
+    for i in range(400):
+        year = 1928 + i
+        # Days of the PAX year that still fall in the previous Gregorian year
+        ahead = date(year=year, month=1, day=1).toordinal() - anchor - pax_days[i]
+        pax_year = years[is_pax_leap_year(year)]
+        days += ("+" + day for day in pax_year[: max(ahead, 0)])
+        days += (" " + day for day in pax_year[max(ahead, 0) :])
+    return caltable.CycleTable.from_days(anchor=anchor, days=days)
+
+
+_builders = {"ifc": _build_ifc, "twc": _build_twc, "pax": _build_pax}
+
+
+@lru_cache(maxsize=None)
+def cycle_table(name: str) -> caltable.CycleTable:
+    return caltable.load(name, _builders[name])
+
+
+def int_fix_date(date: DateTimeLike) -> str:
+    return cycle_table("ifc")[date.toordinal()]
+
+
+def twc_date(date: DateTimeLike) -> str:
+    return cycle_table("twc")[date.toordinal()]
+
 
-    sign = "+" if pax_year > date.year else " "
-    return f"{sign}{abbr.weekday[day % 7]} {abbr.Month.pax[month]} {day + 1:02}"
+def pax_date(date: DateTimeLike) -> str:
+    return cycle_table("pax")[date.toordinal()]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+import os
+import sys
+from array import array
+from typing import Callable, Dict, List, Optional
+
+CYCLE_DAYS = 146_097  # days in the 400 year Gregorian cycle
+CACHE_VERSION = 1
+
+# Directory to persist built tables in.  Tables are only built in memory
+# when this is left unset.
+cache_dir: Optional[str] = None
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "chronometer")
+
+
+class CycleTable:
+    def __init__(self, anchor: int, labels: List[str], index: array) -> None:
+        self.anchor = anchor
+        self.labels = labels
+        self.index = index
+
+    @classmethod
+    def from_days(cls, anchor: int, days: List[str]) -> "CycleTable":
+        palette: Dict[str, int] = {}
+        index = array("H", (palette.setdefault(d, len(palette)) for d in days))
+        if len(index) != CYCLE_DAYS:
+            raise ValueError(f"Expected {CYCLE_DAYS} days, got {len(index)}")
+        return cls(anchor, list(palette), index)
+
+    def __getitem__(self, ordinal: int) -> str:
+        return self.labels[self.index[(ordinal - self.anchor) % CYCLE_DAYS]]
+
+    def to_bytes(self) -> bytes:
+        labels = "\n".join(self.labels).encode("utf-8")
+        header = f"{CACHE_VERSION} {sys.byteorder} {self.anchor} {len(labels)}\n"
+        return header.encode("ascii") + labels + self.index.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CycleTable":
+        header, _, body = data.partition(b"\n")
+        version, byteorder, anchor, size = header.decode("ascii").split()
+        if int(version) != CACHE_VERSION or byteorder != sys.byteorder:
+            raise ValueError("Incompatible calendar table cache")
+        index = array("H")
+        index.frombytes(body[int(size) :])
+        if len(index) != CYCLE_DAYS:
+            raise ValueError("Truncated calendar table cache")
+        labels = body[: int(size)].decode("utf-8").split("\n")
+        return cls(int(anchor), labels, index)
+
+
+def load(name: str, build: Callable[[], CycleTable]) -> CycleTable:
+    if cache_dir is None:
+        return build()
+
+    path = os.path.join(cache_dir, f"{name}.table")
+    try:
+        with open(path, "rb") as f:
+            return CycleTable.from_bytes(f.read())
+    except (OSError, ValueError):
+        pass
+
+    table = build()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(table.to_bytes())
+        os.replace(f"{path}.tmp", path)
+    except OSError:
+        pass
+    return table
+
+
+if __name__ == "__main__":
+    pass
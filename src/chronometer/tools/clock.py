@@ -1,55 +1,71 @@
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta, time, timezone
 from typing import Union
 from chronometer.tools import cal
-import pytz
+from chronometer.tools.timecore import DAY_NS, JULIAN_EPOCH, NS, DateTimeLike, Instant
 
-
-TimeLike = Union[datetime, time]
+TimeLike = Union[Instant, datetime, time]
 
 
 def _day_percent(t: TimeLike):
+    if isinstance(t, Instant):
+        return t.day_ns / DAY_NS
     t = t.time() if isinstance(t, datetime) else t
     return (
         t.hour * 3600 + t.minute * 60 + t.second + t.microsecond / 1_000_000
     ) / 86400
 
 
-def sidereal_time(dt: datetime, lon: float) -> str:
-    utc_offset = dt.utcoffset()
-    offset = utc_offset.total_seconds() / 3600 if utc_offset else 0
-    j = (
-        cal.julian_date(dt)
-        - 2451545.0
-        + 0.5
-        - timedelta(hours=offset).total_seconds() / 86400
-    )
+def hms(seconds: int) -> str:
+    minutes, second = divmod(seconds, 60)
+    hour, minute = divmod(minutes, 60)
+    return f"{hour:02}:{minute:02}:{second:02}"
+
+
+def sidereal_angle(dt: DateTimeLike) -> float:
+    # Greenwich sidereal angle in degrees, not reduced to [0, 360), so that
+    # adding a longitude gives the same result as sidereal_time
+    if isinstance(dt, Instant):
+        j = dt.ns / DAY_NS + JULIAN_EPOCH - 2451545.0 + 0.5
+    else:
+        utc_offset = dt.utcoffset()
+        offset = utc_offset.total_seconds() / 86400 if utc_offset else 0
+        j = cal.julian_date(dt) - 2451545.0 + 0.5 - offset
     l0 = 99.967794687
     l1 = 360.98564736628603
     l2 = 2.907879 * (10**-13)
     l3 = -5.302 * (10**-22)
-    θ = (l0 + (l1 * j) + (l2 * (j**2)) + (l3 * (j**3)) + lon) % 360
-    result = int(timedelta(hours=θ / 15).total_seconds())
-    hour, remainder = divmod(result, 3600)
-    minute, second = divmod(remainder, 60)
-    return f"{hour:02}:{minute:02}:{second:02}"
+    return l0 + (l1 * j) + (l2 * (j**2)) + (l3 * (j**3))
+
 
+def local_sidereal_time(angle: float, lon: float) -> str:
+    θ = (angle + lon) % 360
+    return hms(int(θ * 240))
 
-def new_earth_time(dt: datetime) -> str:
-    percent_complete = _day_percent(dt.astimezone(pytz.utc))
+
+def sidereal_time(dt: DateTimeLike, lon: float) -> str:
+    return local_sidereal_time(sidereal_angle(dt), lon)
+
+
+def new_earth_time(dt: DateTimeLike) -> str:
+    if isinstance(dt, Instant):
+        percent_complete = dt.ns % DAY_NS / DAY_NS
+    else:
+        percent_complete = _day_percent(dt.astimezone(timezone.utc))
     degrees, remainder = divmod(int(1296000 * percent_complete), 3600)
     degrees, remainder = int(degrees), int(remainder)
     minutes, seconds = divmod(remainder, 60)
     return f"{degrees:03.0f}°{minutes:02.0f}'{seconds:02.0f}\""
 
 
-def sit_time(dt: datetime) -> str:
-    cet_date = dt.astimezone(pytz.timezone("Etc/GMT-1"))
-    percent_complete = _day_percent(cet_date)
+def sit_time(dt: DateTimeLike) -> str:
+    if isinstance(dt, Instant):
+        percent_complete = (dt.ns + 3600 * NS) % DAY_NS / DAY_NS
+    else:
+        percent_complete = _day_percent(dt.astimezone(timezone(timedelta(hours=1))))
     return f"@{round(percent_complete*1000, 5):09.5f}"
 
 
 def hex_time(t: TimeLike) -> str:
-    t = t.time() if isinstance(t, datetime) else t
     percent_complete = _day_percent(t)
     hours, remainder = divmod(int(percent_complete * 2**28), 2**24)
     minutes, seconds = divmod(remainder, 2**16)
@@ -58,19 +74,22 @@ def hex_time(t: TimeLike) -> str:
 
 
 def metric_time(t: TimeLike) -> str:
-    t = t.time() if isinstance(t, datetime) else t
     percent_complete = _day_percent(t)
     hours, remainder = divmod(int(percent_complete * 100_000), 10_000)
     minutes, seconds = divmod(remainder, 100)
     return f"{hours:02}:{minutes:02}:{seconds:02}"
 
 
-def unix_time(dt: datetime) -> str:
+def unix_time(dt: DateTimeLike) -> str:
+    if isinstance(dt, Instant):
+        return str(dt.ns // NS)
     return str(int(dt.timestamp()))
 
 
-def utc_time(dt: datetime) -> str:
-    return f"{dt.astimezone(pytz.utc):%H:%M:%S}"
+def utc_time(dt: DateTimeLike) -> str:
+    if isinstance(dt, Instant):
+        return hms(dt.ns // NS % 86400)
+    return f"{dt.astimezone(timezone.utc):%H:%M:%S}"
 
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+import importlib.util
+import json
+import os
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from chronometer.tools.tzcache import ZoneTable
+
+CACHE_VERSION = 1
+
+# A validated config and the transition tables of its time zones, compiled
+# into one file next to the config.  Loading it needs a single read and
+# neither configparser nor the pytz zone files.  The cache is used while the
+# config file keeps its modification time and size, or failing that its
+# SHA-256 digest, and while the installed pytz stays the same.
+
+Zones = List[Tuple[str, ZoneTable]]
+
+
+def cache_path(config_path: str) -> str:
+    return f"{config_path}.cache"
+
+
+def _stamp(path: Optional[str]) -> Optional[List[int]]:
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def tzdata_stamp() -> Optional[List[int]]:
+    # find_spec locates pytz without importing it
+    spec = importlib.util.find_spec("pytz")
+    return _stamp(spec.origin if spec else None)
+
+
+def digest(data: bytes) -> str:
+    # Only needed when the config file was touched, so imported here
+    import hashlib
+
+    return hashlib.sha256(data).hexdigest()
+
+
+def to_bytes(
+    settings: Dict[str, Any],
+    zones: Sequence,
+    config: bytes,
+    config_stamp: Optional[List[int]] = None,
+) -> bytes:
+    transitions = array("d")
+    offsets = array("i")
+    for _, table in zones:
+        transitions.extend(table.transitions)
+        offsets.extend(table.offsets)
+    header = {
+        "version": CACHE_VERSION,
+        "byteorder": sys.byteorder,
+        "tzdata": tzdata_stamp(),
+        "config": config_stamp,
+        "digest": digest(config),
+        "settings": settings,
+        "zones": [[label, table.name, len(table.offsets)] for label, table in zones],
+    }
+    return (
+        json.dumps(header).encode("utf-8")
+        + b"\n"
+        + transitions.tobytes()
+        + offsets.tobytes()
+    )
+
+
+def from_bytes(data: bytes) -> Tuple[Dict[str, Any], Zones]:
+    line, _, body = data.partition(b"\n")
+    header = json.loads(line)
+    count = sum(size for _, _, size in header["zones"])
+    transitions = array("d")
+    offsets = array("i")
+    split = count * transitions.itemsize
+    transitions.frombytes(body[:split])
+    offsets.frombytes(body[split:])
+    if len(transitions) != count or len(offsets) != count:
+        raise ValueError("Truncated config cache")
+
+    zones: Zones = []
+    start = 0
+    for label, name, size in header["zones"]:
+        end = start + size
+        zones.append(
+            (label, ZoneTable(name, transitions[start:end], offsets[start:end]))
+        )
+        start = end
+    return header["settings"], zones
+
+
+def load(config_path: str) -> Optional[Tuple[Dict[str, Any], Zones]]:
+    try:
+        with open(cache_path(config_path), "rb") as f:
+            data = f.read()
+        line = data.partition(b"\n")[0]
+        header = json.loads(line)
+        if (
+            header.get("version") != CACHE_VERSION
+            or header.get("byteorder") != sys.byteorder
+            or header.get("tzdata") != tzdata_stamp()
+        ):
+            return None
+        stamp = _stamp(config_path)
+        if header.get("config") != stamp:
+            with open(config_path, "rb") as f:
+                if digest(f.read()) != header.get("digest"):
+                    return None
+            # Touched but not changed, so stamped again for the next start
+            # to skip the digest
+            header["config"] = stamp
+            _write(
+                cache_path(config_path),
+                json.dumps(header).encode("utf-8") + data[len(line) :],
+            )
+        return from_bytes(data)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write(path: str, data: bytes) -> bool:
+    try:
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+    except OSError:
+        return False
+    return True
+
+
+def save(config_path: str, settings: Dict[str, Any], zones: Sequence) -> bool:
+    # Zones whose offsets are only known by asking their tzinfo are not
+    # cached, and neither is anything when the directory is not writable.
+    if any(table.tz is not None for _, table in zones):
+        return False
+    try:
+        # Stamped before reading, so an edit made meanwhile is not missed
+        stamp = _stamp(config_path)
+        with open(config_path, "rb") as f:
+            data = to_bytes(settings, zones, f.read(), stamp)
+    except OSError:
+        return False
+    return _write(cache_path(config_path), data)
+
+
+if __name__ == "__main__":
+    pass
@@ -1,4 +1,7 @@
-import os
+HIDE_CURSOR = "\33[?25l"
+SHOW_CURSOR = "\33[?25h"
+CLEAR = "\33[2J"
+HOME = "\33[H"
 
 
 def reset_cursor() -> None:
@@ -6,14 +9,11 @@ def reset_cursor() -> None:
 
 
 def show_cursor(on: bool = True) -> None:
-    if on:
-        print("\33[?25h")
-    else:
-        print("\33[?25l")
+    print(SHOW_CURSOR if on else HIDE_CURSOR)
 
 
 def clear_screen() -> None:
-    os.system("cls" if os.name == "nt" else "clear")
+    print(CLEAR + HOME, end="", flush=True)
 
 
 class Color:
@@ -0,0 +1,289 @@
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+Cell = Tuple[str, str]  # (character, SGR parameters)
+
+BLANK: Cell = (" ", "")
+
+# Unchanged cells shorter than this between two changed runs are rewritten
+# rather than skipped, since a cursor move costs about as many bytes.
+MERGE_GAP = 6
+
+# Synchronized output: terminals that support it hold the screen between
+# these, so a frame is never shown half drawn.  Others ignore them.
+SYNC_BEGIN = b"\33[?2026h"
+SYNC_END = b"\33[?2026l"
+
+_sgr = re.compile(r"\x1b\[([\d;]*)m")
+
+Pen = Tuple[str, str]  # (foreground, background) SGR parameters
+
+
+@lru_cache(maxsize=1024)
+def _apply_sgr(params: str, fg: str, bg: str) -> Tuple[str, str]:
+    codes = params.split(";") if params else ["0"]
+    i = 0
+    while i < len(codes):
+        code = codes[i]
+        if code in ("", "0"):
+            fg, bg = "", ""
+        elif code in ("38", "48"):
+            step = 3 if codes[i + 1 : i + 2] == ["5"] else 5
+            value = ";".join(codes[i : i + step])
+            if code == "38":
+                fg = value
+            else:
+                bg = value
+            i += step - 1
+        elif code == "39":
+            fg = ""
+        elif code == "49":
+            bg = ""
+        elif 30 <= int(code) <= 37 or 90 <= int(code) <= 97:
+            fg = code
+        elif 40 <= int(code) <= 47 or 100 <= int(code) <= 107:
+            bg = code
+        i += 1
+    return fg, bg
+
+
+@lru_cache(maxsize=256)
+def _attr(fg: str, bg: str) -> str:
+    return ";".join(p for p in (fg, bg) if p)
+
+
+def parse_lines(text: str, pen: Pen = ("", "")) -> Tuple[List[List[Cell]], Pen]:
+    # Cells of each line of text, and the SGR state at its end
+    fg, bg = pen
+    attr = _attr(fg, bg)
+    cells: List[Cell] = []
+    lines = [cells]
+    for i, chunk in enumerate(_sgr.split(text)):
+        if i % 2:
+            fg, bg = _apply_sgr(chunk, fg, bg)
+            attr = _attr(fg, bg)
+        elif "\n" not in chunk:
+            cells += [(ch, attr) for ch in chunk]
+        else:
+            for line_no, line in enumerate(chunk.split("\n")):
+                if line_no:
+                    cells = []
+                    lines.append(cells)
+                cells += [(ch, attr) for ch in line]
+    return lines, (fg, bg)
+
+
+class Grid:
+    def __init__(
+        self, rows: int, columns: int, cells: Optional[List[List[Cell]]] = None
+    ) -> None:
+        self.rows = rows
+        self.columns = columns
+        self.cells: List[List[Cell]] = cells or [[BLANK] * columns for _ in range(rows)]
+
+    @classmethod
+    def parse(cls, text: str, rows: int, columns: int) -> "Grid":
+        grid = cls(rows, columns)
+        lines, _ = parse_lines(text)
+        for row, line in enumerate(lines[:rows]):
+            grid.place(row, 0, line)
+        return grid
+
+    def place(self, row: int, col: int, cells: List[Cell]) -> None:
+        if row < self.rows and col < self.columns and cells:
+            cells = cells[: self.columns - col]
+            self.cells[row][col : col + len(cells)] = cells
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Grid) and self.cells == other.cells
+
+
+Piece = Union[str, Hashable]
+
+
+class Template:
+    # A screen layout compiled once per size.  Pieces are either static text
+    # or slot keys (any other hashable), each filled with one line of text per
+    # frame.  The static cells are parsed at compile time, along with the row
+    # and column of every slot, so a frame only parses the slot lines that
+    # changed.  Static text is parsed again only when the SGR state it starts
+    # in differs from the one it was compiled with.
+
+    def __init__(self, pieces: Sequence[Piece], rows: int, columns: int) -> None:
+        self.pieces: List[Piece] = []
+        for piece in pieces:
+            if isinstance(piece, str) and self.pieces:
+                if isinstance(self.pieces[-1], str):
+                    self.pieces[-1] += piece
+                    continue
+            self.pieces.append(piece)
+        self.rows = rows
+        self.columns = columns
+        self.base: Optional[Grid] = None
+        self.widths: Dict[Hashable, int] = {}
+        # Per piece: (row, column, SGR state in, SGR state out) at compile time
+        self.positions: List[Tuple[int, int, Pen, Pen]] = []
+        self.slot_cache: Dict[Hashable, Tuple[str, Pen, List[Cell], Pen]] = {}
+        self.lines: Dict[Hashable, str] = {}  # of the last frame filled
+        self.compiles = 0
+
+    def render_text(self, lines: Dict[Hashable, str]) -> str:
+        return "".join(
+            piece if isinstance(piece, str) else lines.get(piece, "")
+            for piece in self.pieces
+        )
+
+    def _parse_slot(self, key: Hashable, text: str, pen: Pen) -> Tuple[List[Cell], Pen]:
+        cached = self.slot_cache.get(key)
+        if cached and cached[0] == text and cached[1] == pen:
+            return cached[2], cached[3]
+        lines, end = parse_lines(text, pen)
+        if len(lines) > 1:
+            raise ValueError(f"slot {key!r} must be a single line")
+        self.slot_cache[key] = (text, pen, lines[0], end)
+        return lines[0], end
+
+    def compile(self, lines: Dict[Hashable, str]) -> None:
+        # Slot widths are taken from the given lines, and a frame whose slots
+        # have other widths compiles the template again.
+        base = Grid(self.rows, self.columns)
+        self.widths = {}
+        self.positions = []
+        self.compiles += 1
+        row = col = 0
+        pen: Pen = ("", "")
+        for piece in self.pieces:
+            if isinstance(piece, str):
+                parsed, end = parse_lines(piece, pen)
+                self.positions.append((row, col, pen, end))
+                for line_no, cells in enumerate(parsed):
+                    if line_no:
+                        row += 1
+                        col = 0
+                    base.place(row, col, cells)
+                    col += len(cells)
+            else:
+                cells, end = self._parse_slot(piece, lines.get(piece, ""), pen)
+                self.positions.append((row, col, pen, end))
+                self.widths[piece] = len(cells)
+                col += len(cells)
+            pen = end
+        self.base = base
+
+    def fill(self, lines: Dict[Hashable, str]) -> Grid:
+        if self.base is None:
+            self.compile(lines)
+        self.lines = lines
+        rows = [row[:] for row in self.base.cells]
+        grid = Grid(self.rows, self.columns, rows)
+        pen: Pen = ("", "")
+        for piece, (row, col, pen_in, pen_out) in zip(self.pieces, self.positions):
+            if isinstance(piece, str):
+                if pen == pen_in:
+                    pen = pen_out
+                    continue
+                parsed, pen = parse_lines(piece, pen)
+                for line_no, cells in enumerate(parsed):
+                    if line_no:
+                        row += 1
+                        col = 0
+                    grid.place(row, col, cells)
+                    col += len(cells)
+                continue
+            cells, pen = self._parse_slot(piece, lines.get(piece, ""), pen)
+            if len(cells) != self.widths[piece]:
+                self.compile(lines)
+                return self.fill(lines)
+            grid.place(row, col, cells)
+        return grid
+
+
+class DiffRenderer:
+    def __init__(self) -> None:
+        self.previous: Optional[Grid] = None
+        self.pen: Optional[str] = None
+        self.frames = 0
+        self.bytes_total = 0
+        self.bytes_last = 0
+
+    @property
+    def bytes_per_frame(self) -> float:
+        return self.bytes_total / self.frames if self.frames else 0
+
+    def reset(self) -> None:
+        self.previous = None
+        self.pen = None
+
+    def _run(self, out: List[str], row: int, col: int, cells: List[Cell]) -> None:
+        out.append(f"\33[{row + 1};{col + 1}H")
+        pen = self.pen
+        for ch, attr in cells:
+            if attr != pen:
+                out.append(f"\33[0;{attr}m" if attr else "\33[0m")
+                pen = attr
+            out.append(ch)
+        self.pen = pen
+
+    def update(self, grid: Grid) -> str:
+        out: List[str] = []
+        previous = self.previous
+        if (
+            previous is None
+            or previous.rows != grid.rows
+            or previous.columns != grid.columns
+        ):
+            out.append("\33[0m\33[2J")
+            self.pen = ""
+            for r, row in enumerate(grid.cells):
+                self._run(out, r, 0, row)
+        else:
+            for r, (row, old) in enumerate(zip(grid.cells, previous.cells)):
+                if row == old:
+                    continue
+                changed = [c for c in range(grid.columns) if row[c] != old[c]]
+                start = end = changed[0]
+                for c in changed[1:]:
+                    if c - end > MERGE_GAP:
+                        self._run(out, r, start, row[start : end + 1])
+                        start = c
+                    end = c
+                self._run(out, r, start, row[start : end + 1])
+
+        self.previous = grid
+        output = "".join(out)
+        self.bytes_last = len(output.encode("utf-8"))
+        self.bytes_total += self.bytes_last
+        self.frames += 1
+        return output
+
+
+class FrameWriter:
+    # Writes each frame to a file descriptor from one reused buffer, with a
+    # single os.write unless the descriptor takes less than the whole frame.
+    def __init__(self, fd: int, sync: bool = True) -> None:
+        self.fd = fd
+        self.sync = sync
+        self.buffer = bytearray()
+        self.writes = 0
+
+    def write(self, text: str) -> None:
+        if not text:
+            return
+        buffer = self.buffer
+        del buffer[:]
+        if self.sync:
+            buffer += SYNC_BEGIN
+        buffer += text.encode("utf-8")
+        if self.sync:
+            buffer += SYNC_END
+        with memoryview(buffer) as view:
+            written = 0
+            while written < len(view):
+                written += os.write(self.fd, view[written:])
+                self.writes += 1
+
+
+if __name__ == "__main__":
+    pass
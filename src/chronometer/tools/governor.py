@@ -0,0 +1,173 @@
+import glob
+import json
+import os
+import re
+import time
+from typing import Callable, Optional
+
+# Power state files of the displays and backlights attached to this machine
+DPMS_GLOB = "/sys/class/drm/card*-*/dpms"
+BACKLIGHT_GLOB = "/sys/class/backlight/*/bl_power"
+
+# Terminal focus reporting (xterm, and most terminals since)
+FOCUS_REPORTING_ON = "\33[?1004h"
+FOCUS_REPORTING_OFF = "\33[?1004l"
+FOCUS_IN = b"\33[I"
+FOCUS_OUT = b"\33[O"
+
+
+def _read(path: str) -> str:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def display_blanked() -> bool:
+    # Whether every display attached to this machine is powered down
+    off = [
+        _read(path) != "On"
+        for path in glob.glob(DPMS_GLOB)
+        if _read(os.path.join(os.path.dirname(path), "status")) == "connected"
+    ]
+    off += (_read(path) not in ("", "0") for path in glob.glob(BACKLIGHT_GLOB))
+    return bool(off) and all(off)
+
+
+def local_console(fd: int) -> bool:
+    # Blanking only says anything about a terminal on the attached display
+    try:
+        return re.fullmatch(r"/dev/(tty\d+|console)", os.ttyname(fd)) is not None
+    except OSError:
+        return False
+
+
+def focus_events(data: bytes) -> Optional[bool]:
+    # The focus state reported last in a chunk of terminal input, if any
+    focus_in, focus_out = data.rfind(FOCUS_IN), data.rfind(FOCUS_OUT)
+    if focus_in == focus_out:
+        return None
+    return focus_in > focus_out
+
+
+class Governor:
+    # Chooses the frame rate every `interval` seconds.  That is the target
+    # rate, lowered so the process stays within `budget` of one CPU core, and
+    # lowered to `idle` while the terminal is out of focus, the display is
+    # blanked or nobody is watching.  The rate the budget allows rises at
+    # most twofold per interval.
+    def __init__(
+        self,
+        target: float,
+        budget: float = 0.0,
+        idle: float = 1.0,
+        interval: float = 5.0,
+        log: Optional[str] = None,
+        blank_probe: Optional[Callable[[], bool]] = None,
+        watching: Optional[Callable[[], bool]] = None,
+    ) -> None:
+        self.target = target
+        self.budget = budget
+        self.idle = min(idle, target)
+        self.interval = interval
+        self.log = log
+        self.blank_probe = blank_probe
+        self.watching = watching
+        self.focused = True
+        self.blanked = False
+        self.watched = True
+        self.rate = target
+        self.affordable = target
+        self.reason = "target"
+        self.cpu = 0.0
+        self.frame_cpu = 0.0
+        self._wall = time.monotonic()
+        self._cpu = time.process_time()
+        self._frames = 0
+        self._changed = False
+
+    def due(self, wall: float) -> bool:
+        return wall - self._wall >= self.interval
+
+    def set_focus(self, focused: bool) -> None:
+        if focused != self.focused:
+            self.focused = focused
+            self._changed = True
+
+    def _watch(self) -> None:
+        if self.watching is not None:
+            watched = self.watching()
+            if watched != self.watched:
+                self.watched = watched
+                self._changed = True
+
+    def poll(self, frames: int) -> Optional[float]:
+        # Called after every frame, returns the new rate when it changes
+        wall = time.monotonic()
+        self._watch()
+        if self.due(wall):
+            rate = self.update(frames, wall)
+        elif self._changed:
+            rate = self.choose()
+        else:
+            return None
+        self._changed = False
+        return rate
+
+    def choose(self) -> float:
+        rate, reason = self.target, "target"
+        if self.affordable < rate:
+            rate, reason = self.affordable, "budget"
+        for idle, why in (
+            (self.blanked, "blanked"),
+            (not self.watched, "unwatched"),
+            (not self.focused, "unfocused"),
+        ):
+            if idle and self.idle < rate:
+                rate, reason = self.idle, why
+                break
+        self.rate, self.reason = rate, reason
+        return rate
+
+    def update(self, frames: int, wall: Optional[float] = None) -> float:
+        # Measures the CPU time used since the last update, per second and
+        # per frame, and returns the rate to run at until the next one
+        wall = time.monotonic() if wall is None else wall
+        cpu = time.process_time()
+        elapsed = wall - self._wall
+        used = cpu - self._cpu
+        if elapsed > 0:
+            self.cpu = used / elapsed
+        if frames > self._frames:
+            self.frame_cpu = used / (frames - self._frames)
+            if self.budget and self.frame_cpu > 0:
+                self.affordable = min(
+                    self.budget / self.frame_cpu, 2 * self.affordable, self.target
+                )
+        self._wall, self._cpu, self._frames = wall, cpu, frames
+        if self.blank_probe is not None:
+            self.blanked = self.blank_probe()
+        self._watch()
+        rate = self.choose()
+        if self.log:
+            self.write_log()
+        return rate
+
+    def write_log(self) -> None:
+        entry = {
+            "time": round(time.time(), 3),
+            "rate": round(self.rate, 3),
+            "reason": self.reason,
+            "cpu": round(self.cpu, 4),
+            "frame_ms": round(1000 * self.frame_cpu, 3),
+        }
+        try:
+            with open(self.log, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,296 @@
+import math
+import os
+import socket
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from chronometer.tools import ntp
+
+# Prometheus text exposition format
+CONTENT_TYPE = b"text/plain; version=0.0.4; charset=utf-8"
+NOT_FOUND = b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+
+# Upper bounds of the frame time buckets, in seconds
+FRAME_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+)
+
+Sample = Tuple[str, float]  # (labels, value)
+
+
+def format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def label(name: str, value: str) -> str:
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'{{{name}="{escaped}"}}'
+
+
+def family(
+    lines: List[str], name: str, kind: str, help: str, samples: Iterable[Sample]
+) -> None:
+    lines.append(f"# HELP {name} {help}")
+    lines.append(f"# TYPE {name} {kind}")
+    lines += (f"{name}{labels} {format_value(value)}" for labels, value in samples)
+
+
+def resident_memory() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Histogram:
+    def __init__(self, bounds: Sequence[float] = FRAME_BUCKETS) -> None:
+        self.bounds = tuple(bounds)
+        # Per bucket, not cumulative, with the last one above every bound
+        self.counts = array("q", bytes(8 * (len(self.bounds) + 1)))
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        # (suffix, labels, value) in exposition order
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            samples.append(("_bucket", label("le", format_value(bound)), cumulative))
+        samples.append(("_bucket", label("le", "+Inf"), self.count))
+        samples.append(("_sum", "", self.sum))
+        samples.append(("_count", "", self.count))
+        return samples
+
+
+class Metrics:
+    # Health of the render loop and of NTP, kept as one complete HTTP
+    # response.  The render loop serializes it again at most once per
+    # `interval`, between frames, and the metrics server thread only ever
+    # sends the bytes it finds, so a scrape neither takes a lock nor makes
+    # the render loop wait.
+    def __init__(self, interval: float = 1.0) -> None:
+        self.interval = interval
+        self.render = Histogram()
+        self.write = Histogram()
+        self.frames = 0
+        self.misses = 0
+        self.max_late = 0.0
+        self.response = b""
+        self.serialized = 0.0
+        self.update()
+
+    def frame(self, render: float, write: float, late: float, missed: bool) -> None:
+        self.render.observe(render)
+        self.write.observe(write)
+        self.frames += 1
+        self.misses += missed
+        self.max_late = max(self.max_late, late)
+        if time.monotonic() - self.serialized >= self.interval:
+            self.update()
+
+    def update(self) -> None:
+        body = self.serialize().encode("utf-8")
+        self.response = (
+            b"HTTP/1.1 200 OK\r\nContent-Type: %s\r\nContent-Length: %d\r\n"
+            b"Connection: close\r\n\r\n" % (CONTENT_TYPE, len(body))
+        ) + body
+        self.serialized = time.monotonic()
+
+    def serialize(self) -> str:
+        lines: List[str] = []
+        for name, histogram, help in (
+            ("render", self.render, "Time taken to compute and lay out a frame."),
+            ("write", self.write, "Time taken to put a frame on the display."),
+        ):
+            metric = f"chronometer_frame_{name}_seconds"
+            lines.append(f"# HELP {metric} {help}")
+            lines.append(f"# TYPE {metric} histogram")
+            lines += (
+                f"{metric}{suffix}{labels} {format_value(value)}"
+                for suffix, labels, value in histogram.samples()
+            )
+        family(
+            lines,
+            "chronometer_frames_total",
+            "counter",
+            "Frames rendered.",
+            [("", self.frames)],
+        )
+        family(
+            lines,
+            "chronometer_deadline_misses_total",
+            "counter",
+            "Frames finished later than the configured tolerance.",
+            [("", self.misses)],
+        )
+        family(
+            lines,
+            "chronometer_frame_lateness_max_seconds",
+            "gauge",
+            "Latest finish of a frame after its deadline.",
+            [("", self.max_late)],
+        )
+        self.serialize_ntp(lines)
+        rss = resident_memory()
+        if rss is not None:
+            family(
+                lines,
+                "process_resident_memory_bytes",
+                "gauge",
+                "Resident memory size in bytes.",
+                [("", rss)],
+            )
+        return "\n".join(lines) + "\n"
+
+    def serialize_ntp(self, lines: List[str]) -> None:
+        family(
+            lines,
+            "chronometer_ntp_service_status",
+            "gauge",
+            "State of the NTP service.",
+            [
+                (
+                    label("status", status.name.lower()),
+                    int(status == ntp.service_status),
+                )
+                for status in ntp.ServiceStatus
+            ],
+        )
+        if ntp.service_status != ntp.ServiceStatus.ACTIVE:
+            return
+        peer = ntp.peer
+        family(
+            lines,
+            "chronometer_ntp_synced",
+            "gauge",
+            "Whether a system peer is selected.",
+            [("", int(peer.state == ntp.State.PEER))],
+        )
+        selected = label("peer", peer.server_id)
+        for name, value, help in (
+            ("offset_seconds", peer.offset / 1000, "Offset of the system peer."),
+            (
+                "delay_seconds",
+                peer.delay / 1000,
+                "Round trip delay to the system peer.",
+            ),
+            ("jitter_seconds", peer.jitter / 1000, "Jitter of the system peer."),
+            ("stratum", peer.stratum, "Stratum of the system peer."),
+        ):
+            family(lines, f"chronometer_ntp_{name}", "gauge", help, [(selected, value)])
+
+        histories = [
+            (label("peer", key), history) for key, history in ntp.histories.items()
+        ]
+        for name, help, value in (
+            (
+                "samples",
+                "Samples held in the peer's history.",
+                lambda history: len(history),
+            ),
+            (
+                "offset_mean_seconds",
+                "Mean offset over the peer's history.",
+                lambda history: history.mean("offset") / 1000,
+            ),
+            (
+                "offset_stddev_seconds",
+                "Standard deviation of the offset over the peer's history.",
+                lambda history: history.stddev("offset") / 1000,
+            ),
+            (
+                "allan_deviation",
+                "Allan deviation of the peer's frequency over its history.",
+                lambda history: history.allan_deviation(),
+            ),
+        ):
+            family(
+                lines,
+                f"chronometer_ntp_peer_{name}",
+                "gauge",
+                help,
+                [(labels, value(history)) for labels, history in histories],
+            )
+
+
+class MetricsServer(threading.Thread):
+    # Answers GET /metrics on its own thread, one connection at a time, with
+    # a single write of the response the render loop prepared last
+    def __init__(
+        self, metrics: Metrics, host: str, port: int, timeout: float = 2.0
+    ) -> None:
+        super().__init__(name="metrics", daemon=True)
+        self.metrics = metrics
+        self.timeout = timeout
+        self.scrapes = 0
+        self.sock = socket.create_server((host, port))
+
+    @property
+    def port(self) -> int:
+        return self.sock.getsockname()[1]
+
+    def run(self) -> None:
+        while True:
+            try:
+                connection, _ = self.sock.accept()
+            except OSError:
+                return
+            with connection:
+                connection.settimeout(self.timeout)
+                try:
+                    self.handle(connection)
+                except OSError:
+                    pass
+
+    def handle(self, connection: socket.socket) -> None:
+        request = b""
+        while b"\r\n\r\n" not in request:
+            data = connection.recv(4096)
+            if not data or len(request) > 8192:
+                return
+            request += data
+        request_line = request.split(b"\r\n", 1)[0].split()
+        if (
+            len(request_line) >= 2
+            and request_line[0] == b"GET"
+            and request_line[1].split(b"?")[0] == b"/metrics"
+        ):
+            connection.sendall(self.metrics.response)
+            self.scrapes += 1
+        else:
+            connection.sendall(NOT_FOUND)
+
+    def close(self) -> None:
+        try:
+            # Wakes the thread blocked in accept()
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    pass
@@ -1,11 +1,16 @@
+import ipaddress
 import re
-import subprocess
+import socket
+import struct
 import time
-import threading
 from enum import Enum
 from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union
 import os
 
+from chronometer.tools.peerhistory import PeerHistory
+
 
 class State(Enum):
     NO_STATE = " "
@@ -27,21 +32,35 @@ service_status = ServiceStatus.NOTFOUND
 
 
 class RegexPattern:
-    pattern = re.compile(
-        r"([\*\#\+\-\~ ])"  # 0 - Peer Status
-        r"([\w+\-\.(): ]+)\s+"  # 1 - Server ID
-        r"([\w\.]+)\s+"  # 2 - Reference ID
-        r"(\d+)\s+"  # 3 - Stratum
-        r"(\w+)\s+"  # 4 - Type
-        r"(\d+)\s+"  # 5 - When
-        r"(\d+)\s+"  # 6 - Poll
-        r"(\d+)\s+"  # 7 - Reach
-        r"([\d\.]+)\s+"  # 8 - Delay
-        r"\+*([\-\d\.]+)\s+"  # 9 - Offset
-        r"([\d\.]+)"  # 10- Jitter
-    )
-
     refid = re.compile(r"^\.(\S+)\.$")
+    variable = re.compile(r'(\w+)=("[^"]*"|[^,]*)')
+
+
+class ControlError(ValueError):
+    # The server answered, but refused the request
+    pass
+
+
+class Opcode:
+    READSTAT = 1
+    READVAR = 2
+
+
+# Poller settings, read on every poll.  "control" queries the peers of the
+# local ntpd with NTP control (mode 6) messages, "sntp" queries server directly.
+mode = "control"
+server = "127.0.0.1"
+port = 123
+timeout = 1.0
+interval = 3.0
+resolve_names = True
+# Samples kept per peer
+history_size = 1024
+
+NTP_EPOCH = 2208988800  # seconds from 1900-01-01 to 1970-01-01
+PEER_VARIABLES = (
+    b"srcadr,srchost,refid,stratum,hmode,rec,reach,hpoll,ppoll,delay,offset,jitter"
+)
 
 
 @dataclass
@@ -88,62 +107,173 @@ class NtpPeer:
 
 peer = NtpPeer()
 
+# Recent samples of every peer the daemon reports, and of the selected one
+histories: Dict[str, PeerHistory] = {}
+history: Optional[PeerHistory] = None
+
+# Peer selection codes from the peer status word, in ntpq tally order
+select_states = [
+    State.NO_STATE,
+    State.DISCARD1,
+    State.DISCARD2,
+    State.DISCARD2,
+    State.PREFERRED,
+    State.BACKUP,
+    State.PEER,
+    State.PPSPEER,
+]
+
+host_modes = {1: "s", 2: "s", 3: "u", 4: "u", 5: "B", 6: "b"}
+
+
+def to_ntp_time(timestamp: float) -> bytes:
+    seconds = timestamp + NTP_EPOCH
+    return struct.pack(">II", int(seconds), int((seconds % 1) * 2**32))
+
+
+def from_ntp_time(data: Union[bytes, str]) -> float:
+    if isinstance(data, str):
+        seconds, _, fraction = data[2:].partition(".")
+        return int(seconds, 16) + int(fraction or "0", 16) / 2**32 - NTP_EPOCH
+    seconds, fraction = struct.unpack(">II", data)
+    return seconds + fraction / 2**32 - NTP_EPOCH
+
+
+def control_request(
+    opcode: int, sequence: int, association: int = 0, data: bytes = b""
+) -> bytes:
+    header = struct.pack(
+        ">BBHHHHH", 0x16, opcode & 0x1F, sequence, 0, association, 0, len(data)
+    )
+    return header + data + b"\0" * (-len(data) % 4)
+
 
-def ntp_daemon() -> None:
-    global peer
-
-    while True:
-        try:
-            ntpq_full = subprocess.run(
-                ["ntpq", "-pw"], stdout=subprocess.PIPE
-            ).stdout.decode("utf-8")
-            ntp_peer_data = RegexPattern.pattern.findall(ntpq_full)
-            ntp_servers = [
-                NtpPeer(
-                    state=State(p[0]),
-                    server_id=p[1],
-                    ref_id=p[2],
-                    stratum=p[3],
-                    type=p[4],
-                    when=p[5],
-                    poll=p[6],
-                    reach=p[7],
-                    delay=p[8],
-                    offset=p[9],
-                    jitter=p[10],
-                )
-                for p in ntp_peer_data
-            ]
-
-            current_peers = [s for s in ntp_servers if s.state == State.PEER]
-            if current_peers:
-                peer = current_peers[0]
-            else:
-                peer = NtpPeer()
-        except Exception as e:
-            peer.server_id = str(e)
-        time.sleep(3)
-
-
-def run() -> None:
-    global service_status
-    ntp_service_response = os.system("systemctl --no-pager status ntp")
-    time.sleep(1)
-
-    if ntp_service_response == 0:
-        service_status = ServiceStatus.ACTIVE
-    elif ntp_service_response == 768:
-        service_status = ServiceStatus.INACTIVE
+def parse_control(packet: bytes) -> Tuple[int, int, int, int, bool, int, bytes]:
+    if len(packet) < 12:
+        raise ValueError("Short NTP control packet")
+    li_vn_mode, r_e_m_op, sequence, status, association, offset, count = struct.unpack(
+        ">BBHHHHH", packet[:12]
+    )
+    if li_vn_mode & 0x07 != 6 or not r_e_m_op & 0x80:
+        raise ValueError("Not an NTP control response")
+    if r_e_m_op & 0x40:
+        raise ControlError(f"NTP control error {status >> 8}")
+    more = bool(r_e_m_op & 0x20)
+    return (
+        r_e_m_op & 0x1F,
+        sequence,
+        status,
+        association,
+        more,
+        offset,
+        packet[12 : 12 + count],
+    )
+
+
+def parse_variables(data: bytes) -> Dict[str, str]:
+    return {
+        name: value.strip().strip('"')
+        for name, value in RegexPattern.variable.findall(
+            data.decode("ascii", "replace")
+        )
+    }
+
+
+def is_address(text: str) -> bool:
+    try:
+        ipaddress.ip_address(text)
+    except ValueError:
+        return False
+    return True
+
+
+@lru_cache(maxsize=64)
+def hostname(address: str) -> str:
+    try:
+        return socket.gethostbyaddr(address)[0]
+    except (OSError, UnicodeError):
+        return address
+
+
+def peer_from_variables(status: int, variables: Dict[str, str]) -> NtpPeer:
+    stratum = int(variables.get("stratum", 16))
+    ref_id = variables.get("refid", "")
+    if stratum <= 1 or stratum >= 16:
+        ref_id = f".{ref_id}."
+    address = variables.get("srcadr", "")
+    if address.startswith("127.127."):
+        peer_type = "l"
     else:
-        service_status = ServiceStatus.NOTFOUND
+        peer_type = host_modes.get(int(variables.get("hmode", 0)), "-")
+    rec = variables.get("rec", "")
+    return NtpPeer(
+        state=select_states[(status >> 8) & 0x07],
+        server_id=variables.get("srchost") or address,
+        ref_id=ref_id,
+        stratum=stratum,
+        type=peer_type,
+        when=int(time.time() - from_ntp_time(rec)) if rec.startswith("0x") else 0,
+        poll=1 << min(int(variables.get("hpoll", 0)), int(variables.get("ppoll", 0))),
+        reach=int(variables.get("reach", "0"), 16),
+        delay=float(variables.get("delay", 0)),
+        offset=float(variables.get("offset", 0)),
+        jitter=float(variables.get("jitter", 0)),
+    )
+
+
+def sntp_request(transmit: float) -> bytes:
+    return b"\x23" + b"\0" * 39 + to_ntp_time(transmit)
+
+
+def parse_sntp(packet: bytes, request: bytes, arrival: float, host: str) -> NtpPeer:
+    if len(packet) < 48 or packet[0] & 0x07 not in (4, 5):
+        raise ValueError("Not an SNTP response")
+    if packet[24:32] != request[40:48]:
+        raise ValueError("SNTP response does not match request")
+    leap, stratum = packet[0] >> 6, packet[1]
+    if stratum <= 1 or stratum >= 16:
+        ref_id = "." + packet[12:16].rstrip(b"\0").decode("ascii", "replace") + "."
+    else:
+        ref_id = socket.inet_ntoa(packet[12:16])
+    t1 = from_ntp_time(request[40:48])
+    t2 = from_ntp_time(packet[32:40])
+    t3 = from_ntp_time(packet[40:48])
+    valid = 0 < stratum < 16 and leap != 3
+    return NtpPeer(
+        state=State.PEER if valid else State.NO_STATE,
+        server_id=host,
+        ref_id=ref_id,
+        stratum=stratum,
+        type="u",
+        poll=int(interval),
+        delay=((arrival - t1) - (t3 - t2)) * 1000,
+        offset=((t2 - t1) + (t3 - arrival)) * 500,
+    )
+
+
+def record(peers: List[NtpPeer], now: float) -> None:
+    # Adds each peer's sample when it differs from its last one, since the
+    # daemon only measures a peer once per poll interval.  A peer dropped by
+    # the daemon is dropped here too, so pool servers coming and going over
+    # months of uptime do not pile up.
+    global histories
+    kept: Dict[str, PeerHistory] = {}
+    for current in peers:
+        key = current.server_id
+        peer_history = kept.get(key) or histories.get(key) or PeerHistory(history_size)
+        sample = (current.offset, current.delay, current.jitter)
+        if not peer_history.count or sample != tuple(
+            peer_history.latest(name) for name in ("offset", "delay", "jitter")
+        ):
+            peer_history.append(now, *sample, current.stratum)
+        kept[key] = peer_history
+    histories = kept
+
 
-    if service_status == ServiceStatus.ACTIVE:
-        thread = threading.Thread(target=ntp_daemon)
-        thread.setDaemon(True)
-        thread.start()
+def select_peer(peers: List[NtpPeer]) -> NtpPeer:
+    current_peers = [p for p in peers if p.state == State.PEER]
+    return current_peers[0] if current_peers else NtpPeer()
 
 
 if __name__ == "__main__":
     pass
-else:
-    run()
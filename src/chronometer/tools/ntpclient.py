@@ -0,0 +1,185 @@
+import abc
+import asyncio
+import struct
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from chronometer.tools import ntp
+
+# The poller: asyncio clients for NTP control and SNTP queries, and the daemon
+# that keeps the peer state in chronometer.tools.ntp up to date.  Only the
+# event loop imports it, so rendering that state does not load asyncio.
+
+
+class Endpoint(asyncio.DatagramProtocol):
+    def __init__(self) -> None:
+        self.queue: "asyncio.Queue[Union[bytes, Exception]]" = asyncio.Queue()
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.queue.put_nowait(data)
+
+    def error_received(self, exc: Exception) -> None:
+        self.queue.put_nowait(exc)
+
+
+class Client(abc.ABC):
+    def __init__(self, host: str, port: int = 123, timeout: float = 1.0) -> None:
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.endpoint = Endpoint()
+
+    async def open(self) -> None:
+        loop = asyncio.get_running_loop()
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: self.endpoint, remote_addr=(self.host, self.port)
+        )
+
+    def close(self) -> None:
+        if self.transport:
+            self.transport.close()
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        self.close()
+
+    async def receive(self) -> bytes:
+        data = await self.endpoint.queue.get()
+        if isinstance(data, Exception):
+            raise data
+        return data
+
+    async def peers(self) -> List[ntp.NtpPeer]:
+        return await asyncio.wait_for(self.query(), self.timeout)
+
+    @abc.abstractmethod
+    async def query(self) -> List[ntp.NtpPeer]:
+        pass
+
+
+class ControlClient(Client):
+    sequence = 0
+
+    async def request(
+        self, opcode: int, association: int = 0, data: bytes = b""
+    ) -> bytes:
+        self.sequence = self.sequence % 0xFFFF + 1
+        self.transport.sendto(
+            ntp.control_request(opcode, self.sequence, association, data)
+        )
+        fragments: Dict[int, bytes] = {}
+        last = None
+        while last is None or sum(map(len, fragments.values())) < last:
+            try:
+                op, sequence, _, assoc, more, offset, payload = ntp.parse_control(
+                    await self.receive()
+                )
+            except ntp.ControlError:
+                raise
+            except ValueError:
+                continue
+            if (op, sequence, assoc) != (opcode, self.sequence, association):
+                continue
+            fragments[offset] = payload
+            if not more:
+                last = offset + len(payload)
+        return b"".join(fragments[offset] for offset in sorted(fragments))
+
+    async def associations(self) -> List[Tuple[int, int]]:
+        data = await self.request(ntp.Opcode.READSTAT)
+        if len(data) % 4:
+            raise ValueError("Short NTP association list")
+        return [struct.unpack(">HH", data[i : i + 4]) for i in range(0, len(data), 4)]
+
+    async def variables(
+        self, association: int, names: bytes = ntp.PEER_VARIABLES
+    ) -> Dict[str, str]:
+        return ntp.parse_variables(
+            await self.request(ntp.Opcode.READVAR, association, names)
+        )
+
+    async def query(self) -> List[ntp.NtpPeer]:
+        return [
+            ntp.peer_from_variables(status, await self.variables(association))
+            for association, status in await self.associations()
+        ]
+
+
+class SntpClient(Client):
+    async def query(self) -> List[ntp.NtpPeer]:
+        request = ntp.sntp_request(time.time())
+        self.transport.sendto(request)
+        while True:
+            packet = await self.receive()
+            arrival = time.time()
+            try:
+                return [ntp.parse_sntp(packet, request, arrival, self.host)]
+            except ValueError:
+                continue
+
+
+async def ntp_daemon() -> None:
+    loop = asyncio.get_running_loop()
+    client = None
+    settings = None
+
+    while True:
+        try:
+            if settings != (ntp.mode, ntp.server, ntp.port, ntp.timeout):
+                if client:
+                    client.close()
+                settings = (ntp.mode, ntp.server, ntp.port, ntp.timeout)
+                client_type = SntpClient if ntp.mode == "sntp" else ControlClient
+                client = client_type(ntp.server, ntp.port, ntp.timeout)
+                await client.open()
+            peers = await client.peers()
+            ntp.record(peers, time.time())
+            current = ntp.select_peer(peers)
+            ntp.history = ntp.histories.get(current.server_id)
+            if ntp.resolve_names and ntp.is_address(current.server_id):
+                current.server_id = await loop.run_in_executor(
+                    None, ntp.hostname, current.server_id
+                )
+            ntp.peer = current
+        except (OSError, ValueError, asyncio.TimeoutError) as e:
+            settings = None
+            ntp.peer.server_id = str(e) or "NO RESPONSE"
+        await asyncio.sleep(ntp.interval)
+
+
+async def detect_service() -> ntp.ServiceStatus:
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "systemctl",
+            "--no-pager",
+            "status",
+            "ntp",
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        returncode = await process.wait()
+    except OSError:
+        return ntp.ServiceStatus.NOTFOUND
+
+    try:
+        return ntp.ServiceStatus(returncode << 8)
+    except ValueError:
+        return ntp.ServiceStatus.NOTFOUND
+
+
+async def run() -> None:
+    if ntp.mode == "sntp":
+        ntp.service_status = ntp.ServiceStatus.ACTIVE
+    else:
+        ntp.service_status = await detect_service()
+
+    if ntp.service_status == ntp.ServiceStatus.ACTIVE:
+        await ntp_daemon()
+
+
+if __name__ == "__main__":
+    pass
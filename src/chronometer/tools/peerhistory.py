@@ -0,0 +1,139 @@
+import math
+from array import array
+from typing import List, Sequence
+
+# Bar heights, lowest first
+SPARKS = "▁▂▃▄▅▆▇█"
+
+COLUMNS = ("time", "offset", "delay", "jitter", "stratum")
+
+
+def sparkline(values: Sequence[float]) -> str:
+    # One bar per value, scaled between the smallest and largest of them
+    if not values:
+        return ""
+    low, high = min(values), max(values)
+    if high == low:
+        return SPARKS[len(SPARKS) // 2 - 1] * len(values)
+    scale = (len(SPARKS) - 1) / (high - low)
+    return "".join(SPARKS[round((value - low) * scale)] for value in values)
+
+
+class PeerHistory:
+    # The last `capacity` samples of one NTP peer.  Each column is an
+    # array('d') used as a ring buffer, allocated once, so memory stays the
+    # same however long the display runs.  The sums behind the mean, standard
+    # deviation and Allan deviation are updated as samples come and go.
+    def __init__(self, capacity: int = 1024) -> None:
+        if capacity < 3:
+            raise ValueError("A peer history needs room for at least 3 samples")
+        self.capacity = capacity
+        self.columns = {name: array("d", bytes(8 * capacity)) for name in COLUMNS}
+        self.start = 0
+        self.count = 0
+        self.total = 0
+        self.sums = dict.fromkeys(COLUMNS, 0.0)
+        self.squares = dict.fromkeys(COLUMNS, 0.0)
+        # Sum of the squared second differences of the offsets
+        self.allan = 0.0
+        self._appended = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _at(self, name: str, i: int) -> float:
+        # The i-th oldest sample held, negative counting from the newest
+        if i < 0:
+            i += self.count
+        return self.columns[name][(self.start + i) % self.capacity]
+
+    def _second_difference(self, i: int) -> float:
+        return (
+            self._at("offset", i + 2)
+            - 2 * self._at("offset", i + 1)
+            + self._at("offset", i)
+        )
+
+    def append(
+        self, time: float, offset: float, delay: float, jitter: float, stratum: float
+    ) -> None:
+        if self.count == self.capacity:
+            if self.count >= 3:
+                self.allan -= self._second_difference(0) ** 2
+            for name in COLUMNS:
+                value = self._at(name, 0)
+                self.sums[name] -= value
+                self.squares[name] -= value * value
+            self.start = (self.start + 1) % self.capacity
+            self.count -= 1
+
+        end = (self.start + self.count) % self.capacity
+        for name, value in zip(COLUMNS, (time, offset, delay, jitter, stratum)):
+            self.columns[name][end] = value
+            self.sums[name] += value
+            self.squares[name] += value * value
+        self.count += 1
+        self.total += 1
+        if self.count >= 3:
+            self.allan += self._second_difference(self.count - 3) ** 2
+
+        self._appended += 1
+        if self._appended >= self.capacity:
+            self.resync()
+
+    def resync(self) -> None:
+        # Sums recomputed from the samples once per capacity appends, so the
+        # rounding errors of subtracting evicted samples cannot build up
+        for name in COLUMNS:
+            values = self.values(name)
+            self.sums[name] = math.fsum(values)
+            self.squares[name] = math.fsum(value * value for value in values)
+        self.allan = math.fsum(
+            self._second_difference(i) ** 2 for i in range(self.count - 2)
+        )
+        self._appended = 0
+
+    def values(self, name: str) -> List[float]:
+        # Oldest first
+        column = self.columns[name]
+        end = self.start + self.count
+        if end <= self.capacity:
+            return column[self.start : end].tolist()
+        return column[self.start :].tolist() + column[: end - self.capacity].tolist()
+
+    def latest(self, name: str) -> float:
+        return self._at(name, -1) if self.count else math.nan
+
+    def last(self, name: str, n: int) -> List[float]:
+        return [self._at(name, i) for i in range(max(self.count - n, 0), self.count)]
+
+    def mean(self, name: str) -> float:
+        return self.sums[name] / self.count if self.count else math.nan
+
+    def stddev(self, name: str) -> float:
+        if self.count < 2:
+            return math.nan
+        mean = self.sums[name] / self.count
+        variance = (self.squares[name] - self.count * mean * mean) / (self.count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def interval(self) -> float:
+        # Mean time between samples
+        if self.count < 2:
+            return math.nan
+        return (self._at("time", -1) - self._at("time", 0)) / (self.count - 1)
+
+    def allan_deviation(self) -> float:
+        # Overlapping Allan deviation of the fractional frequency, from the
+        # offsets (in milliseconds) at the mean sampling interval
+        tau = self.interval()
+        if self.count < 3 or not tau > 0:
+            return math.nan
+        return math.sqrt(max(self.allan, 0.0) / (2 * (self.count - 2))) / tau / 1000
+
+    def sparkline(self, name: str = "offset", width: int = 8) -> str:
+        return sparkline(self.last(name, width))
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,78 @@
+import json
+import os
+import time
+from array import array
+from typing import Dict, List
+
+
+class RollingStats:
+    def __init__(self, size: int = 256) -> None:
+        self.samples = array("d", bytes(8 * size))
+        self.size = size
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.samples[self.count % self.size] = value
+        self.count += 1
+
+    def values(self) -> List[float]:
+        return sorted(self.samples[: min(self.count, self.size)])
+
+    @staticmethod
+    def percentile(values: List[float], p: float) -> float:
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+    def summary(self) -> Dict[str, float]:
+        values = self.values()
+        return {
+            "count": self.count,
+            "p50": self.percentile(values, 50),
+            "p90": self.percentile(values, 90),
+            "p99": self.percentile(values, 99),
+            "max": values[-1] if values else 0.0,
+        }
+
+
+class Profiler:
+    overlay_interval = 0.5
+
+    def __init__(self, size: int = 256) -> None:
+        self.size = size
+        self.stats: Dict[str, RollingStats] = {}
+        self.overlay = False
+        self._overlay_text = ""
+        self._overlay_time = 0.0
+
+    def record(self, name: str, seconds: float) -> None:
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = RollingStats(self.size)
+        stats.add(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {name: stats.summary() for name, stats in self.stats.items()}
+
+    def overlay_line(self, width: int) -> str:
+        now = time.monotonic()
+        if now - self._overlay_time >= self.overlay_interval:
+            totals: Dict[str, float] = {}
+            for name, stats in self.stats.items():
+                panel = name.split(".")[0]
+                median = RollingStats.percentile(stats.values(), 50)
+                totals[panel] = totals.get(panel, 0.0) + median
+            text = " ".join(f"{k[:3].upper()} {1e6 * v:.0f}" for k, v in totals.items())
+            self._overlay_text = f"{f'P50us {text}':<{width}.{width}}"
+            self._overlay_time = now
+        return self._overlay_text
+
+    def dump(self, path: str) -> None:
+        data = {"time": time.time(), "seconds": self.summary()}
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+
+if __name__ == "__main__":
+    pass
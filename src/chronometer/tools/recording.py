@@ -0,0 +1,164 @@
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from bisect import bisect_left
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+MAGIC = b"CHRONOREC"
+VERSION = 1
+
+# Rendered frames appended to one file with the time they were rendered for.
+# Every frame is compressed on its own, against a preset dictionary holding
+# the first frame of the file, so any frame can be read without the ones
+# before it while the borders and labels all frames share cost next to
+# nothing.
+#
+#   header:  MAGIC VERSION COLUMNS ROWS DICTIONARY_SIZE "\n" DICTIONARY
+#   record:  nanoseconds (int64) size (uint32) compressed frame
+
+_record = struct.Struct("<qI")
+
+
+def _read_header(f: BinaryIO) -> Tuple[int, int, bytes]:
+    fields = f.readline(256).split()
+    if len(fields) != 5 or fields[0] != MAGIC or fields[1] != b"%d" % VERSION:
+        raise ValueError("Not a chronometer recording")
+    columns, rows, size = (int(field) for field in fields[2:])
+    zdict = f.read(size)
+    if len(zdict) != size:
+        raise ValueError("Truncated recording header")
+    return columns, rows, zdict
+
+
+def _records(data: mmap.mmap, pos: int) -> Iterator[Tuple[int, int, int]]:
+    # (nanoseconds, offset, size) of each complete record from pos on,
+    # stopping at a record cut short by an interrupted write
+    size = len(data)
+    while pos + _record.size <= size:
+        ns, length = _record.unpack_from(data, pos)
+        if pos + _record.size + length > size:
+            return
+        yield ns, pos, length
+        pos += _record.size + length
+
+
+class Recorder:
+    def __init__(self, path: str, columns: int, rows: int, level: int = 6) -> None:
+        self.path = path
+        self.columns = columns
+        self.rows = rows
+        self.level = level
+        self.zdict: Optional[bytes] = None
+        self.frames = 0
+        self.bytes = 0
+        self.file: BinaryIO = open(path, "ab")
+        if self.file.tell():
+            try:
+                self._resume()
+            except ValueError:
+                self.file.close()
+                raise
+
+    def _resume(self) -> None:
+        # Appending to an earlier recording reuses its dictionary, after
+        # cutting off a record left short when that session was interrupted
+        with open(self.path, "rb") as f:
+            columns, rows, self.zdict = _read_header(f)
+            end = f.tell()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for _, pos, length in _records(data, end):
+                    end = pos + _record.size + length
+        if (columns, rows) != (self.columns, self.rows):
+            raise ValueError(
+                f"{self.path} was recorded at {columns}x{rows}, "
+                f"not {self.columns}x{self.rows}"
+            )
+        self.file.truncate(end)
+
+    def append(self, ns: int, text: str) -> None:
+        data = text.encode("utf-8")
+        if self.zdict is None:
+            self.zdict = data
+            self.file.write(
+                b"%s %d %d %d %d\n"
+                % (MAGIC, VERSION, self.columns, self.rows, len(data))
+                + data
+            )
+        compressor = zlib.compressobj(self.level, zdict=self.zdict)
+        payload = compressor.compress(data) + compressor.flush()
+        self.file.write(_record.pack(ns, len(payload)) + payload)
+        self.frames += 1
+        self.bytes += _record.size + len(payload)
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> "Recorder":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class Recording:
+    # The frames of a recording file in time order.  The index of frame
+    # times and file offsets is built from the record headers on opening,
+    # and a record cut short by an interrupted write is left out.
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self.columns, self.rows, self.zdict = _read_header(f)
+            start = f.tell()
+            size = os.fstat(f.fileno()).st_size
+            self.data = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+
+        times = array("q")
+        offsets = array("q")
+        for ns, pos, _ in _records(self.data, start):
+            times.append(ns)
+            offsets.append(pos)
+        if any(a > b for a, b in zip(times, times[1:])):
+            # Sessions appended out of order
+            order = sorted(range(len(times)), key=times.__getitem__)
+            times = array("q", (times[i] for i in order))
+            offsets = array("q", (offsets[i] for i in order))
+        self.times = times
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def seek(self, ns: int) -> int:
+        # Index of the first frame at or after ns
+        return bisect_left(self.times, ns)
+
+    def frame(self, index: int) -> Tuple[int, str]:
+        pos = self.offsets[index]
+        ns, length = _record.unpack_from(self.data, pos)
+        start = pos + _record.size
+        decompressor = zlib.decompressobj(zdict=self.zdict)
+        data = decompressor.decompress(self.data[start : start + length])
+        return ns, (data + decompressor.flush()).decode("utf-8")
+
+    def frames(
+        self, start: Optional[int] = None, end: Optional[int] = None
+    ) -> Iterator[Tuple[int, str]]:
+        first = 0 if start is None else self.seek(start)
+        last = len(self) if end is None else self.seek(end)
+        for index in range(first, last):
+            yield self.frame(index)
+
+    def close(self) -> None:
+        self.data.close()
+
+    def __enter__(self) -> "Recording":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+if __name__ == "__main__":
+    pass
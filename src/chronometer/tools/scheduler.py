@@ -0,0 +1,136 @@
+import asyncio
+import math
+import time
+from typing import Callable, Optional, TypeVar, Union
+
+from chronometer.tools.governor import Governor
+from chronometer.tools.metrics import Metrics
+
+T = TypeVar("T")
+
+
+class SystemClock:
+    speed = 1.0
+
+    def time(self) -> float:
+        return time.time()
+
+    async def sleep(self, seconds: float) -> None:
+        await asyncio.sleep(seconds)
+
+
+class WarpClock:
+    # Simulated wall clock time that starts at `start` and runs `speed` times
+    # faster than real time.  Sleeps are shortened to match, so the scheduler
+    # keeps its deadlines in simulated seconds.
+    def __init__(self, start: float, speed: float = 1.0) -> None:
+        if speed <= 0:
+            raise ValueError(f"Warp speed must be positive, got {speed}")
+        self.start = start
+        self.speed = speed
+        self.origin = time.perf_counter()
+
+    def time(self) -> float:
+        return self.start + (time.perf_counter() - self.origin) * self.speed
+
+    async def sleep(self, seconds: float) -> None:
+        await asyncio.sleep(seconds / self.speed)
+
+
+Clock = Union[SystemClock, WarpClock]
+
+
+class FrameScheduler:
+    # Weight of the newest sample in the render and write cost estimates
+    smoothing = 0.1
+    # Deadlines closer than this to a second boundary are taken as on it
+    EPSILON = 1e-6
+
+    def __init__(
+        self,
+        refresh: float,
+        tolerance: float = 0.005,
+        clock: Optional[Clock] = None,
+        governor: Optional[Governor] = None,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.set_refresh(refresh)
+        self.tolerance = tolerance
+        self.clock = clock or SystemClock()
+        self.governor = governor
+        self.metrics = metrics
+        self.render_cost = 0.0
+        self.write_cost = 0.0
+        self.frames = 0
+        self.misses = 0
+        self.max_late = 0.0
+
+    def set_refresh(self, refresh: float) -> None:
+        if refresh >= 1:
+            self.ticks_per_second = 1 / round(refresh)
+        else:
+            self.ticks_per_second = max(1, round(1 / refresh)) if refresh > 0 else 1000
+        self.period = 1 / self.ticks_per_second
+
+    @property
+    def lead(self) -> float:
+        # Costs are measured in real seconds, deadlines are in clock seconds
+        return (self.render_cost + self.write_cost) * self.clock.speed
+
+    def on_grid(self, seconds: float) -> float:
+        # The first tick at or after `seconds`, ignoring float noise
+        ticks = round(seconds * self.ticks_per_second, 6)
+        return math.ceil(ticks) / self.ticks_per_second
+
+    def next_deadline(self, wall: float) -> float:
+        earliest = wall + self.lead
+        deadline = self.on_grid(earliest)
+        # Wait for the second boundary rather than render past it, so the
+        # seconds digit always changes on time.  That is only needed when
+        # the frame after this one could not be due until past the boundary.
+        boundary = math.ceil(earliest)
+        following = self.on_grid(deadline + max(self.lead, self.period))
+        if deadline < boundary and (
+            following > boundary or boundary - deadline < self.EPSILON
+        ):
+            deadline = float(boundary)
+        return deadline
+
+    def _track(self, cost: float, sample: float) -> float:
+        return cost + self.smoothing * (sample - cost) if self.frames else sample
+
+    async def run(
+        self, render: Callable[[float], T], write: Callable[[T], None]
+    ) -> None:
+        clock = self.clock
+        while True:
+            deadline = self.next_deadline(clock.time())
+            await clock.sleep(deadline - self.lead - clock.time())
+
+            start = time.perf_counter()
+            frame = render(deadline)
+            render_cost = time.perf_counter() - start
+
+            write_lead = self.write_cost * clock.speed
+            await clock.sleep(deadline - write_lead - clock.time())
+            start = time.perf_counter()
+            write(frame)
+            end = time.perf_counter()
+
+            late = (clock.time() - deadline) / clock.speed
+            missed = late > self.tolerance
+            self.misses += missed
+            self.max_late = max(self.max_late, late)
+            self.render_cost = self._track(self.render_cost, render_cost)
+            self.write_cost = self._track(self.write_cost, end - start)
+            self.frames += 1
+            if self.metrics:
+                self.metrics.frame(render_cost, end - start, late, missed)
+            if self.governor:
+                rate = self.governor.poll(self.frames)
+                if rate is not None:
+                    self.set_refresh(1 / rate)
+
+
+if __name__ == "__main__":
+    pass
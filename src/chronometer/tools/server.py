@@ -0,0 +1,114 @@
+import asyncio
+import os
+import stat
+from typing import Callable, Optional, Set
+
+from chronometer.tools import frame
+
+HIDE_CURSOR = "\33[?25l"
+SSE_HEADERS = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: text/event-stream\r\n"
+    b"Cache-Control: no-cache\r\n"
+    b"Connection: keep-alive\r\n\r\n"
+)
+NOT_FOUND = b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+
+
+def raw_event(text: str) -> bytes:
+    return text.encode("utf-8")
+
+
+def sse_event(text: str) -> bytes:
+    lines = "".join(f"data: {line}\n" for line in text.split("\n"))
+    return f"{lines}\n".encode("utf-8")
+
+
+class Subscriber:
+    def __init__(
+        self, writer: asyncio.StreamWriter, encode: Callable[[str], bytes]
+    ) -> None:
+        self.writer = writer
+        self.encode = encode
+        self.renderer = frame.DiffRenderer()
+        self.pending: Optional[frame.Grid] = None
+        self.ready = asyncio.Event()
+        self.dropped = 0
+
+    def offer(self, grid: frame.Grid) -> None:
+        # Only the newest frame is kept.  A client that cannot keep up skips
+        # frames, and its next diff is taken against what it last received.
+        if self.pending is not None:
+            self.dropped += 1
+        self.pending = grid
+        self.ready.set()
+
+    async def run(self) -> None:
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            grid, self.pending = self.pending, None
+            if grid is None:
+                continue
+            self.writer.write(self.encode(self.renderer.update(grid)))
+            await self.writer.drain()
+
+
+class FrameServer:
+    def __init__(self) -> None:
+        self.subscribers: Set[Subscriber] = set()
+        self.frames = 0
+
+    def publish(self, grid: frame.Grid) -> None:
+        self.frames += 1
+        for subscriber in self.subscribers:
+            subscriber.offer(grid)
+
+    async def _stream(self, subscriber: Subscriber) -> None:
+        self.subscribers.add(subscriber)
+        try:
+            await subscriber.run()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.subscribers.discard(subscriber)
+            subscriber.writer.close()
+
+    async def _handle_unix(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        writer.write(raw_event(HIDE_CURSOR))
+        await self._stream(Subscriber(writer, raw_event))
+
+    async def _handle_http(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            writer.close()
+            return
+        request_line = request.split(b"\r\n", 1)[0].split()
+        if (
+            len(request_line) < 2
+            or request_line[0] != b"GET"
+            or request_line[1].split(b"?")[0] not in (b"/", b"/events")
+        ):
+            writer.write(NOT_FOUND)
+            writer.close()
+            return
+        writer.write(SSE_HEADERS)
+        await self._stream(Subscriber(writer, sse_event))
+
+    async def serve_unix(self, path: str) -> asyncio.AbstractServer:
+        # Remove a socket left behind by a previous run
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+        return await asyncio.start_unix_server(self._handle_unix, path)
+
+    async def serve_http(self, host: str, port: int) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self._handle_http, host, port)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,138 @@
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Union
+
+NS = 1_000_000_000
+DAY_NS = 86400 * NS
+EPOCH_ORDINAL = 719163  # date(1970, 1, 1).toordinal()
+JULIAN_EPOCH = 2440587.5  # Julian date of 1970-01-01 00:00
+
+_epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_month_days = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def is_leap_year(year: int) -> bool:
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def days_in_month(year: int, month: int) -> int:
+    if month == 2 and is_leap_year(year):
+        return 29
+    return _month_days[month - 1]
+
+
+def local_offset(seconds: int) -> int:
+    return time.localtime(seconds).tm_gmtoff
+
+
+class Instant:
+    # One time.time_ns() sample and the UTC offset of the clock it is shown
+    # on.  All calendar fields are derived once, with integer arithmetic, and
+    # the attributes mirror datetime so either can be passed to the clock,
+    # calendar and leap functions.
+    __slots__ = (
+        "ns",
+        "offset",
+        "local_ns",
+        "days",
+        "day_ns",
+        "year",
+        "month",
+        "day",
+        "hour",
+        "minute",
+        "second",
+        "microsecond",
+    )
+
+    def __init__(self, ns: int, offset: int = 0) -> None:
+        self.ns = ns
+        self.offset = offset  # seconds east of UTC
+        self.local_ns = ns + offset * NS
+        self.days, self.day_ns = divmod(self.local_ns, DAY_NS)
+
+        z = self.days + 719468
+        era, doe = divmod(z, 146097)
+        yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+        doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+        mp = (5 * doy + 2) // 153
+        self.day = doy - (153 * mp + 2) // 5 + 1
+        self.month = mp + 3 if mp < 10 else mp - 9
+        self.year = yoe + era * 400 + (self.month <= 2)
+
+        seconds, nanoseconds = divmod(self.day_ns, NS)
+        self.hour, seconds = divmod(seconds, 3600)
+        self.minute, self.second = divmod(seconds, 60)
+        self.microsecond = nanoseconds // 1000
+
+    @classmethod
+    def now(cls) -> "Instant":
+        ns = time.time_ns()
+        return cls(ns, local_offset(ns // NS))
+
+    @classmethod
+    def from_seconds(cls, seconds: float, offset: Optional[int] = None) -> "Instant":
+        ns = round(seconds * NS)
+        return cls(ns, local_offset(ns // NS) if offset is None else offset)
+
+    @classmethod
+    def from_datetime(cls, dt: datetime) -> "Instant":
+        utc_offset = dt.utcoffset() if dt.tzinfo else dt.astimezone().utcoffset()
+        offset = int(utc_offset.total_seconds()) if utc_offset else 0
+        local = (
+            (dt.toordinal() - EPOCH_ORDINAL) * 86400
+            + dt.hour * 3600
+            + dt.minute * 60
+            + dt.second
+        ) * NS + dt.microsecond * 1000
+        return cls(local - offset * NS, offset)
+
+    @classmethod
+    def of(cls, value: Union["Instant", datetime]) -> "Instant":
+        return value if isinstance(value, Instant) else cls.from_datetime(value)
+
+    @property
+    def utc_day_ns(self) -> int:
+        return self.ns % DAY_NS
+
+    def toordinal(self) -> int:
+        return self.days + EPOCH_ORDINAL
+
+    def weekday(self) -> int:
+        return (self.days + 3) % 7
+
+    def day_of_year(self) -> int:
+        y = self.year - 1
+        return self.days + EPOCH_ORDINAL - (365 * y + y // 4 - y // 100 + y // 400)
+
+    def timestamp(self) -> float:
+        return self.ns / NS
+
+    def utcoffset(self) -> timedelta:
+        return timedelta(seconds=self.offset)
+
+    def julian_date(self) -> float:
+        # Of the local wall clock time, like cal.julian_date
+        return self.local_ns / DAY_NS + JULIAN_EPOCH
+
+    def to_datetime(self) -> datetime:
+        tz = timezone(timedelta(seconds=self.offset))
+        return (_epoch + timedelta(microseconds=self.ns // 1000)).astimezone(tz)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Instant):
+            return NotImplemented
+        return self.ns == other.ns and self.offset == other.offset
+
+    def __hash__(self) -> int:
+        return hash((self.ns, self.offset))
+
+    def __repr__(self) -> str:
+        return f"Instant({self.ns}, {self.offset})"
+
+
+DateTimeLike = Union[Instant, datetime]
+
+
+if __name__ == "__main__":
+    pass
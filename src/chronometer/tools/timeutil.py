@@ -1,11 +1,21 @@
-from datetime import datetime, date, timedelta
-from typing import Optional, Union
+from dataclasses import dataclass
+from datetime import datetime, date, timedelta, timezone
+from functools import lru_cache
+from typing import NamedTuple, Optional, Union
 from chronometer.tools import trig, cal
-import pytz
+from chronometer.tools.timecore import JULIAN_EPOCH, NS, DateTimeLike, Instant
 
+# Number of (day, latitude, longitude) ephemerides kept by cached_ephemeris
+EPHEMERIS_CACHE_SIZE = 64
 
-def is_leap_year(dt: Union[datetime, int]) -> bool:
-    if isinstance(dt, datetime):
+CYCLE_DAYS = 146_097  # days in the 400 year Gregorian cycle
+CYCLE_SECONDS = CYCLE_DAYS * 86400
+MARCH_EPOCH_ORDINAL = -305  # ordinal of March 1 of year 0, proleptic Gregorian
+DRIFT_RATE = 1 - 365 / 365.2425
+
+
+def is_leap_year(dt: Union[DateTimeLike, int]) -> bool:
+    if isinstance(dt, (datetime, Instant)):
         year = dt.year
     elif isinstance(dt, int):
         year = dt
@@ -18,7 +28,9 @@ def is_leap_year(dt: Union[datetime, int]) -> bool:
     return False
 
 
-def day_of_year(dt: datetime) -> int:
+def day_of_year(dt: DateTimeLike) -> int:
+    if isinstance(dt, Instant):
+        return dt.day_of_year()
     dt = dt.replace(tzinfo=None)
     return (dt - datetime(dt.year, 1, 1)).days + 1
 
@@ -145,7 +157,129 @@ def next_per(dt: datetime) -> datetime:
         )
 
 
+# Leap cycle statistics.  Leap cycles run from March 1 of a year divisible by
+# 400, and March-based years make the leap day the last day of a year.  The
+# helpers below also accept NumPy integer arrays (see batch.leap_stats).
+
+
+def leap_year_on_or_after(year):
+    year = year + (-year) % 4
+    return year + 4 * ((year % 100 == 0) & (year % 400 != 0))
+
+
+def leap_year_on_or_before(year):
+    year = year - year % 4
+    return year - 4 * ((year % 100 == 0) & (year % 400 != 0))
+
+
+def march_days(years):
+    # Days from the start of a leap cycle to March 1 of the given cycle year
+    return 365 * years + years // 4 - years // 100 + years // 400
+
+
+class LeapStats(NamedTuple):
+    drift: float  # seconds
+    next_leap: float  # seconds until the next February 29
+    period: float  # fraction of the current leap period, March 1 to March 1
+    cycle: float  # fraction of the 400 year cycle
+
+
+def leap_cycle_stats(day: int, seconds: float) -> LeapStats:
+    # day counts from MARCH_EPOCH_ORDINAL and seconds from midnight
+    era, doe = divmod(day, CYCLE_DAYS)
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    leap_day = doe - march_days(yoe) == 365
+    elapsed = doe * 86400 + seconds
+
+    leaps = yoe // 4 - yoe // 100 + (seconds / 86400 if leap_day else 0)
+    drift = leaps * 86400 - elapsed * DRIFT_RATE
+
+    year = yoe  # cycle year in which the current March-based year starts
+    leap = leap_year_on_or_after(year + 1)
+    if leap_day and seconds > 0:
+        leap = leap_year_on_or_after(year + 2)
+    next_leap = (march_days(leap) - 1) * 86400 - elapsed
+
+    start = march_days(leap_year_on_or_before(year)) * 86400
+    end = march_days(leap_year_on_or_after(year + 1)) * 86400
+    return LeapStats(
+        drift, next_leap, (elapsed - start) / (end - start), elapsed / CYCLE_SECONDS
+    )
+
+
+def leap_stats(dt: DateTimeLike) -> LeapStats:
+    if isinstance(dt, Instant):
+        return leap_cycle_stats(dt.toordinal() - MARCH_EPOCH_ORDINAL, dt.day_ns / NS)
+    seconds = dt.hour * 3600 + dt.minute * 60 + dt.second + dt.microsecond / 1e6
+    return leap_cycle_stats(dt.toordinal() - MARCH_EPOCH_ORDINAL, seconds)
+
+
+@dataclass(frozen=True)
+class Ephemeris:
+    J_transit: float
+    ω0: float  # sunrise hour angle, 0 during polar night and 180 during polar day
+    ω_civil: float
+    noon: datetime
+    sunrise: Optional[datetime]
+    sunset: Optional[datetime]
+    dawn: Optional[datetime]
+    dusk: Optional[datetime]
+
+    @property
+    def day_length(self) -> timedelta:
+        return timedelta(days=self.ω0 / 180)
+
+    @property
+    def polar_day(self) -> bool:
+        return self.ω0 == 180
+
+    @property
+    def polar_night(self) -> bool:
+        return self.ω0 == 0
+
+
+def _hour_angle(zenith: float, lat: float, δ: float) -> float:
+    temp = (trig.cos(zenith) - trig.sin(lat) * trig.sin(δ)) / (
+        trig.cos(lat) * trig.cos(δ)
+    )
+    return trig.acos(min(1.0, max(-1.0, temp)))
+
+
+def _event(J_transit: float, ω: float, sign: int) -> Optional[datetime]:
+    if ω in (0, 180):
+        return None
+    return jul_to_greg(J_transit + sign * ω / 360)
+
+
+def solar_ephemeris(n: float, lat: float, lon: float) -> Ephemeris:
+    J_star = n + (-lon / 360)
+    M = (357.5291 + 0.98560028 * J_star) % 360
+    C = 1.9148 * trig.sin(M) + 0.0200 * trig.sin(2 * M) + 0.0003 * trig.sin(3 * M)
+    λ = (M + C + 180 + 102.9372) % 360
+    J_transit = 2451545.0 + J_star + 0.0053 * trig.sin(M) - 0.0069 * trig.sin(2 * λ)
+    δ = trig.asin(trig.sin(λ) * trig.sin(23.44))
+    ω0 = _hour_angle(90.83333, lat, δ)
+    ω_civil = _hour_angle(96, lat, δ)
+    return Ephemeris(
+        J_transit=J_transit,
+        ω0=ω0,
+        ω_civil=ω_civil,
+        noon=jul_to_greg(J_transit),
+        sunrise=_event(J_transit, ω0, -1),
+        sunset=_event(J_transit, ω0, 1),
+        dawn=_event(J_transit, ω_civil, -1),
+        dusk=_event(J_transit, ω_civil, 1),
+    )
+
+
+@lru_cache(maxsize=EPHEMERIS_CACHE_SIZE)
+def cached_ephemeris(day: int, lat: float, lon: float) -> Ephemeris:
+    return solar_ephemeris(day, lat, lon)
+
+
 class Sun:
+    ephemeris: Ephemeris
+
     def __init__(self, lon: float, lat: float, date: datetime = datetime.now()) -> None:
         self.lon = lon
         self.lat = lat
@@ -153,36 +287,63 @@ class Sun:
 
     def refresh(self, offset: int = 0, fixed: bool = False) -> None:
         n = cal.julian_date(self.date) - 2451545.0 + 0.5 + 0.0008
-        n = n if fixed else int(n)
-        n += offset
-        J_star = n + (-self.lon / 360)
-        M = (357.5291 + 0.98560028 * J_star) % 360
-        C = 1.9148 * trig.sin(M) + 0.0200 * trig.sin(2 * M) + 0.0003 * trig.sin(3 * M)
-        λ = (M + C + 180 + 102.9372) % 360
-        self.J_transit = (
-            2451545.0 + J_star + 0.0053 * trig.sin(M) - 0.0069 * trig.sin(2 * λ)
-        )
-        δ = trig.asin(trig.sin(λ) * trig.sin(23.44))
-        temp = (trig.cos(90.83333) - trig.sin(self.lat) * trig.sin(δ)) / (
-            trig.cos(self.lat) * trig.cos(δ)
-        )
-        self.ω0 = trig.acos(temp)
+        if fixed:
+            self.ephemeris = solar_ephemeris(n + offset, self.lat, self.lon)
+        else:
+            self.ephemeris = cached_ephemeris(int(n) + offset, self.lat, self.lon)
+        self.J_transit = self.ephemeris.J_transit
+        self.ω0 = self.ephemeris.ω0
 
     @property
     def date(self):
         return self._date
 
     @date.setter
-    def date(self, dt: datetime):
-        self._date = dt.astimezone(pytz.utc).replace(tzinfo=None)
+    def date(self, dt: DateTimeLike):
+        if isinstance(dt, Instant):
+            self._date = Instant(dt.ns)
+        else:
+            self._date = dt.astimezone(timezone.utc).replace(tzinfo=None)
 
     @property
     def solar_noon(self):
         if self.date:
-            offset = (self.date - jul_to_greg(self.J_transit)).total_seconds()
-            return self.date.replace(
-                hour=12, minute=0, second=0, microsecond=0
-            ) + timedelta(seconds=offset)
+            date = self.date
+            if isinstance(date, Instant):
+                date = date.to_datetime().replace(tzinfo=None)
+            offset = (date - self.ephemeris.noon).total_seconds()
+            return date.replace(hour=12, minute=0, second=0, microsecond=0) + timedelta(
+                seconds=offset
+            )
+
+    @property
+    def solar_seconds(self) -> float:
+        # Seconds since apparent solar midnight, the time of day of solar_noon
+        if isinstance(self.date, Instant):
+            offset = self.date.ns / NS - (self.J_transit - JULIAN_EPOCH) * 86400
+        else:
+            offset = (self.date - self.ephemeris.noon).total_seconds()
+        return (43200 + offset) % 86400
+
+    @property
+    def sunrise(self) -> Optional[datetime]:
+        return self.ephemeris.sunrise
+
+    @property
+    def sunset(self) -> Optional[datetime]:
+        return self.ephemeris.sunset
+
+    @property
+    def dawn(self) -> Optional[datetime]:
+        return self.ephemeris.dawn
+
+    @property
+    def dusk(self) -> Optional[datetime]:
+        return self.ephemeris.dusk
+
+    @property
+    def day_length(self) -> timedelta:
+        return self.ephemeris.day_length
 
 
 def jul_to_greg(J: float) -> datetime:
@@ -0,0 +1,101 @@
+import math
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import List, Sequence, Tuple, Union
+
+# Fallback cache lifetime for tzinfo objects whose transitions are unknown
+PROBE_SECONDS = 900
+
+_epoch = datetime(1970, 1, 1)
+
+
+class ZoneTable:
+    def __init__(
+        self, name: str, transitions: Sequence[float], offsets: Sequence[int]
+    ) -> None:
+        self.name = name
+        self.transitions = list(transitions)
+        self.offsets = list(offsets)
+        self.tz = None
+        self.current = self.offsets[0]
+        self.valid_from = math.inf
+        self.valid_until = -math.inf
+
+    @classmethod
+    def from_tzinfo(cls, tz: tzinfo) -> "ZoneTable":
+        name = str(getattr(tz, "zone", tz))
+        transition_times = getattr(tz, "_utc_transition_times", None)
+        transition_info = getattr(tz, "_transition_info", None)
+        if transition_times and transition_info:
+            transitions = [-math.inf] + [
+                (t - _epoch).total_seconds() for t in transition_times[1:]
+            ]
+            offsets = [int(info[0].total_seconds()) for info in transition_info]
+            return cls(name, transitions, offsets)
+
+        offset = tz.utcoffset(None)
+        if offset is not None:
+            return cls(name, [-math.inf], [int(offset.total_seconds())])
+
+        table = cls(name, [-math.inf], [0])
+        table.tz = tz
+        return table
+
+    @classmethod
+    def of(cls, zone: Union["ZoneTable", tzinfo]) -> "ZoneTable":
+        return zone if isinstance(zone, ZoneTable) else cls.from_tzinfo(zone)
+
+    def _probe(self, epoch: float) -> None:
+        utc = datetime.fromtimestamp(epoch, timezone.utc)
+        offset = utc.astimezone(self.tz).utcoffset() or timedelta()
+        self.current = int(offset.total_seconds())
+        self.valid_from = epoch - epoch % PROBE_SECONDS
+        self.valid_until = self.valid_from + PROBE_SECONDS
+
+    def offset(self, epoch: float) -> int:
+        if self.valid_from <= epoch < self.valid_until:
+            return self.current
+        if self.tz is not None:
+            self._probe(epoch)
+            return self.current
+        i = bisect_right(self.transitions, epoch) - 1
+        self.current = self.offsets[i]
+        self.valid_from = self.transitions[i]
+        self.valid_until = (
+            self.transitions[i + 1] if i + 1 < len(self.transitions) else math.inf
+        )
+        return self.current
+
+    def local(self, epoch: float) -> float:
+        return epoch + self.offset(epoch)
+
+
+def local_fields(local: float) -> Tuple[int, int, int, int]:
+    # Day number, weekday (Monday is 0), hour and minute of a local epoch time
+    day, seconds = divmod(int(local // 60) * 60, 86400)
+    return day, (day + 3) % 7, seconds // 3600, seconds % 3600 // 60
+
+
+class ZoneSet:
+    def __init__(self, zones: Sequence[Tuple[str, ZoneTable]]) -> None:
+        self.zones = list(zones)
+
+    @classmethod
+    def from_tzinfos(
+        cls, zones: Sequence[Tuple[str, Union[ZoneTable, tzinfo]]]
+    ) -> "ZoneSet":
+        return cls([(label, ZoneTable.of(tz)) for label, tz in zones])
+
+    def by_offset(
+        self, epoch: float
+    ) -> Tuple[List[Tuple[str, ZoneTable]], float, float]:
+        # Zones sorted by current UTC offset, and the instants between which
+        # that order is guaranteed not to change.
+        ordered = sorted(self.zones, key=lambda zone: zone[1].offset(epoch))
+        valid_from = max(table.valid_from for _, table in self.zones)
+        valid_until = min(table.valid_until for _, table in self.zones)
+        return ordered, valid_from, valid_until
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,229 @@
+import json
+import os
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set
+
+from chronometer.tools import caltable, configcache
+from chronometer.tools.tzcache import ZoneTable
+
+INDEX_VERSION = 1
+
+# Every pytz zone with the countries it belongs to and its transition table,
+# and the words of the zone, city and country names mapped to the zones they
+# occur in.  Built once from the zone files and kept in the cache directory
+# until the installed pytz changes, so searching and current offsets need
+# neither pytz nor its zone files.
+
+
+def index_path(cache_dir: Optional[str] = None) -> str:
+    return os.path.join(cache_dir or caltable.DEFAULT_CACHE_DIR, "zones.index")
+
+
+def words(text: str) -> List[str]:
+    # Letters and digits, keeping the sign of offsets as in Etc/GMT+5
+    return re.findall(r"[^\W_]+(?:[+-]\d+)?", text.lower())
+
+
+def parse_offset(text: str) -> int:
+    # "+0530", "+05:30", "UTC-8" or "5.5" as seconds east of UTC
+    value = text.strip().upper()
+    for prefix in ("UTC", "GMT"):
+        if value.startswith(prefix):
+            value = value[len(prefix) :] or "0"
+    match = re.fullmatch(r"([+-]?)(\d{1,2}):?(\d{2})", value)
+    if match:
+        sign, hours, minutes = match.groups()
+        seconds = int(hours) * 3600 + int(minutes) * 60
+        return -seconds if sign == "-" else seconds
+    try:
+        return round(float(value) * 3600)
+    except ValueError:
+        raise ValueError(f"Invalid UTC offset: {text}") from None
+
+
+def format_offset(seconds: int) -> str:
+    sign = "-" if seconds < 0 else "+"
+    hours, minutes = divmod(abs(seconds) // 60, 60)
+    return f"{sign}{hours:02}{minutes:02}"
+
+
+class ZoneIndex:
+    def __init__(
+        self,
+        version: str,
+        countries: Dict[str, str],
+        country_zones: Dict[str, List[int]],
+        zones: List[ZoneTable],
+        tokens: Dict[str, List[int]],
+    ) -> None:
+        self.version = version
+        self.countries = countries
+        self.country_zones = country_zones
+        self.zones = zones
+        self.tokens = tokens
+        self.sorted_tokens = sorted(tokens)
+        self.by_name = {table.name: table for table in zones}
+
+    @classmethod
+    def build(cls) -> "ZoneIndex":
+        import pytz
+
+        names = list(pytz.all_timezones)
+        position = {name: i for i, name in enumerate(names)}
+        countries = dict(pytz.country_names)
+        country_zones: Dict[str, List[int]] = {}
+        for code in countries:
+            # Legacy aliases named after the country code, such as US/Eastern
+            linked = [
+                i for i, name in enumerate(names) if re.match(f"{code}([/-]|$)", name)
+            ]
+            linked += (
+                position[name]
+                for name in pytz.country_timezones.get(code, [])
+                if name in position
+            )
+            country_zones[code] = list(dict.fromkeys(linked))
+
+        tokens: Dict[str, Set[int]] = {}
+        for i, name in enumerate(names):
+            for word in words(name):
+                tokens.setdefault(word, set()).add(i)
+        for code, zones in country_zones.items():
+            for word in [code.lower(), *words(countries[code])]:
+                tokens.setdefault(word, set()).update(zones)
+
+        tables = [ZoneTable.from_tzinfo(pytz.timezone(name)) for name in names]
+        return cls(
+            pytz.OLSON_VERSION,
+            countries,
+            country_zones,
+            tables,
+            {token: sorted(zones) for token, zones in tokens.items()},
+        )
+
+    def to_bytes(self) -> bytes:
+        transitions = array("d")
+        offsets = array("i")
+        for table in self.zones:
+            transitions.extend(table.transitions)
+            offsets.extend(table.offsets)
+        header = {
+            "version": INDEX_VERSION,
+            "byteorder": sys.byteorder,
+            "tzdata": configcache.tzdata_stamp(),
+            "olson": self.version,
+            "countries": self.countries,
+            "country_zones": self.country_zones,
+            "zones": [[table.name, len(table.offsets)] for table in self.zones],
+            "tokens": self.tokens,
+        }
+        return (
+            json.dumps(header).encode("utf-8")
+            + b"\n"
+            + transitions.tobytes()
+            + offsets.tobytes()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ZoneIndex":
+        line, _, body = data.partition(b"\n")
+        header = json.loads(line)
+        if (
+            header.get("version") != INDEX_VERSION
+            or header.get("byteorder") != sys.byteorder
+            or header.get("tzdata") != configcache.tzdata_stamp()
+        ):
+            raise ValueError("Stale zone index")
+        count = sum(size for _, size in header["zones"])
+        transitions = array("d")
+        offsets = array("i")
+        split = count * transitions.itemsize
+        transitions.frombytes(body[:split])
+        offsets.frombytes(body[split:])
+        if len(transitions) != count or len(offsets) != count:
+            raise ValueError("Truncated zone index")
+
+        zones = []
+        start = 0
+        for name, size in header["zones"]:
+            end = start + size
+            zones.append(ZoneTable(name, transitions[start:end], offsets[start:end]))
+            start = end
+        return cls(
+            header["olson"],
+            header["countries"],
+            header["country_zones"],
+            zones,
+            header["tokens"],
+        )
+
+    def _prefixed(self, word: str) -> Set[int]:
+        found: Set[int] = set()
+        i = bisect_left(self.sorted_tokens, word)
+        while i < len(self.sorted_tokens) and self.sorted_tokens[i].startswith(word):
+            found.update(self.tokens[self.sorted_tokens[i]])
+            i += 1
+        return found
+
+    def _similar(self, word: str) -> Set[int]:
+        from difflib import get_close_matches
+
+        found: Set[int] = set()
+        for token in get_close_matches(word, self.sorted_tokens, n=5, cutoff=0.75):
+            found.update(self.tokens[token])
+        return found
+
+    def _names(self, zones: Iterable[int]) -> List[str]:
+        return [self.zones[i].name for i in sorted(zones)]
+
+    def search(self, term: str) -> List[str]:
+        # Zones with a word starting with each word of the term, or failing
+        # that, with words spelled like them
+        terms = words(term)
+        if not terms:
+            return []
+        for match in (self._prefixed, self._similar):
+            found = set.intersection(*(match(word) for word in terms))
+            if found:
+                return self._names(found)
+        return []
+
+    def find_countries(self, term: str) -> List[str]:
+        term = term.lower()
+        return [code for code, name in self.countries.items() if term in name.lower()]
+
+    def zones_of(self, code: str) -> List[str]:
+        return [self.zones[i].name for i in self.country_zones.get(code, [])]
+
+    def offset(self, name: str, epoch: float) -> int:
+        return self.by_name[name].offset(epoch)
+
+    def with_offset(self, offset: int, epoch: float) -> List[str]:
+        return [table.name for table in self.zones if table.offset(epoch) == offset]
+
+
+def load(cache_dir: Optional[str] = None, rebuild: bool = False) -> ZoneIndex:
+    path = index_path(cache_dir)
+    if not rebuild:
+        try:
+            with open(path, "rb") as f:
+                return ZoneIndex.from_bytes(f.read())
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    index = ZoneIndex.build()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(index.to_bytes())
+        os.replace(f"{path}.tmp", path)
+    except OSError:
+        pass
+    return index
+
+
+if __name__ == "__main__":
+    pass
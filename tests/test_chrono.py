@@ -1,6 +1,40 @@
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta, time, date, timezone
+import asyncio
+import gzip
+import json
+import math
+import os
+import random
+import socket
+import statistics
+import struct
+import threading
+import tracemalloc
+import pytest
 import pytz
-from chronometer.tools import cal, abbr, timeutil, clock
+from chronometer import chrono, convert
+from chronometer.tools import cal, abbr, timeutil, clock, frame, caltable, ntp, tzcache
+from chronometer.tools import (
+    backends,
+    business,
+    configcache,
+    governor,
+    ntpclient,
+    zoneindex,
+)
+from chronometer.tools.profiler import Profiler, RollingStats
+from chronometer.tools.metrics import Histogram, Metrics, MetricsServer
+from chronometer.tools.peerhistory import PeerHistory, sparkline
+from chronometer.tools.recording import Recorder, Recording
+from chronometer.tools.scheduler import FrameScheduler, WarpClock
+from chronometer.tools.server import FrameServer, Subscriber
+from chronometer.tools.timecore import NS, Instant
+
+try:
+    import numpy as np
+    from chronometer.tools import batch
+except ImportError:
+    np = None
 
 
 def list_pax_dates(start_year: int, duration: int):
@@ -75,6 +109,15 @@ class TestCalendars:
             assert twc_date_str == cal.twc_date(start_date)
             start_date += timedelta(days=1)
 
+    def test_table_cache(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(caltable, "cache_dir", str(tmp_path))
+        built = caltable.load("pax", cal._build_pax)
+        assert (tmp_path / "pax.table").exists()
+        cached = caltable.load("pax", lambda: None)
+        assert cached.labels == built.labels
+        assert cached.index == built.index
+        assert cached.anchor == built.anchor
+
     def test_julian_data(self):
         assert 2451544.5 == cal.julian_date(date=datetime(year=2000, month=1, day=1))
         assert 2816787.5 == cal.julian_date(date=datetime(year=3000, month=1, day=1))
@@ -107,8 +150,1316 @@ class TestClocks:
         )
 
 
+def leap_boundaries():
+    instants = []
+    for year in (1600, 1700, 1899, 1900, 1999, 2000, 2001, 2023, 2024, 2100, 2400):
+        for month, day in ((1, 1), (2, 28), (2, 29), (3, 1), (12, 31)):
+            if month == 2 and day == 29 and not timeutil.is_leap_year(year):
+                continue
+            base = datetime(year, month, day)
+            instants += [base + timedelta(seconds=s) for s in (-1, 1, 43200, 86399.5)]
+    return instants
+
+
 class TestUtils:
     def test_day_of_week(self):
         assert 1 == timeutil.day_of_year(datetime(month=1, day=1, year=2000))
         assert 365 == timeutil.day_of_year(datetime(month=12, day=31, year=1999))
         assert 366 == timeutil.day_of_year(datetime(month=12, day=31, year=2000))
+
+    def test_leap_stats(self):
+        for now in leap_boundaries():
+            prev_per = timeutil.prev_per(now)
+            per_progress = (now - prev_per) / (timeutil.next_per(now) - prev_per)
+            cyc_progress = (now - timeutil.prev_cycle(now)).total_seconds() / (
+                (365 * 400 + 97) * 86400
+            )
+            stats = timeutil.leap_stats(now)
+            assert stats.drift == pytest.approx(timeutil.leap_drift(now), abs=1e-5)
+            assert stats.next_leap == (timeutil.next_leap(now) - now).total_seconds()
+            assert stats.period == pytest.approx(per_progress, abs=1e-12)
+            assert stats.cycle == pytest.approx(cyc_progress, abs=1e-12)
+
+    def test_leap_stats_on_boundaries(self):
+        stats = timeutil.leap_stats(datetime(2000, 3, 1))
+        assert stats == (0, 4 * 365 * 86400, 0, 0)
+        stats = timeutil.leap_stats(datetime(2024, 2, 29))
+        assert stats.next_leap == 0 and stats.period > 0.99
+        stats = timeutil.leap_stats(datetime(2024, 2, 29, 0, 0, 1))
+        assert stats.next_leap == 1461 * 86400 - 1
+
+    def test_sun_events(self):
+        sun = timeutil.Sun(lon=-74, lat=40.7)
+        sun.date = datetime(2024, 6, 20, 16, tzinfo=timezone.utc)
+        sun.refresh()
+        assert f"{sun.sunrise:%H:%M}" == "09:24"
+        assert f"{sun.sunset:%H:%M}" == "00:30"
+        assert sun.dawn < sun.sunrise < sun.ephemeris.noon < sun.sunset < sun.dusk
+        assert abs(sun.day_length - (sun.sunset - sun.sunrise)) < timedelta(seconds=1)
+
+    def test_polar_sun(self):
+        sun = timeutil.Sun(lon=15, lat=78)
+        sun.date = datetime(2024, 6, 20, 12, tzinfo=timezone.utc)
+        sun.refresh()
+        assert sun.ephemeris.polar_day and sun.day_length == timedelta(days=1)
+        assert sun.sunrise is None and sun.sunset is None
+        sun.date = datetime(2024, 12, 20, 12, tzinfo=timezone.utc)
+        sun.refresh()
+        assert sun.ephemeris.polar_night and sun.day_length == timedelta()
+        assert sun.dawn is None and sun.dusk is None
+
+    def test_ephemeris_cache(self):
+        timeutil.cached_ephemeris.cache_clear()
+        sun = timeutil.Sun(lon=-74, lat=40.7)
+        for hour in range(6, 18):
+            sun.date = datetime(2024, 6, 20, hour, tzinfo=timezone.utc)
+            sun.refresh()
+        cached = sun.ephemeris
+        sun.refresh(fixed=True)
+        assert sun.ephemeris != cached
+        info = timeutil.cached_ephemeris.cache_info()
+        assert (info.misses, info.hits) == (1, 11)
+
+
+class TestFrame:
+    def test_parse(self):
+        grid = frame.Grid.parse("\33[40m\33[97mAB\nC\33[0mD", rows=3, columns=4)
+        assert grid.cells[0][:3] == [("A", "97;40"), ("B", "97;40"), frame.BLANK]
+        assert grid.cells[1][:2] == [("C", "97;40"), ("D", "")]
+        assert grid.cells[2] == [frame.BLANK] * 4
+
+    def test_parse_clips_to_size(self):
+        grid = frame.Grid.parse("ABCDEF\n\n\nXYZ", rows=2, columns=3)
+        assert "".join(c for c, _ in grid.cells[0]) == "ABC"
+        assert len(grid.cells) == 2
+
+    def test_diff(self):
+        renderer = frame.DiffRenderer()
+        first = renderer.update(frame.Grid.parse("12:00:00\nLABEL", 2, 8))
+        assert first.startswith("\33[0m\33[2J")
+        assert renderer.update(frame.Grid.parse("12:00:00\nLABEL", 2, 8)) == ""
+        assert renderer.update(frame.Grid.parse("12:00:01\nLABEL", 2, 8)) == (
+            "\33[1;8H1"
+        )
+        assert renderer.update(frame.Grid.parse("12:00:01\nLABELS", 2, 8)) == (
+            "\33[2;6HS"
+        )
+        assert renderer.frames == 4
+        assert renderer.bytes_last == len("\33[2;6HS")
+
+    def test_diff_separate_runs(self):
+        renderer = frame.DiffRenderer()
+        renderer.update(frame.Grid.parse("A1234567890B", 1, 12))
+        assert renderer.update(frame.Grid.parse("X1234567890Y", 1, 12)) == (
+            "\33[1;1HX\33[1;12HY"
+        )
+
+    def test_diff_merges_short_gaps(self):
+        renderer = frame.DiffRenderer()
+        renderer.update(frame.Grid.parse("ABCDEFGH", 1, 8))
+        assert renderer.update(frame.Grid.parse("xBCx", 1, 8)) == "\33[1;1HxBCx    "
+
+    def test_diff_attributes(self):
+        renderer = frame.DiffRenderer()
+        renderer.update(frame.Grid.parse("\33[97mAB", 1, 2))
+        assert renderer.update(frame.Grid.parse("\33[97mA\33[94mB", 1, 2)) == (
+            "\33[1;2H\33[0;94mB"
+        )
+
+    def test_resize_redraws(self):
+        renderer = frame.DiffRenderer()
+        renderer.update(frame.Grid.parse("AB", 1, 2))
+        assert renderer.update(frame.Grid.parse("AB", 1, 3)).startswith("\33[0m\33[2J")
+
+    def test_template(self):
+        pieces = ["\33[94m[", 0, "] ", 1, "\n\33[97m|", 2, "|"]
+        template = frame.Template(pieces, rows=2, columns=10)
+        for a, b, c in [
+            ("\33[97mAB", "x", "1"),
+            ("\33[90mCD", "\33[40my", "2"),
+            ("EFG", "", "\33[0m3"),
+        ]:
+            lines = {0: a, 1: b, 2: c}
+            grid = template.fill(lines)
+            assert grid == frame.Grid.parse(template.render_text(lines), 2, 10)
+        # The first two frames share slot widths, the third compiles again
+        assert template.compiles == 2
+
+    def test_frame_writer(self):
+        read, write = os.pipe()
+        try:
+            writer = frame.FrameWriter(write)
+            writer.write("\33[1;1H\N{BOX DRAWINGS DOUBLE VERTICAL}")
+            writer.write("")
+            frame.FrameWriter(write, sync=False).write("X")
+            data = os.read(read, 1024)
+        finally:
+            os.close(read)
+            os.close(write)
+        assert data == (
+            frame.SYNC_BEGIN
+            + "\33[1;1H\N{BOX DRAWINGS DOUBLE VERTICAL}".encode("utf-8")
+            + frame.SYNC_END
+            + b"X"
+        )
+        assert writer.writes == 1
+
+
+@pytest.mark.skipif(np is None, reason="numpy is not installed")
+def write_psf2(path, glyphs, width=8, height=14):
+    # A gzipped PSF 2 font with a Unicode table, glyphs given as row bits
+    header = backends.PSF2_MAGIC + struct.pack(
+        "<7I", 0, 32, 1, len(glyphs), height, height, width
+    )
+    bitmaps = b"".join(bytes(rows) for rows in glyphs.values())
+    table = b"".join(ch.encode("utf-8") + b"\xff" for ch in glyphs)
+    with gzip.open(path, "wb") as f:
+        f.write(header + bitmaps + table)
+
+
+LETTER_A = (0, 0, 0x18, 0x3C, 0x66, 0x66, 0x7E, 0x66, 0x66, 0x66, 0, 0, 0, 0)
+
+
+class TestBackends:
+    def test_sgr_colors(self):
+        assert backends.sgr_colors("97;104") == (15, 12)
+        assert backends.sgr_colors("38;5;196;48;2;1;2;3") == (196, (1, 2, 3))
+        assert backends.sgr_colors("") == (None, None)
+        assert backends.nearest(196, 8) == 1
+        assert backends.nearest((250, 80, 80), 16) == 9
+        assert backends.pack_pixel((255, 255, 255), 16) == b"\xff\xff"
+        assert backends.pack_pixel((0, 0, 255), 32) == b"\xff\0\0\0"
+
+    def test_font(self, tmp_path):
+        path = str(tmp_path / "font.psf.gz")
+        write_psf2(path, {" ": (0,) * 14, "A": LETTER_A, "?": (0xFF,) * 14})
+        font = backends.Font.load(path)
+        assert (font.width, font.height) == (8, 14)
+        assert font.glyph("A") == LETTER_A
+        assert font.glyph("x") == (0xFF,) * 14
+        # Box drawing missing from the font is drawn
+        corner = font.glyph("╔")
+        assert corner[6] == 0b00011111 and corner[13] == 0b00010100
+        with pytest.raises(ValueError):
+            backends.Font.load(__file__)
+
+    def test_framebuffer(self, tmp_path):
+        font = str(tmp_path / "font.psf.gz")
+        write_psf2(font, {" ": (0,) * 14, "A": LETTER_A})
+        path = tmp_path / "fb0"
+        path.write_bytes(b"")
+        fb = backends.FramebufferBackend(str(path), font, 32, 28, 16)
+        assert fb.size() == os.terminal_size((4, 2))
+
+        def pixel(x, y):
+            offset = 2 * (32 * y + x)
+            return int.from_bytes(path.read_bytes()[offset : offset + 2], "little")
+
+        fb.start()
+        fb.draw(frame.Grid.parse("\33[97;40mA  A\nAAAA", 2, 4))
+        assert fb.cells_total == 8
+        assert (pixel(3, 2), pixel(0, 2), pixel(24 + 3, 2)) == (0xFFFF, 0, 0xFFFF)
+        assert pixel(8 + 3, 2) == 0
+        fb.draw(frame.Grid.parse("\33[97;40mA  A\nAAAA", 2, 4))
+        assert fb.cells_total == 8
+        fb.draw(frame.Grid.parse("\33[97;40mAA A\nAAAA", 2, 4))
+        assert fb.cells_total == 9
+        assert pixel(8 + 3, 2) == 0xFFFF
+        assert fb.frames == 3
+        fb.stop()
+        assert path.read_bytes() == bytes(32 * 28 * 2)
+
+
+class TestBatch:
+    def ordinals(self):
+        start = date(year=1899, month=1, day=1).toordinal()
+        end = date(year=2102, month=1, day=1).toordinal()
+        return np.arange(start, end)
+
+    def test_calendars(self):
+        days = self.ordinals()
+        ifc = batch.labels(batch.int_fix_dates(days, True), abbr.Month.ifc)
+        twc = batch.labels(batch.twc_dates(days, True), abbr.Month.twc)
+        pax = batch.labels(batch.pax_dates(days, True), abbr.Month.pax)
+        for i, day in enumerate(days.tolist()):
+            dt = datetime.fromordinal(day)
+            assert ifc[i] == cal.int_fix_date(dt)
+            assert twc[i] == cal.twc_date(dt)
+            assert pax[i] == cal.pax_date(dt)[1:]
+
+    def test_seconds(self):
+        seconds = np.array([946684800, 946684799, -1, 1234567890])
+        assert batch.ordinals(seconds).tolist() == [
+            date(year=2000, month=1, day=1).toordinal(),
+            date(year=1999, month=12, day=31).toordinal(),
+            date(year=1969, month=12, day=31).toordinal(),
+            date(year=2009, month=2, day=13).toordinal(),
+        ]
+        assert batch.julian_dates(seconds)[0] == 2451544.5
+        assert batch.julian_dates(seconds, reduced=True)[0] == 51544.5
+
+    def test_leap_stats(self):
+        instants = leap_boundaries() + [
+            datetime(1970, 1, 1) + timedelta(hours=h) for h in range(0, 10**6, 997)
+        ]
+        epoch = datetime(1970, 1, 1)
+        seconds = np.array([(dt - epoch).total_seconds() for dt in instants])
+        arrays = batch.leap_stats(seconds)
+        for i, dt in enumerate(instants):
+            expected = timeutil.leap_stats(dt)
+            for array, value in zip(arrays, expected):
+                assert array[i] == pytest.approx(value, abs=1e-5)
+
+
+class NtpStandIn(threading.Thread):
+    peer_variables = {
+        1: (
+            b'srcadr=192.0.2.1, srchost="time.example.com", refid=GPS, stratum=1,\r\n'
+            b"hmode=3, reach=0xff, hpoll=6, ppoll=7, delay=1.250, offset=-0.375,\r\n"
+            b"jitter=0.062"
+        ),
+        2: b"srcadr=192.0.2.2, refid=192.0.2.9, stratum=2, hmode=3, reach=0x7, "
+        b"hpoll=6, ppoll=6, delay=20.5, offset=3.25, jitter=1.5",
+    }
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        # None, "error" to refuse every control request, or "short" to
+        # truncate the association list
+        self.fault = None
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(("127.0.0.1", 0))
+        self.port = self.socket.getsockname()[1]
+
+    def control(self, opcode, sequence, association, offset, data, more=False, error=0):
+        header = struct.pack(
+            ">BBHHHHH",
+            0x16,
+            0x80 | (0x40 if error else 0) | (0x20 if more else 0) | opcode,
+            sequence,
+            error << 8,
+            association,
+            offset,
+            len(data),
+        )
+        return header + data + b"\0" * (-len(data) % 4)
+
+    def run(self):
+        while True:
+            packet, address = self.socket.recvfrom(2048)
+            if packet[0] & 0x07 == 3:
+                reply = bytearray(48)
+                reply[0] = 0x24
+                reply[1] = 1
+                reply[12:16] = b"GPS\0"
+                reply[24:32] = packet[40:48]
+                reply[32:48] = ntp.to_ntp_time(946684800) * 2
+                self.socket.sendto(bytes(reply), address)
+                continue
+            _, opcode, sequence, _, association, _, _ = struct.unpack(
+                ">BBHHHHH", packet[:12]
+            )
+            if self.fault == "error":
+                reply = self.control(opcode, sequence, association, 0, b"", error=4)
+                self.socket.sendto(reply, address)
+            elif opcode == ntp.Opcode.READSTAT:
+                data = struct.pack(">HHHH", 1, 0x961A, 2, 0x9414)
+                if self.fault == "short":
+                    data = data[:6]
+                self.socket.sendto(self.control(opcode, sequence, 0, 0, data), address)
+            else:
+                data = self.peer_variables[association]
+                # Answer in two fragments, the last one first
+                self.socket.sendto(
+                    self.control(opcode, sequence, association, 40, data[40:]),
+                    address,
+                )
+                self.socket.sendto(
+                    self.control(opcode, sequence, association, 0, data[:40], True),
+                    address,
+                )
+
+
+@pytest.fixture(scope="module")
+def ntp_server():
+    server = NtpStandIn()
+    server.start()
+    return server
+
+
+class TestNtp:
+    async def control_peers(self, port):
+        async with ntpclient.ControlClient("127.0.0.1", port, timeout=1) as client:
+            return await client.peers()
+
+    async def sntp_peers(self, port, timeout=1):
+        async with ntpclient.SntpClient("127.0.0.1", port, timeout) as client:
+            return await client.peers()
+
+    def test_control_peers(self, ntp_server):
+        peers = asyncio.run(self.control_peers(ntp_server.port))
+        assert peers[0] == ntp.NtpPeer(
+            state=ntp.State.PEER,
+            server_id="time.example.com",
+            ref_id=".GPS.",
+            stratum=1,
+            type="u",
+            poll=64,
+            reach=255,
+            delay=1.25,
+            offset=-0.375,
+            jitter=0.062,
+            source="GPS",
+        )
+        assert peers[1].state == ntp.State.PREFERRED
+        assert peers[1].server_id == "192.0.2.2"
+        assert peers[1].ref_id == "192.0.2.9"
+        assert ntp.select_peer(peers) is peers[0]
+
+    def test_sntp(self, ntp_server, monkeypatch):
+        monkeypatch.setattr(ntp, "server", "time.example.com")
+        (peer,) = asyncio.run(self.sntp_peers(ntp_server.port))
+        assert peer.server_id == "127.0.0.1"  # the host asked, not the setting
+        assert peer.state == ntp.State.PEER
+        assert peer.stratum == 1
+        assert peer.source == "GPS"
+        assert peer.delay < 1000
+        assert peer.offset < -1_000_000
+
+    def test_timeout(self):
+        silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        silent.bind(("127.0.0.1", 0))
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(self.sntp_peers(silent.getsockname()[1], 0.05))
+        silent.close()
+
+    def test_daemon_survives_errors(self, ntp_server, monkeypatch):
+        monkeypatch.setattr(ntp, "port", ntp_server.port)
+        monkeypatch.setattr(ntp, "interval", 0.01)
+        monkeypatch.setattr(ntp, "resolve_names", False)
+        monkeypatch.setattr(ntp, "peer", ntp.NtpPeer())
+        monkeypatch.setattr(ntp, "histories", {})
+        monkeypatch.setattr(ntp, "history", None)
+        seen = []
+
+        async def poll():
+            daemon = asyncio.ensure_future(ntpclient.ntp_daemon())
+            for fault in ("error", "short", None):
+                ntp_server.fault = fault
+                await asyncio.sleep(0.2)
+                seen.append(ntp.peer.server_id)
+            assert not daemon.done()
+            daemon.cancel()
+
+        try:
+            asyncio.run(poll())
+        finally:
+            ntp_server.fault = None
+        assert seen == [
+            "NTP control error 4",
+            "Short NTP association list",
+            "time.example.com",
+        ]
+
+    def test_select_peer(self):
+        assert ntp.select_peer([]) == ntp.NtpPeer()
+
+    def test_history(self):
+        random.seed(0)
+        history = PeerHistory(16)
+        samples = []
+        for i in range(50):
+            sample = (64.0 * i + random.random(), random.gauss(0, 1), 10, 0.1, 2)
+            history.append(*sample)
+            samples.append(sample)
+        assert len(history) == 16 and len(history.columns["offset"]) == 16
+        offsets = [sample[1] for sample in samples[-16:]]
+        assert history.values("offset") == offsets
+        assert history.mean("offset") == pytest.approx(sum(offsets) / 16)
+        assert history.stddev("offset") == pytest.approx(statistics.stdev(offsets))
+        tau = (samples[-1][0] - samples[-16][0]) / 15
+        allan = sum(
+            (c - 2 * b + a) ** 2 for a, b, c in zip(*(offsets[i:] for i in range(3)))
+        )
+        assert history.allan_deviation() == pytest.approx(
+            (allan / 28) ** 0.5 / tau / 1000
+        )
+        assert history.sparkline("offset", 4) == sparkline(offsets[-4:])
+        assert sparkline([1, 2, 3, 4, 5, 6, 7, 8]) == "▁▂▃▄▅▆▇█"
+        assert sparkline([5, 5]) == "▄▄"
+
+    def test_record(self, monkeypatch):
+        monkeypatch.setattr(ntp, "histories", {})
+        first, second = ntp.NtpPeer(server_id="a"), ntp.NtpPeer(server_id="b")
+        ntp.record([first, second], 0)
+        ntp.record([first, second], 3)  # not measured again yet
+        second.offset = 0.5
+        ntp.record([second], 6)
+        assert list(ntp.histories) == ["b"]
+        assert ntp.histories["b"].values("time") == [0, 6]
+
+
+class TestScheduler:
+    def test_deadlines(self):
+        scheduler = FrameScheduler(refresh=0.25)
+        assert scheduler.next_deadline(10.1) == 10.25
+        assert scheduler.next_deadline(10.9) == 11
+        assert FrameScheduler(refresh=2).next_deadline(11.5) == 12
+        assert FrameScheduler(refresh=2).next_deadline(12.5) == 14
+
+    @pytest.mark.parametrize("refresh", [0.1, 0.25])
+    def test_consecutive_deadlines(self, refresh):
+        scheduler = FrameScheduler(refresh=refresh)
+        scheduler.render_cost = 0.002
+        wall = 10.0
+        deadlines = []
+        for _ in range(20):
+            deadlines.append(scheduler.next_deadline(wall))
+            wall = deadlines[-1] + 0.003
+        gaps = [b - a for a, b in zip(deadlines, deadlines[1:])]
+        assert gaps == pytest.approx([refresh] * 19)
+        assert 11 in deadlines and 12 in deadlines
+
+    def test_second_boundary(self):
+        scheduler = FrameScheduler(refresh=0.001)
+        scheduler.render_cost = 0.05
+        assert scheduler.next_deadline(10.5) == 10.55
+        assert scheduler.next_deadline(10.93) == 11
+
+    def test_run(self):
+        scheduler = FrameScheduler(refresh=0.05)
+        written = []
+
+        def write(deadline):
+            written.append(deadline)
+            if len(written) == 4:
+                raise StopAsyncIteration
+
+        with pytest.raises(StopAsyncIteration):
+            asyncio.run(scheduler.run(lambda deadline: deadline, write))
+        assert all(round(d * 20, 6).is_integer() for d in written)
+        assert written == sorted(set(written))
+        assert scheduler.frames == 3
+
+    def test_warp(self):
+        start = datetime(2024, 3, 10, 6, 59, 59, tzinfo=timezone.utc).timestamp()
+        clock = WarpClock(start, speed=100)
+        scheduler = FrameScheduler(refresh=1, clock=clock)
+        written = []
+
+        def write(deadline):
+            written.append(deadline)
+            if len(written) == 5:
+                raise StopAsyncIteration
+
+        with pytest.raises(StopAsyncIteration):
+            asyncio.run(scheduler.run(lambda deadline: deadline, write))
+        # Five ticks of simulated seconds take about 50 ms
+        assert all(d.is_integer() for d in written)
+        assert written == sorted(set(written))
+        assert start < written[0] and written[-1] >= start + 5
+        assert clock.time() - start < 60
+
+
+class TestGovernor:
+    def test_budget(self, monkeypatch):
+        clock = {"wall": 0.0, "cpu": 0.0}
+        monkeypatch.setattr(governor.time, "monotonic", lambda: clock["wall"])
+        monkeypatch.setattr(governor.time, "process_time", lambda: clock["cpu"])
+        rate_governor = governor.Governor(target=100, budget=0.1, interval=5)
+        # 5 ms of CPU per frame allows 20 frames per second
+        clock.update(wall=5.0, cpu=2.5)
+        assert rate_governor.update(frames=500) == 20
+        assert (rate_governor.reason, rate_governor.cpu) == ("budget", 0.5)
+        # Cheaper frames raise the rate, at most twofold per interval
+        clock.update(wall=10.0, cpu=2.51)
+        assert rate_governor.update(frames=600) == 40
+        assert rate_governor.poll(600) is None
+        rate_governor.set_focus(False)
+        assert rate_governor.poll(610) == 1
+        assert rate_governor.reason == "unfocused"
+        rate_governor.set_focus(True)
+        assert rate_governor.poll(620) == 40
+
+    def test_idle(self, tmp_path, monkeypatch):
+        card = tmp_path / "card0-HDMI-A-1"
+        card.mkdir()
+        (card / "status").write_text("connected\n")
+        (card / "dpms").write_text("On\n")
+        monkeypatch.setattr(governor, "DPMS_GLOB", str(tmp_path / "card*-*/dpms"))
+        monkeypatch.setattr(governor, "BACKLIGHT_GLOB", str(tmp_path / "none"))
+        assert not governor.display_blanked()
+        (card / "dpms").write_text("Off\n")
+        assert governor.display_blanked()
+
+        watchers = []
+        rate_governor = governor.Governor(
+            target=50,
+            idle=0.5,
+            log=str(tmp_path / "rates.log"),
+            blank_probe=governor.display_blanked,
+            watching=lambda: bool(watchers),
+        )
+        assert rate_governor.poll(1) == 0.5
+        assert rate_governor.reason == "unwatched"
+        assert rate_governor.update(2) == 0.5
+        assert rate_governor.reason == "blanked"
+        (card / "dpms").write_text("On\n")
+        watchers.append(None)
+        assert rate_governor.update(3) == 50
+        log = [json.loads(line) for line in open(tmp_path / "rates.log")]
+        assert [entry["reason"] for entry in log] == ["blanked", "target"]
+
+    def test_focus_events(self):
+        assert governor.focus_events(b"abc") is None
+        assert governor.focus_events(b"\33[I") is True
+        assert governor.focus_events(b"\33[Ix\33[O") is False
+        assert governor.focus_events(b"\33[O\33[I") is True
+
+    def test_scheduler_follows_governor(self):
+        rate_governor = governor.Governor(target=100, idle=10)
+        rate_governor.set_focus(False)
+        scheduler = FrameScheduler(refresh=0.01, governor=rate_governor)
+        written = []
+
+        def write(deadline):
+            written.append(deadline)
+            if len(written) == 4:
+                raise StopAsyncIteration
+
+        with pytest.raises(StopAsyncIteration):
+            asyncio.run(scheduler.run(lambda deadline: deadline, write))
+        assert scheduler.period == pytest.approx(0.1)
+        assert all(round(d * 10, 6).is_integer() for d in written[1:])
+
+
+class TestRecording:
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / "frames.rec")
+        chrono.Chronometer.setup(chrono_config(), os.terminal_size((60, 24)))
+        start = Instant.from_datetime(datetime(2024, 2, 29, 10, tzinfo=timezone.utc))
+        screens = {}
+        with Recorder(path, 60, 24) as recorder:
+            for step in range(20):
+                now = Instant(start.ns + step * 3600 * NS, start.offset)
+                screens[now.ns] = chrono.Chronometer.render(now)
+                recorder.append(now.ns, screens[now.ns])
+        full = sum(len(screen.encode("utf-8")) for screen in screens.values())
+        assert os.path.getsize(path) < full / 5
+
+        with pytest.raises(ValueError, match="recorded at 60x24, not 80x30"):
+            Recorder(path, 80, 30)
+        with open(path, "ab") as f:
+            f.write(struct.pack("<qI", start.ns, 100) + b"\0" * 5)  # an interrupted write
+        with Recorder(path, 60, 24) as recorder:
+            recorder.append(start.ns - NS, "earlier")
+        with open(path, "ab") as f:
+            f.write(b"\0" * 7)
+        with Recording(path) as recording:
+            assert (recording.columns, recording.rows) == (60, 24)
+            assert len(recording) == 21
+            assert recording.frame(0) == (start.ns - NS, "earlier")
+            middle = start.ns + 10 * 3600 * NS
+            assert recording.seek(middle) == 11
+            replayed = dict(recording.frames(start.ns, middle))
+            assert list(replayed) == sorted(screens)[:10]
+            assert all(replayed[ns] == screens[ns] for ns in replayed)
+
+    def test_simulate(self, tmp_path):
+        chrono.Chronometer.setup(chrono_config(), os.terminal_size((60, 24)))
+        path = str(tmp_path / "steps.rec")
+        start = datetime(2024, 2, 28, 12, tzinfo=timezone.utc).timestamp()
+        times = [start + 86400 * day for day in range(3)]
+        with Recorder(path, 60, 24) as recorder:
+            report = chrono.simulate(chrono.Display(recorder=recorder), times, 2)
+        assert report.startswith("Frames: 3  Mean: ")
+        assert len(report.splitlines()) == 3
+        with Recording(path) as recording:
+            assert [ns // NS for ns in recording.times] == times
+            assert "THURSDAY FEBRUARY 29, 2024" in recording.frame(1)[1]
+
+    def test_arguments(self, tmp_path, capsys):
+        assert chrono.parse_args(["--replay", "x", "--speed", "0.5"]).speed == 0.5
+        for speed in ("0", "-2", "inf", "nan"):
+            with pytest.raises(SystemExit):
+                chrono.parse_args(["--replay", "x", "--speed", speed])
+            assert "speed must be a positive number" in capsys.readouterr().err
+        steps = tmp_path / "steps"
+        steps.write_text("1709208000\n\n2024-02-29T12:00:00Z\nnoon\n")
+        times = chrono.read_times(str(steps))
+        assert [next(times), next(times)] == [1709208000, 1709208000]
+        with pytest.raises(ValueError, match="line 4: not a time: noon"):
+            next(times)
+
+
+class TestZoneTables:
+    zones = ["US/Pacific", "Europe/London", "Asia/Kolkata", "Australia/Lord_Howe"]
+
+    def test_offsets_match_pytz(self):
+        rng = random.Random(0)
+        for zone in self.zones:
+            tz = pytz.timezone(zone)
+            table = tzcache.ZoneTable.from_tzinfo(tz)
+            instants = [rng.uniform(0, 2.2e9) for _ in range(200)]
+            instants += [t + d for t in table.transitions[1:][-40:] for d in (-1, 0, 1)]
+            for epoch in instants:
+                expected = datetime.fromtimestamp(epoch, tz).utcoffset()
+                assert table.offset(epoch) == expected.total_seconds()
+
+    def test_valid_until_next_transition(self):
+        table = tzcache.ZoneTable.from_tzinfo(pytz.timezone("Europe/London"))
+        spring = datetime(2024, 3, 31, 1, tzinfo=timezone.utc).timestamp()
+        assert table.offset(spring - 1) == 0
+        assert table.valid_until == spring
+        assert table.offset(spring) == 3600
+        assert table.valid_from == spring
+
+    def test_other_tzinfo(self):
+        fixed = tzcache.ZoneTable.from_tzinfo(timezone(timedelta(hours=-3)))
+        assert fixed.offset(0) == fixed.offset(2e9) == -3 * 3600
+        utc = tzcache.ZoneTable.from_tzinfo(pytz.utc)
+        assert utc.offset(1e9) == 0
+
+    def test_local_fields(self):
+        epoch = datetime(2024, 2, 29, 23, 59, 30, tzinfo=timezone.utc).timestamp()
+        day, weekday, hour, minute = tzcache.local_fields(epoch)
+        assert date.fromordinal(day + date(1970, 1, 1).toordinal()) == date(2024, 2, 29)
+        assert (weekday, hour, minute) == (3, 23, 59)
+        assert tzcache.local_fields(-1) == (-1, 2, 23, 59)
+
+
+def default_business_hours(weekday, hour, second_fraction):
+    # The highlighting rule the world clock used before schedules
+    if weekday >= 5:
+        return False
+    if hour == 8:
+        return second_fraction < 0.1
+    if hour == 17:
+        return second_fraction >= 0.1
+    return 8 < hour < 17
+
+
+class TestBusinessHours:
+    def test_parse(self):
+        assert business.parse_hours("08:30-17:45 sun-thu") == (
+            30600,
+            63900,
+            [0, 1, 2, 3, 6],
+        )
+        assert business.parse_hours("9-17")[2] == [0, 1, 2, 3, 4]
+        assert business.parse_days("mon,wed,fri-sat") == [0, 2, 4, 5]
+        assert business.parse_holidays("1970-01-02, 2024-12-25") == [1, 20082]
+        with pytest.raises(ValueError):
+            business.parse_hours("17:00-09:00")
+
+    def test_default_schedule(self):
+        zones = [
+            (name, tzcache.ZoneTable.from_tzinfo(pytz.timezone(name)))
+            for name in ("US/Eastern", "Europe/London", "Asia/Kathmandu")
+        ]
+        schedule = business.Schedule.compile(zones, {}, {})
+        random.seed(2)
+        epoch = datetime(2024, 3, 1, tzinfo=timezone.utc).timestamp()
+        for _ in range(20000):
+            epoch += random.choice([0.05, 0.95, 61, 1799.9])
+            schedule.advance(epoch)
+            for name, table in zones:
+                _, weekday, hour, _ = tzcache.local_fields(epoch + table.offset(epoch))
+                state = schedule.state(name)
+                assert business.lit(state, epoch % 1) == default_business_hours(
+                    weekday, hour, epoch % 1
+                )
+            assert schedule.next_change > epoch
+
+    def test_hours_and_holidays(self):
+        config = chrono_config()
+        config.business_hours = {"LONDON": business.parse_hours("10:00-16:00")}
+        config.holidays = {"DEFAULT": business.parse_holidays("2024-12-25")}
+        config.blink = 1800
+        chrono.Chronometer.setup(config, os.terminal_size((60, 24)))
+        schedule = chrono.Chronometer.schedule
+
+        def states(*when):
+            epoch = datetime(*when, tzinfo=timezone.utc).timestamp()
+            schedule.advance(epoch)
+            return schedule.state("LONDON"), schedule.state("GERMANY")
+
+        assert states(2024, 12, 24, 9, 40) == (business.OPENING, business.OPEN)
+        assert states(2024, 12, 24, 16, 10) == (business.CLOSING, business.CLOSING)
+        assert states(2024, 12, 24, 16, 31) == (business.CLOSED, business.CLOSED)
+        assert states(2024, 12, 25, 12) == (business.CLOSED, business.CLOSED)
+        assert states(2024, 12, 26, 12) == (business.OPEN, business.OPEN)
+
+
+@pytest.fixture(scope="module")
+def zone_index(tmp_path_factory):
+    return zoneindex.load(str(tmp_path_factory.mktemp("zones")))
+
+
+class TestZoneIndex:
+    def test_search(self, zone_index):
+        assert zone_index.search("kolk") == ["Asia/Kolkata"]
+        assert zone_index.search("New York") == ["America/New_York"]
+        assert zone_index.search("britain") == ["Europe/London", "GB", "GB-Eire"]
+        assert zone_index.search("tokio") == ["Asia/Tokyo"]
+        assert zone_index.search("qqqq") == []
+
+    def test_countries(self, zone_index):
+        assert zone_index.find_countries("japan") == ["JP"]
+        assert zone_index.zones_of("JP") == ["Asia/Tokyo"]
+        assert zone_index.zones_of("US")[0] == "US/Alaska"
+        assert "EST5EDT" not in zone_index.zones_of("ES")
+
+    def test_offsets(self, zone_index):
+        epoch = datetime(2024, 7, 1, tzinfo=timezone.utc).timestamp()
+        assert zone_index.with_offset(zoneindex.parse_offset("+0530"), epoch) == [
+            "Asia/Calcutta",
+            "Asia/Colombo",
+            "Asia/Kolkata",
+        ]
+        for name in ("America/New_York", "Australia/Lord_Howe", "Asia/Kathmandu"):
+            expected = datetime.fromtimestamp(epoch, pytz.timezone(name)).utcoffset()
+            assert zone_index.offset(name, epoch) == expected.total_seconds()
+        assert zoneindex.parse_offset("UTC-8") == -8 * 3600
+        assert zoneindex.parse_offset("+05:45") == 20700
+        assert zoneindex.format_offset(-12600) == "-0330"
+
+    def test_cache(self, tmp_path, monkeypatch):
+        built = zoneindex.load(str(tmp_path))
+        monkeypatch.setattr(zoneindex.ZoneIndex, "build", None)
+        cached = zoneindex.load(str(tmp_path))
+        assert cached.tokens == built.tokens
+        assert [t.offsets for t in cached.zones] == [t.offsets for t in built.zones]
+        monkeypatch.setattr(configcache, "tzdata_stamp", lambda: [0, 0])
+        with pytest.raises(TypeError):
+            zoneindex.load(str(tmp_path))
+
+
+def time_core_frame(now):
+    return (
+        clock.sidereal_time(now, -74.0),
+        clock.metric_time(now),
+        clock.hex_time(now),
+        clock.new_earth_time(now),
+        clock.sit_time(now),
+        clock.utc_time(now),
+        clock.unix_time(now),
+        cal.julian_date(now),
+        cal.int_fix_date(now),
+        timeutil.day_of_year(now),
+        timeutil.is_leap_year(now),
+    )
+
+
+class TestTimeCore:
+    def test_fields_match_datetime(self):
+        rng = random.Random(0)
+        for _ in range(2000):
+            ns = rng.randrange(-(10**19), 10**19)
+            offset = rng.choice((0, -18000, 19800, 31500, -34200))
+            instant = Instant(ns, offset)
+            dt = datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(
+                microseconds=ns // 1000
+            )
+            dt = dt.astimezone(timezone(timedelta(seconds=offset)))
+            assert instant.to_datetime() == dt
+            fields = ("year", "month", "day", "hour", "minute", "second")
+            assert [getattr(instant, f) for f in fields] == [
+                getattr(dt, f) for f in fields
+            ]
+            assert instant.microsecond == dt.microsecond
+            assert instant.toordinal() == dt.toordinal()
+            assert instant.weekday() == dt.weekday()
+            assert instant.day_of_year() == dt.timetuple().tm_yday
+            assert Instant.from_datetime(dt) == Instant(ns // 1000 * 1000, offset)
+
+    def test_converters_match_datetime(self):
+        rng = random.Random(1)
+        tz = pytz.timezone("Asia/Kolkata")
+        for _ in range(500):
+            dt = datetime.fromtimestamp(rng.randrange(0, 4 * 10**9), tz)
+            instant = Instant.from_datetime(dt)
+            assert time_core_frame(instant) == pytest.approx(time_core_frame(dt))
+            assert timeutil.leap_stats(instant) == pytest.approx(
+                timeutil.leap_stats(dt)
+            )
+            assert cal.pax_date(instant) == cal.pax_date(dt)
+
+    def test_allocations(self):
+        # A frame's time fields come from one integer sample, so the converters
+        # allocate far less than with an aware datetime.
+        def peak(make):
+            time_core_frame(make(1709146799.25))
+            tracemalloc.start()
+            try:
+                peaks = []
+                for i in range(50):
+                    tracemalloc.reset_peak()
+                    start = tracemalloc.get_traced_memory()[0]
+                    time_core_frame(make(1709146799.25 + i / 10))
+                    peaks.append(tracemalloc.get_traced_memory()[1] - start)
+            finally:
+                tracemalloc.stop()
+            return max(peaks)
+
+        offset = 19800
+        tz = timezone(timedelta(seconds=offset))
+        assert peak(lambda s: Instant.from_seconds(s, offset)) * 2 < peak(
+            lambda s: datetime.fromtimestamp(s, tz)
+        )
+
+
+class TestServer:
+    grids = [frame.Grid.parse(text, 2, 4) for text in ("AB\nCD", "AX\nCD", "AX\nCY")]
+
+    async def serve(self, start, connect, count):
+        server = FrameServer()
+        listener = await start(server)
+        reader, writer = await connect()
+        while len(server.subscribers) < count:
+            await asyncio.sleep(0.01)
+        received = []
+        for grid in self.grids:
+            server.publish(grid)
+            await asyncio.sleep(0.02)
+            received.append(await reader.read(4096))
+        writer.close()
+        listener.close()
+        return received
+
+    def test_unix_socket(self, tmp_path):
+        path = str(tmp_path / "chrono.sock")
+        received = asyncio.run(
+            self.serve(
+                lambda server: server.serve_unix(path),
+                lambda: asyncio.open_unix_connection(path),
+                1,
+            )
+        )
+        assert received[0].startswith(b"\33[?25l\33[0m\33[2J")
+        assert received[1:] == [b"\33[1;2HX", b"\33[2;2HY"]
+
+    def test_sse(self):
+        port = free_port()
+
+        async def connect():
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /events HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            return reader, writer
+
+        received = asyncio.run(
+            self.serve(lambda server: server.serve_http("127.0.0.1", port), connect, 1)
+        )
+        assert received[0].startswith(b"HTTP/1.1 200 OK\r\n")
+        assert b"text/event-stream" in received[0]
+        assert received[1:] == [b"data: \33[1;2HX\n\n", b"data: \33[2;2HY\n\n"]
+
+    def test_slow_client_gets_latest_frame(self):
+        subscriber = Subscriber(None, lambda text: text.encode())
+        for grid in self.grids:
+            subscriber.offer(grid)
+        assert subscriber.dropped == 2
+        assert subscriber.pending is self.grids[-1]
+
+
+class TestMetrics:
+    def test_histogram(self):
+        histogram = Histogram((0.001, 0.01))
+        for value in (0.0005, 0.001, 0.002, 1.0):
+            histogram.observe(value)
+        assert histogram.samples() == [
+            ("_bucket", '{le="0.001"}', 2),
+            ("_bucket", '{le="0.01"}', 3),
+            ("_bucket", '{le="+Inf"}', 4),
+            ("_sum", "", 1.0035),
+            ("_count", "", 4),
+        ]
+
+    def test_serialize(self, monkeypatch):
+        monkeypatch.setattr(ntp, "service_status", ntp.ServiceStatus.ACTIVE)
+        monkeypatch.setattr(
+            ntp, "peer", ntp.NtpPeer(state=ntp.State.PEER, server_id='a"b', offset=-2)
+        )
+        history = PeerHistory()
+        history.append(0, -2, 1, 0.1, 2)
+        monkeypatch.setattr(ntp, "histories", {"192.0.2.1": history})
+        metrics = Metrics(interval=math.inf)
+        metrics.frame(0.0002, 0.00005, 0.001, False)
+        metrics.frame(0.02, 0.00005, 0.03, True)
+        assert b"chronometer_frames_total 1" not in metrics.response
+        metrics.update()
+        headers, _, body = metrics.response.partition(b"\r\n\r\n")
+        assert headers.startswith(b"HTTP/1.1 200 OK\r\n")
+        assert b"Content-Length: %d" % len(body) in headers
+        lines = body.decode().splitlines()
+        for line in (
+            'chronometer_frame_render_seconds_bucket{le="0.00025"} 1',
+            'chronometer_frame_render_seconds_bucket{le="+Inf"} 2',
+            "chronometer_frame_write_seconds_count 2",
+            "chronometer_frames_total 2",
+            "chronometer_deadline_misses_total 1",
+            "chronometer_frame_lateness_max_seconds 0.03",
+            'chronometer_ntp_service_status{status="active"} 1',
+            'chronometer_ntp_service_status{status="inactive"} 0',
+            "chronometer_ntp_synced 1",
+            'chronometer_ntp_offset_seconds{peer="a\\"b"} -0.002',
+            'chronometer_ntp_peer_samples{peer="192.0.2.1"} 1',
+            'chronometer_ntp_peer_allan_deviation{peer="192.0.2.1"} NaN',
+            "# TYPE process_resident_memory_bytes gauge",
+        ):
+            assert line in lines
+
+    def test_server(self):
+        metrics = Metrics()
+        server = MetricsServer(metrics, "127.0.0.1", 0)
+        server.start()
+
+        def get(path):
+            with socket.create_connection(("127.0.0.1", server.port)) as sock:
+                sock.sendall(b"GET %s HTTP/1.1\r\nHost: localhost\r\n\r\n" % path)
+                response = b""
+                while True:
+                    data = sock.recv(65536)
+                    if not data:
+                        return response
+                    response += data
+
+        try:
+            assert get(b"/metrics") == metrics.response
+            assert get(b"/").startswith(b"HTTP/1.1 404")
+            assert server.scrapes == 1
+        finally:
+            server.close()
+        server.join(1)
+        assert not server.is_alive()
+
+    def test_scheduler(self):
+        scheduler = FrameScheduler(refresh=0.01, metrics=Metrics())
+
+        def write(deadline):
+            if scheduler.frames == 2:
+                raise StopAsyncIteration
+
+        with pytest.raises(StopAsyncIteration):
+            asyncio.run(scheduler.run(lambda deadline: deadline, write))
+        assert scheduler.metrics.frames == 2
+        assert scheduler.metrics.render.count == 2
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestConvert:
+    lines = [
+        "1709208000\n",
+        "2024-02-29T07:00:00-05:00\n",
+        "bad\n",
+        "2024-02-29 12:00\n",
+    ]
+
+    def test_csv(self):
+        options = convert.Options(systems=("DEC", "IFC", "JUL"))
+        rows = convert.convert_chunk(self.lines, options).splitlines()
+        assert rows[0] == "1709208000,05:00:00,WED MAR 04,2460370.0"
+        assert rows[1] == "2024-02-29T07:00:00-05:00,05:00:00,WED MAR 04,2460370.0"
+        assert rows[2] == "bad,,,"
+        assert rows[3].startswith("2024-02-29 12:00,05:00:00,")
+
+    def test_jsonl_fields(self):
+        options = convert.Options(
+            systems=("HEX", "LST"), format="jsonl", time_zone="US/Eastern", field=1
+        )
+        rows = convert.convert_chunk(["x,1709208000,y", "x"], options).splitlines()
+        assert json.loads(rows[0]) == {
+            "timestamp": "1709208000",
+            "HEX": "4_AA_A.AAA",
+            "LST": "22:35:11",
+        }
+        assert json.loads(rows[1]) == {"timestamp": "", "HEX": "", "LST": ""}
+
+    def test_pool(self, tmp_path):
+        path = tmp_path / "times.txt"
+        path.write_text("".join(f"{1.7e9 + 3.7 * i}\n" for i in range(500)))
+        convert.main([str(path), "-o", str(tmp_path / "one.csv"), "--chunk-size", "64"])
+        convert.main(
+            [
+                str(path),
+                "-o",
+                str(tmp_path / "two.csv"),
+                "-j",
+                "2",
+                "--chunk-size",
+                "64",
+            ]
+        )
+        one = (tmp_path / "one.csv").read_text()
+        assert one == (tmp_path / "two.csv").read_text()
+        assert one.startswith("timestamp,DEC,SIT,NET,HEX,LST,SOL,IFC,TWC,PAX,JUL\n")
+        assert one.count("\n") == 501
+
+
+class TestConfigCache:
+    @pytest.fixture
+    def home(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("HOME", str(tmp_path))
+        default = os.path.join(
+            os.path.dirname(chrono.__file__), "files", "default_config.ini"
+        )
+        with open(default, encoding="utf-8") as f:
+            (tmp_path / ".chrono_config").write_text(f.read())
+        return tmp_path
+
+    def uncompiled(self, path):
+        raise AssertionError("config was parsed instead of loaded from the cache")
+
+    def test_compiled_once(self, home, monkeypatch):
+        parsed = chrono.load_config()
+        assert (home / ".chrono_config.cache").exists()
+        monkeypatch.setattr(chrono, "parse_config", self.uncompiled)
+        cached = chrono.load_config()
+        for name in chrono.CACHED_SETTINGS:
+            assert getattr(cached, name) == getattr(parsed, name)
+        assert [label for label, _ in cached.time_zones][:3] == [
+            "PACIFIC",
+            "EASTERN",
+            "ISRAEL",
+        ]
+        tz = pytz.timezone("Asia/Jerusalem")
+        table = cached.time_zones[2][1]
+        for epoch in range(0, 2_000_000_000, 7_777_777):
+            expected = datetime.fromtimestamp(epoch, tz).utcoffset().total_seconds()
+            assert table.offset(epoch) == expected
+
+    def test_touched_config_keeps_cache(self, home, monkeypatch):
+        chrono.load_config()
+        os.utime(home / ".chrono_config", ns=(0, 0))
+        monkeypatch.setattr(chrono, "parse_config", self.uncompiled)
+        assert chrono.load_config().refresh == 0.001
+        # The cache was stamped again, so the config is not hashed twice
+        monkeypatch.setattr(configcache, "digest", self.uncompiled)
+        assert chrono.load_config().refresh == 0.001
+
+    def test_edited_config_is_recompiled(self, home):
+        chrono.load_config()
+        config = home / ".chrono_config"
+        config.write_text(
+            config.read_text().replace("refresh = 0.001", "refresh = 0.5")
+        )
+        os.utime(config, ns=(0, 0))
+        assert chrono.load_config().refresh == 0.5
+
+    def test_cache_missing_setting_is_recompiled(self, home):
+        chrono.load_config()
+        cache = home / ".chrono_config.cache"
+        header, _, body = cache.read_bytes().partition(b"\n")
+        fields = json.loads(header)
+        del fields["settings"]["sites"]
+        cache.write_bytes(json.dumps(fields).encode() + b"\n" + body)
+        assert chrono.load_config().sites == []
+
+    def test_business_hours(self, home):
+        config = home / ".chrono_config"
+        config.write_text(
+            config.read_text()
+            .replace("blink = 60", "blink = 15\nIsrael = 08:00-17:00 sun-thu")
+            .replace("# default = 2025-01-01", "default = 2024-12-25")
+        )
+        parsed = chrono.load_config()
+        cached = chrono.load_config()
+        assert cached.business_hours == parsed.business_hours
+        assert cached.business_hours["ISRAEL"] == (28800, 61200, [0, 1, 2, 3, 6])
+        assert cached.holidays == parsed.holidays == {"DEFAULT": [20082]}
+        assert cached.blink == parsed.blink == 900
+
+    def test_check_config(self, home, capsys):
+        assert chrono.check_config() == 0
+        assert "10 time zones" in capsys.readouterr().out
+        config = home / ".chrono_config"
+        config.write_text(config.read_text().replace("Asia/Tokyo", "Asia/Nowhere"))
+        assert chrono.check_config() == 1
+        assert "Asia/Nowhere" in capsys.readouterr().out
+
+
+def chrono_config():
+    config = chrono.ChronoConfig()
+    config.latitude = 40.7
+    config.longitude = -74
+    config.refresh = 0.1
+    config.time_zones = [
+        (name.upper(), pytz.timezone(zone))
+        for name, zone in [
+            ("Pacific", "US/Pacific"),
+            ("Eastern", "US/Eastern"),
+            ("London", "Europe/London"),
+            ("Germany", "Europe/Berlin"),
+            ("India", "Asia/Kolkata"),
+            ("Hong_Kong", "Asia/Hong_Kong"),
+            ("Japan", "Asia/Tokyo"),
+            ("Sydney", "Australia/Sydney"),
+        ]
+    ]
+    return config
+
+
+class TestChronometer:
+    def test_render(self):
+        chrono.Chronometer.setup(chrono_config(), os.terminal_size((60, 24)))
+        now = datetime(year=2024, month=2, day=29, hour=12, tzinfo=timezone.utc)
+        screen = chrono.Chronometer.render(now)
+        grid = frame.Grid.parse(screen, 24, 60)
+        lines = ["".join(c for c, _ in row) for row in grid.cells]
+        assert screen.count("\n") == 21
+        assert "UNX 1709208000" in lines[11]
+        assert lines[0].strip().startswith("12:00:00 PM")
+        assert lines[0].strip().endswith("THURSDAY FEBRUARY 29, 2024")
+
+    def test_render_grid(self):
+        chrono.Chronometer.setup(chrono_config(), os.terminal_size((60, 24)))
+        start = datetime(year=2024, month=2, day=29, hour=10, tzinfo=timezone.utc)
+        for step in range(40):
+            now = start + timedelta(seconds=0.3 * step)
+            random.seed(step)
+            screen = chrono.Chronometer.render(now)
+            random.seed(step)
+            grid = chrono.Chronometer.render_grid(now, overlay="PROFILE" * step)
+            expected = frame.Grid.parse(f"{screen}\n{'PROFILE' * step}", 24, 60)
+            assert grid == expected
+
+    def test_render_profiled(self, monkeypatch):
+        chrono.Chronometer.setup(chrono_config(), os.terminal_size((60, 24)))
+        now = datetime(year=2024, month=2, day=29, hour=12, tzinfo=timezone.utc)
+        random.seed(0)
+        screen = chrono.Chronometer.render(now)
+        chrono.Chronometer.setup(chrono_config(), os.terminal_size((60, 24)))
+        monkeypatch.setattr(chrono.Chronometer, "profiler", Profiler(size=4))
+        random.seed(0)
+        assert chrono.Chronometer.render(now) == screen
+        stats = chrono.Chronometer.profiler.summary()
+        assert stats["layout"]["count"] == 1
+        for name in (widget.name for widget in chrono.Chronometer.widgets):
+            assert stats[f"{name}.compute"]["count"] == 1
+            assert stats[f"{name}.format"]["count"] == 1
+        assert chrono.Chronometer.profiler.overlay_line(60).startswith("P50us HEA ")
+
+    def test_widget_cache(self, monkeypatch):
+        chrono.Chronometer.setup(chrono_config(), os.terminal_size((60, 24)))
+        monkeypatch.setattr(chrono.Chronometer, "profiler", Profiler(size=8))
+        start = datetime(2024, 2, 29, 10, 0, 0, 500000, tzinfo=timezone.utc)
+        for step in range(4):
+            chrono.Chronometer.render(start + timedelta(seconds=0.25 * step))
+        stats = chrono.Chronometer.profiler.summary()
+        counts = {name.split(".")[0]: stats[name]["count"] for name in stats}
+        assert counts == {
+            "header": 2,
+            "bars": 4,
+            "times": 4,
+            "dates": 1,
+            "leap": 4,
+            "world": 1,
+            "ntp": 1,
+            "sites": 1,
+            "layout": 4,
+        }
+
+    def test_widget_cache_invalidation(self, monkeypatch):
+        chrono.Chronometer.setup(chrono_config(), os.terminal_size((60, 24)))
+        now = datetime(2024, 2, 29, 12, tzinfo=timezone.utc)
+        chrono.Chronometer.render(now)
+        monkeypatch.setattr(ntp, "service_status", ntp.ServiceStatus.ACTIVE)
+        monkeypatch.setattr(ntp, "peer", ntp.NtpPeer(server_id="ntp.example.org"))
+        assert "ntp.example.org" in chrono.Chronometer.render(now)
+        history = PeerHistory()
+        monkeypatch.setattr(ntp, "history", history)
+        history.append(0, 0.25, 1, 0.1, 2)
+        history.append(64, -0.25, 1, 0.1, 2)
+        assert "█▁ ST 16" in chrono.Chronometer.render(now)
+        earlier = chrono.Chronometer.render(now - timedelta(days=1))
+        assert "JUL 2460369.000" in earlier
+
+    def test_world_resorts_on_transition(self):
+        config = chrono_config()
+        config.time_zones[4] = ("HALF", timezone(timedelta(minutes=30)))
+        chrono.Chronometer.setup(config, os.terminal_size((60, 24)))
+        winter = Instant.from_datetime(
+            datetime(2024, 3, 31, 0, 59, tzinfo=timezone.utc)
+        )
+        summer = Instant(winter.ns + 120 * NS)
+        names = [z[0] for z in chrono.Chronometer.compute_world(winter)]
+        assert names.index("LONDON") < names.index("HALF")
+        names = [z[0] for z in chrono.Chronometer.compute_world(summer)]
+        assert names.index("LONDON") > names.index("HALF")
+        zones = {z[0]: z[1:] for z in chrono.Chronometer.compute_world(summer)}
+        assert zones["LONDON"] == (2, 1, False, " ")
+        assert zones["SYDNEY"][:2] == (12, 1)
+        assert zones["PACIFIC"] == (18, 1, False, "-")
+
+    def test_render_sites(self, monkeypatch):
+        config = chrono_config()
+        config.sites = [("SYDNEY", -33.9, 151.2), ("SVALBARD", 78.2, 15.6)]
+        chrono.Chronometer.setup(config, os.terminal_size((60, 30)))
+        monkeypatch.setattr(chrono.Chronometer, "profiler", Profiler(size=8))
+        now = datetime(2024, 6, 21, 12, tzinfo=timezone.utc)
+        random.seed(0)  # the bars jitter
+        home = chrono.Chronometer.render(now).split("\n")
+        stats = chrono.Chronometer.profiler.summary()
+        assert stats["sites.compute"]["count"] == 1
+        assert stats["times.compute"]["count"] == 1
+        assert "SVALBARD   SOL " in home[-2]
+        assert "RISE --:-- SET --:--" in home[-2]
+        assert clock.local_sidereal_time(
+            clock.sidereal_angle(now), 151.2
+        ) == clock.sidereal_time(now, 151.2)
+
+        chrono.Chronometer.select_site("sydney")
+        random.seed(0)
+        sydney = chrono.Chronometer.render(now).split("\n")
+        changed = [i for i, (a, b) in enumerate(zip(home, sydney)) if a != b]
+        assert changed and all("SOL" in home[i] or "LST" in home[i] for i in changed)
+        with pytest.raises(ValueError):
+            chrono.Chronometer.select_site("ATLANTIS")
+
+    def test_sites_take_turns(self, monkeypatch):
+        config = chrono_config()
+        config.sites = [(f"SITE {i}", 10.0 * i, 20.0 * i) for i in range(5)]
+        chrono.Chronometer.setup(config, os.terminal_size((60, 24)))
+        now = datetime(2024, 6, 21, 12, tzinfo=timezone.utc)
+        shown = []
+        for page in range(3):
+            screen = chrono.Chronometer.render(now + timedelta(seconds=5 * page))
+            assert screen.count("\n") == 23
+            grid = frame.Grid.parse(screen, 24, 60)
+            rows = ["".join(c for c, _ in row) for row in grid.cells]
+            assert rows[20].startswith("\N{BOX DRAWINGS DOUBLE UP AND RIGHT}")
+            shown += [row[:11].strip() for row in rows[21:23]]
+        assert shown == ["HOME"] + [f"SITE {i}" for i in range(5)]
+
+        # The overlay takes the last sites row rather than fall off the screen
+        monkeypatch.setattr(chrono.Chronometer, "profiler", Profiler(size=4))
+        chrono.Chronometer.profiler.overlay = True
+        grid = chrono.Chronometer.render_grid(now, overlay="PROFILE")
+        rows = ["".join(c for c, _ in row) for row in grid.cells]
+        assert rows[21].strip().startswith("HOME") and not rows[22].strip()
+        assert rows[23].startswith("PROFILE")
+
+
+class TestProfiler:
+    def test_rolling_stats(self):
+        stats = RollingStats(size=100)
+        for i in range(1, 201):
+            stats.add(i)
+        summary = stats.summary()
+        assert summary["count"] == 200
+        assert summary["p50"] == 151
+        assert summary["p99"] == 200
+        assert summary["max"] == 200
+        assert len(stats.samples) == 100
+
+    def test_dump(self, tmp_path):
+        profiler = Profiler()
+        profiler.record("write", 0.5)
+        profiler.dump(str(tmp_path / "profile.json"))
+        with open(tmp_path / "profile.json") as f:
+            assert json.load(f)["seconds"]["write"]["p50"] == 0.5